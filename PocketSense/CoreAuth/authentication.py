@@ -0,0 +1,102 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.db.models import F
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import (
+    Student,
+)
+
+# Extra claims written into tokens at login, next to simplejwt's user id claim.
+EMAIL_CLAIM = 'email'
+TOKEN_VERSION_CLAIM = 'ver'
+
+
+def add_user_claims(token, user):
+    """
+    Add the claims StatelessJWTAuthentication reads to a freshly issued token.
+
+    Raises:
+        AuthenticationFailed: If the student is inactive.
+    """
+    if not user.is_active:
+        raise AuthenticationFailed("User is inactive.", code="user_inactive")
+    token[EMAIL_CLAIM] = user.email
+    token[TOKEN_VERSION_CLAIM] = user.token_version
+    _cache_status(user.pk, (user.is_active, user.token_version))
+    return token
+
+
+def _status_key(user_id):
+    return f"student-auth:{user_id}"
+
+
+def _cache_status(user_id, status):
+    cache.set(_status_key(user_id), status, timeout=getattr(settings, 'AUTH_STATUS_CACHE_SECONDS', 60))
+
+
+def user_token_status(user_id):
+    """
+    (is_active, token_version) of a student, or None once the student is deleted.
+
+    Read from the Student row and kept in the default cache for
+    AUTH_STATUS_CACHE_SECONDS, so most requests do not touch the database.
+    """
+    status = cache.get(_status_key(user_id), False)
+    if status is False:
+        status = Student.objects.filter(pk=user_id).values_list('is_active', 'token_version').first()
+        _cache_status(user_id, status)
+    return status
+
+
+def forget_user_status(user_id):
+    cache.delete(_status_key(user_id))
+
+
+def revoke_user_tokens(user_id):
+    """
+    Refuse every token issued to a student so far; they have to log in again.
+    """
+    Student.objects.filter(pk=user_id).update(token_version=F('token_version') + 1)
+    forget_user_status(user_id)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds `request.user` from the token instead of loading the Student row.
+
+    The user is a Student instance holding only the signed id and email, so
+    it can be passed to querysets and foreign keys like a loaded one. Any
+    other field is deferred: Django fetches it from the database the first
+    time it is read. Tokens issued without the email claim fall back to the
+    lookup done by JWTAuthentication.
+
+    Every token is checked against the student's `is_active` flag and token
+    version (see `revoke_user_tokens`) from `user_token_status`. The CoreAuth
+    signals drop the cached status when a student is saved or deleted; a
+    change made with `QuerySet.update()` sends no signal and is seen once the
+    cached status expires, after AUTH_STATUS_CACHE_SECONDS.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            return super().get_user(validated_token)
+
+        status = user_token_status(user_id)
+        if status is None or not status[0] or validated_token.get(TOKEN_VERSION_CLAIM, 0) != status[1]:
+            raise AuthenticationFailed("User not found or inactive.", code="user_inactive")
+
+        if EMAIL_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+
+        id_field = Student._meta.get_field(api_settings.USER_ID_FIELD)
+        return Student.from_db(
+            router.db_for_read(Student),
+            [id_field.attname, 'email'],
+            [id_field.to_python(user_id), validated_token[EMAIL_CLAIM]],
+        )
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from CoreAuth.outbox import (
+    OUTBOX_BATCH_SIZE,
+    deliver_outbox,
+    purge_sent_emails,
+)
+
+
+class Command(BaseCommand):
+    help = "Send due outbox emails, retrying failures with backoff and dead-lettering the ones that keep failing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=OUTBOX_BATCH_SIZE, help="Emails claimed and sent per batch.")
+        parser.add_argument('--workers', type=int, default=1, help="Parallel mail connections.")
+        parser.add_argument('--loop', action='store_true', help="Keep polling for new emails instead of exiting.")
+        parser.add_argument('--interval', type=float, default=5, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            result = deliver_outbox(batch_size=options['batch_size'], workers=options['workers'])
+            purged = purge_sent_emails()
+
+            if any(result.values()) or purged or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Sent {result['sent']} outbox emails in {time.monotonic() - started:.1f}s "
+                    f"({result['retried']} to retry, {result['dead']} dead-lettered, {purged} purged)."
+                ))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
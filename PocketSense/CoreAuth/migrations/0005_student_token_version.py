@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-18 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CoreAuth', '0004_outboxemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='token_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
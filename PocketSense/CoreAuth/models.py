@@ -1,5 +1,6 @@
 import uuid
 from django.db import models
+from django.utils import timezone
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 
@@ -9,6 +10,8 @@ class Student(AbstractUser):
     college = models.CharField(max_length=255)
     semester = models.CharField(max_length=255)
     default_payment_methods = models.JSONField(default=list)
+    # Bumped by revoke_user_tokens; tokens carrying an older version are refused.
+    token_version = models.PositiveIntegerField(default=0)
     
     groups = models.ManyToManyField(
         'auth.Group',
@@ -38,4 +41,37 @@ class EmailVerification(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"Email verification for {self.user.email}"
\ No newline at end of file
+        return f"Email verification for {self.user.email}"
+
+class OutboxEmail(models.Model):
+    """
+    Outgoing email, written in the transaction that produced it and sent later by `send_outbox_emails`.
+
+    A row is pending until it has `sent_at` or `dead_at`; `dedup_key` is unique,
+    so enqueueing the same message twice stores and sends it once.
+    """
+    dedup_key = models.CharField(max_length=255, unique=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    content_subtype = models.CharField(max_length=20, default='plain')
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(default=list)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.UUIDField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    sent_at = models.DateTimeField(null=True, blank=True)
+    dead_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['next_attempt_at'], name='outbox_email_due',
+                condition=models.Q(sent_at__isnull=True, dead_at__isnull=True),
+            ),
+            models.Index(fields=['claim_token'], name='outbox_email_claim'),
+        ]
+
+    def __str__(self):
+        return f"{self.dedup_key} - {', '.join(self.to)}"
@@ -0,0 +1,239 @@
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import (
+    OutboxEmail,
+)
+
+logger = logging.getLogger(__name__)
+
+# Rows a worker claims at a time; small enough to send well within half of OUTBOX_CLAIM_SECONDS.
+OUTBOX_BATCH_SIZE = 100
+
+# Retry delays double from OUTBOX_RETRY_SECONDS up to this ceiling.
+OUTBOX_MAX_RETRY_SECONDS = 6 * 60 * 60
+
+
+def enqueue_emails(messages):
+    """
+    Store messages in the outbox, skipping any whose dedup key is already there.
+
+    Call it inside the transaction that produced the messages, so they are
+    committed, or rolled back, together with it.
+
+    Args:
+        messages (iterable): (dedup_key, EmailMessage) pairs.
+
+    Returns:
+        int: Number of messages that were not queued before.
+    """
+    messages = dict(messages)
+    if not messages:
+        return 0
+
+    queued = set(OutboxEmail.objects.filter(dedup_key__in=messages).values_list('dedup_key', flat=True))
+    rows = [
+        OutboxEmail(
+            dedup_key=key,
+            subject=message.subject,
+            body=message.body,
+            content_subtype=message.content_subtype,
+            from_email=message.from_email,
+            to=list(message.to),
+        )
+        for key, message in messages.items() if key not in queued
+    ]
+    # ignore_conflicts covers a concurrent enqueue of the same key.
+    OutboxEmail.objects.bulk_create(rows, ignore_conflicts=True)
+    return len(rows)
+
+
+def enqueue_email(dedup_key, message):
+    return enqueue_emails([(dedup_key, message)])
+
+
+def retry_delay(attempts):
+    base = getattr(settings, 'OUTBOX_RETRY_SECONDS', 60)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), OUTBOX_MAX_RETRY_SECONDS))
+
+
+def claim_lease():
+    return timedelta(seconds=getattr(settings, 'OUTBOX_CLAIM_SECONDS', 300))
+
+
+def claim_batch(batch_size=OUTBOX_BATCH_SIZE):
+    """
+    Claim up to `batch_size` due messages for this worker.
+
+    The claim is a single UPDATE that counts the attempt, stamps a claim token
+    and pushes `next_attempt_at` past the lease, so concurrent workers never
+    pick the same row, and a worker that dies mid-batch only delays its rows
+    until the lease runs out. `send_batch` renews the lease while it works.
+    """
+    now = timezone.now()
+    token = uuid.uuid4()
+    due = (
+        OutboxEmail.objects.filter(sent_at__isnull=True, dead_at__isnull=True, next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'id')
+        .values('id')[:batch_size]
+    )
+    claimed = OutboxEmail.objects.filter(id__in=due, next_attempt_at__lte=now).update(
+        claim_token=token,
+        attempts=F('attempts') + 1,
+        next_attempt_at=now + claim_lease(),
+    )
+    if not claimed:
+        return []
+    return list(OutboxEmail.objects.filter(claim_token=token).order_by('id'))
+
+
+def _message(row, connection):
+    message = EmailMessage(row.subject, row.body, row.from_email, row.to, connection=connection)
+    message.content_subtype = row.content_subtype
+    return message
+
+
+class _Claim:
+    """
+    The rows of one claimed batch that this worker still holds.
+
+    Every update is filtered on the claim token, so a row whose lease ran out
+    and was claimed by another worker is never sent or marked by this one.
+    """
+
+    def __init__(self, rows):
+        self.token = rows[0].claim_token
+        self.held = {row.id for row in rows}
+        self.sent_ids = []
+        self.renew_at = timezone.now() + claim_lease() / 2
+
+    def holds(self, row):
+        if timezone.now() >= self.renew_at:
+            self.renew()
+        return row.id in self.held
+
+    def renew(self):
+        """
+        Record what was sent so far and push the lease out again for the rest.
+        """
+        self.flush()
+        now = timezone.now()
+        pending = OutboxEmail.objects.filter(id__in=self.held, claim_token=self.token)
+        if pending.update(next_attempt_at=now + claim_lease()) < len(self.held):
+            self.held = set(pending.values_list('id', flat=True))
+        self.renew_at = now + claim_lease() / 2
+
+    def flush(self):
+        if self.sent_ids:
+            OutboxEmail.objects.filter(id__in=self.sent_ids, claim_token=self.token).update(
+                sent_at=timezone.now(), claim_token=None, last_error='',
+            )
+            self.held.difference_update(self.sent_ids)
+            self.sent_ids = []
+
+    def fail(self, row):
+        OutboxEmail.objects.filter(id=row.id, claim_token=self.token).update(
+            last_error=row.last_error, next_attempt_at=row.next_attempt_at, dead_at=row.dead_at,
+        )
+        self.held.discard(row.id)
+
+
+def send_batch(rows, connection):
+    """
+    Send claimed rows over one open connection and record the outcome.
+
+    The lease is renewed, and the rows sent so far marked, whenever half of
+    it has passed. Failed rows are rescheduled with exponential backoff, or
+    dead-lettered after OUTBOX_MAX_ATTEMPTS.
+
+    Returns:
+        tuple: (sent count, retried count, dead count).
+    """
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)
+    claim = _Claim(rows)
+    sent = retried = dead = 0
+    for row in rows:
+        if not claim.holds(row):
+            continue
+        try:
+            if connection.send_messages([_message(row, connection)]):
+                claim.sent_ids.append(row.id)
+                sent += 1
+                continue
+            error = "The mail backend did not accept the message."
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            # A failed exchange can leave the connection unusable; start a fresh one.
+            connection.close()
+            try:
+                connection.open()
+            except Exception:
+                pass
+
+        now = timezone.now()
+        row.last_error = error
+        if row.attempts >= max_attempts:
+            row.dead_at = now
+            dead += 1
+            logger.error(f"Dead-lettered outbox email {row.dedup_key} after {row.attempts} attempts: {error}")
+        else:
+            row.next_attempt_at = now + retry_delay(row.attempts)
+            retried += 1
+        claim.fail(row)
+
+    claim.flush()
+    return sent, retried, dead
+
+
+def _drain(batch_size):
+    connection = get_connection()
+    totals = [0, 0, 0]
+    try:
+        while rows := claim_batch(batch_size):
+            for position, count in enumerate(send_batch(rows, connection)):
+                totals[position] += count
+    finally:
+        connection.close()
+    return totals
+
+
+def _drain_in_thread(batch_size):
+    close_old_connections()
+    try:
+        return _drain(batch_size)
+    finally:
+        close_old_connections()
+
+
+def deliver_outbox(batch_size=OUTBOX_BATCH_SIZE, workers=1):
+    """
+    Send every due outbox message, from `workers` threads with one reused mail connection each.
+
+    Returns:
+        dict: Counts of messages sent, rescheduled for retry and dead-lettered.
+    """
+    if workers <= 1:
+        results = [_drain(batch_size)]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='outbox') as pool:
+            results = list(pool.map(_drain_in_thread, [batch_size] * workers))
+
+    sent, retried, dead = (sum(column) for column in zip(*results))
+    return {'sent': sent, 'retried': retried, 'dead': dead}
+
+
+def purge_sent_emails():
+    """
+    Delete sent messages older than OUTBOX_RETENTION_DAYS. Dead-lettered rows are kept for inspection.
+    """
+    cutoff = timezone.now() - timedelta(days=getattr(settings, 'OUTBOX_RETENTION_DAYS', 30))
+    deleted, _ = OutboxEmail.objects.filter(sent_at__lt=cutoff).delete()
+    return deleted
@@ -1,3 +1,251 @@
-from django.test import TestCase
+import uuid
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from expenses.models import (
+    Expense,
+    ExpenseSplit,
+)
+from .authentication import (
+    StatelessJWTAuthentication,
+    add_user_claims,
+    revoke_user_tokens,
+)
+from .models import (
+    EmailVerification,
+    OutboxEmail,
+    Student,
+)
+from .outbox import (
+    claim_batch,
+    deliver_outbox,
+    enqueue_email,
+    enqueue_emails,
+    send_batch,
+)
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Each auth route runs a fixed number of queries, however many students exist.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.password = make_password("password")
+
+    def grow(self, count, prefix):
+        Student.objects.bulk_create([
+            Student(username=f"{prefix}{index}", email=f"{prefix}{index}@college.com", password=self.password)
+            for index in range(count)
+        ])
+
+    def assertQueryBudget(self, budget, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format="json")
+
+        self.assertEqual(response.status_code, 200, f"{method.upper()} {url}: {response.data}")
+        self.assertEqual(
+            len(queries), budget,
+            f"{method.upper()} {url} ran {len(queries)} queries, budget is {budget}:\n"
+            + "\n".join(query["sql"] for query in queries.captured_queries),
+        )
+
+    def test_routes_stay_within_budget(self):
+        for size in (10, 200):
+            self.grow(size, f"seed{size}-")
+            with self.subTest(size=size):
+                email = f"new{size}@college.com"
+                self.assertQueryBudget(8, "post", "/auth/register/", {
+                    "username": f"new{size}", "email": email, "password": "password",
+                    "college": "College", "semester": "3",
+                })
+                self.assertQueryBudget(1, "post", "/auth/login/", {"email": email, "password": "password"})
+
+                student = Student.objects.get(email=email)
+                token = EmailVerification.objects.get(user=student).token
+                uid = urlsafe_base64_encode(force_bytes(student.id))
+                self.assertQueryBudget(3, "get", f"/auth/verify-email/{uid}/{token}/")
+
+
+class OutboxTests(TestCase):
+
+    def message(self, to="student@college.com"):
+        return EmailMessage("Subject", "Body", "noreply@college.com", [to])
+
+    def make_due(self):
+        OutboxEmail.objects.filter(sent_at__isnull=True).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+
+    def test_registration_queues_verification_email(self):
+        response = APIClient().post("/auth/register/", {
+            "username": "new", "email": "new@college.com", "password": "password",
+            "college": "College", "semester": "3",
+        }, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(deliver_outbox()["sent"], 1)
+        self.assertEqual(mail.outbox[0].to, ["new@college.com"])
+        self.assertEqual(mail.outbox[0].content_subtype, "html")
+
+    def test_dedup_key_sends_once(self):
+        self.assertEqual(enqueue_emails([("reminder:1", self.message()), ("reminder:2", self.message())]), 2)
+        deliver_outbox()
+        self.assertEqual(enqueue_email("reminder:1", self.message()), 0)
+
+        self.assertEqual(deliver_outbox()["sent"], 0)
+        self.assertEqual(len(mail.outbox), 2)
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=3, OUTBOX_RETRY_SECONDS=60)
+    def test_failures_back_off_then_dead_letter(self):
+        enqueue_email("reminder:1", self.message())
+
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=OSError("down")):
+            delays = []
+            for attempt in range(3):
+                started = timezone.now()
+                result = deliver_outbox()
+                row = OutboxEmail.objects.get()
+                self.assertEqual(row.attempts, attempt + 1)
+                self.assertEqual(deliver_outbox()["retried"], 0, "a rescheduled email is not retried early")
+                if attempt < 2:
+                    self.assertEqual(result["retried"], 1)
+                    delays.append(round((row.next_attempt_at - started).total_seconds()))
+                    self.make_due()
+
+        self.assertEqual(delays, [60, 120])
+        self.assertEqual(result["dead"], 1)
+        self.assertIsNotNone(row.dead_at)
+        self.assertIn("down", row.last_error)
+
+        self.make_due()
+        self.assertEqual(deliver_outbox()["sent"], 0)
+        self.assertEqual(len(mail.outbox), 0)
+
+    @override_settings(OUTBOX_CLAIM_SECONDS=0)
+    def test_rows_claimed_by_another_worker_are_skipped(self):
+        enqueue_emails([("reminder:1", self.message("first@college.com")), ("reminder:2", self.message("second@college.com"))])
+        rows = claim_batch()
+        # The lease ran out and another worker claimed the second row.
+        OutboxEmail.objects.filter(dedup_key="reminder:2").update(claim_token=uuid.uuid4())
+
+        self.assertEqual(send_batch(rows, get_connection()), (1, 0, 0))
+        self.assertEqual([message.to for message in mail.outbox], [["first@college.com"]])
+        stolen = OutboxEmail.objects.get(dedup_key="reminder:2")
+        self.assertIsNone(stolen.sent_at)
+        self.assertNotEqual(stolen.claim_token, rows[1].claim_token)
+
+    def test_claimed_rows_are_not_claimed_twice(self):
+        enqueue_email("reminder:1", self.message())
+        with mock.patch("CoreAuth.outbox.send_batch", return_value=(0, 0, 0)):
+            deliver_outbox()
+
+        self.assertEqual(deliver_outbox()["sent"], 0)
+        self.assertEqual(OutboxEmail.objects.get().attempts, 1)
+
+
+class StatelessJWTAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.student = Student.objects.create(
+            username="student", email="student@college.com", password=make_password("password"), college="College",
+        )
+
+    def login_token(self):
+        response = APIClient().post("/auth/login/", {"email": self.student.email, "password": "password"}, format="json")
+        return AccessToken(response.data["data"]["access_token"])
+
+    def test_user_comes_from_claims(self):
+        token = self.login_token()
+
+        with self.assertNumQueries(0):
+            user = StatelessJWTAuthentication().get_user(token)
+            self.assertEqual((user.pk, user.email), (self.student.pk, self.student.email))
+            self.assertTrue(user.is_authenticated)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(user.college, "College")
+
+    def test_token_without_email_claim_loads_student(self):
+        token = AccessToken.for_user(self.student)
+
+        # One query for the token status, one for the student.
+        with self.assertNumQueries(2):
+            user = StatelessJWTAuthentication().get_user(token)
+        self.assertEqual(user.username, "student")
+
+    def post_expense(self, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return client.post("/expenses/create/", {
+            "amount": "30.00", "split_type": "equal", "paid_by_you": True, "splits": [],
+        }, format="json")
+
+    def test_login_token_writes_through_a_real_endpoint(self):
+        token = self.login_token()
+
+        response = self.post_expense(token)
+
+        self.assertEqual(response.status_code, 200)
+        expense = Expense.objects.get()
+        self.assertEqual((expense.student_id, expense.paid_by_id), (self.student.id, self.student.id))
+        self.assertEqual(ExpenseSplit.objects.get().email, self.student.email)
+
+    def test_deleted_or_deactivated_student_is_refused(self):
+        token = self.login_token()
+
+        self.student.is_active = False
+        self.student.save()
+        self.assertEqual(self.post_expense(token).status_code, 401)
+
+        self.student.is_active = True
+        self.student.save()
+        self.assertEqual(self.post_expense(token).status_code, 200)
+
+        self.student.delete()
+        self.assertEqual(self.post_expense(token).status_code, 401)
+        self.assertFalse(Expense.objects.exists())
+
+    def test_deactivation_without_signals_is_seen_once_the_status_expires(self):
+        token = self.login_token()
+        Student.objects.filter(id=self.student.id).update(is_active=False)
+
+        # Expiring the cached status stands in for waiting AUTH_STATUS_CACHE_SECONDS.
+        cache.clear()
+
+        self.assertEqual(self.post_expense(token).status_code, 401)
+        self.assertFalse(Expense.objects.exists())
+
+    def test_inactive_student_cannot_log_in(self):
+        Student.objects.filter(id=self.student.id).update(is_active=False)
+        self.student.refresh_from_db()
+
+        response = APIClient().post("/auth/login/", {"email": self.student.email, "password": "password"}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        with self.assertRaises(AuthenticationFailed):
+            add_user_claims(RefreshToken.for_user(self.student), self.student)
+
+    def test_revoked_tokens_stay_refused(self):
+        token = self.login_token()
+
+        revoke_user_tokens(self.student.id)
+        cache.clear()
+
+        self.assertEqual(self.post_expense(token).status_code, 401)
+        self.assertEqual(self.post_expense(self.login_token()).status_code, 200)
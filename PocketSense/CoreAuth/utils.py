@@ -8,6 +8,9 @@ from django.core.mail import EmailMessage
 from .models import (
     EmailVerification,
 )
+from .outbox import (
+    enqueue_email,
+)
 
 def send_verification_email(user, request):
     email_verification = EmailVerification.objects.create(user=user)
@@ -30,7 +33,8 @@ def send_verification_email(user, request):
         to=[user.email],
     )
     email.content_subtype = "html"  # Specify the content type as HTML
-    email.send()
+    # Queued rather than sent, so signup does not wait on the mail server.
+    enqueue_email(f"email-verification:{token}", email)
 
 def verify_email(request, uidb64, token):
     try:
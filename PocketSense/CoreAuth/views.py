@@ -7,6 +7,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.hashers import check_password
+from django.db import transaction
 from django.utils.http import urlsafe_base64_decode
 
 
@@ -17,6 +18,9 @@ from utils.response import (
     response_200,
 )
 
+from .authentication import (
+    add_user_claims,
+)
 from .utils import (
     send_verification_email,
 )
@@ -31,8 +35,9 @@ class UserRegisterView(APIView):
     def post(self, request):
         serializer = UserRegisterSerializer(data=request.data)
         if serializer.is_valid():
-            user = serializer.save()
-            send_verification_email(user, request)
+            with transaction.atomic():
+                user = serializer.save()
+                send_verification_email(user, request)
             return response_200('User created successfully!', serializer.data)
             
         return response_400_bad_request(serializer.errors)
@@ -49,7 +54,9 @@ class LoginView(APIView):
         try:
             user = User.objects.get(email=email)
             if check_password(password, user.password):
-                refresh = RefreshToken.for_user(user)
+                if not user.is_active:
+                    return response_400_bad_request('This account is inactive.')
+                refresh = add_user_claims(RefreshToken.for_user(user), user)
                 data = {
                     'access_token': str(refresh.access_token),
                     'refresh_token': str(refresh),
@@ -168,11 +168,20 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'CoreAuth.authentication.StatelessJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.TokenAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'utils.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'utils.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     "DATE_INPUT_FORMATS": ["%d-%m-%Y"],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
     'PAGE_SIZE': 1000,
@@ -181,6 +190,48 @@ REST_FRAMEWORK = {
 
 AUTH_USER_MODEL = 'CoreAuth.Student'
 
+# How long a student's active flag and token version are cached for JWT checks.
+AUTH_STATUS_CACHE_SECONDS = 60
+
+# How long a stored Idempotency-Key response is replayed for retried writes.
+IDEMPOTENCY_KEY_TTL_HOURS = 24
+
+# Background threads that downscale and thumbnail uploaded receipts; 0 processes them inline.
+RECEIPT_PROCESSING_WORKERS = 2
+
+# Threads that render dashboard sections concurrently; 0 renders them inline.
+DASHBOARD_WORKERS = 4
+
+# Days before a settlement's due date that payment_reminder emails its borrower; list several to remind more than once.
+PAYMENT_REMINDER_DAYS = [3]
+
+# Outbox emails are retried with delays doubling from OUTBOX_RETRY_SECONDS and
+# dead-lettered after OUTBOX_MAX_ATTEMPTS; a claimed batch is released after
+# OUTBOX_CLAIM_SECONDS if its worker dies, and sent rows are kept
+# OUTBOX_RETENTION_DAYS so their dedup keys keep suppressing repeats.
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETRY_SECONDS = 60
+OUTBOX_CLAIM_SECONDS = 300
+OUTBOX_RETENTION_DAYS = 30
+
+# 'responses' holds cached GET responses keyed by each student's data version.
+# Local memory evicts the least recently used entries past MAX_ENTRIES and
+# anything older than TIMEOUT seconds; point it at a shared backend (Redis,
+# Memcached) in production so every worker shares hits and counters.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'TIMEOUT': 3600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
 
 from .local_settings import *
 
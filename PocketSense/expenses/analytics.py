@@ -0,0 +1,189 @@
+import numpy as np
+from django.utils import timezone
+
+from .models import (
+    Expense,
+)
+from .utils import (
+    from_minor_units,
+)
+
+PERIODS = ('daily', 'weekly', 'monthly')
+DEFAULT_WINDOWS = {'daily': 7, 'weekly': 4, 'monthly': 3}
+DEFAULT_PERCENTILES = (50, 90, 95)
+
+# Fewest expenses a category needs before its z-scores mean anything.
+MIN_OUTLIER_SAMPLES = 5
+# Scale the median and mean absolute deviations to a standard deviation for normal data.
+MAD_SCALE = 1.4826
+MEAN_AD_SCALE = 1.2533
+
+
+def _bucket_starts(days, period):
+    if period == 'daily':
+        return days
+    if period == 'weekly':
+        # 1970-01-01 was a Thursday; shift back to the Monday starting each week.
+        offsets = (days.astype(np.int64) + 3) % 7
+        return days - offsets.astype('timedelta64[D]')
+    return days.astype('datetime64[M]').astype('datetime64[D]')
+
+
+def _bucket_range(first, last, period):
+    if period == 'monthly':
+        months = np.arange(first.astype('datetime64[M]'), last.astype('datetime64[M]') + 1)
+        return months.astype('datetime64[D]')
+    step = 7 if period == 'weekly' else 1
+    return np.arange(first, last + 1, step)
+
+
+class ExpenseSeries:
+    """
+    A student's expenses as column arrays for vectorized analytics.
+
+    Load once with `ExpenseSeries.load`; every method works on the arrays
+    in memory, so a full report costs a single query.
+    """
+
+    def __init__(self, ids, timestamps, amounts, category_codes, category_names):
+        self.ids = ids
+        self.timestamps = timestamps
+        self.amounts = amounts
+        self.category_codes = category_codes
+        self.category_names = category_names
+
+    @classmethod
+    def load(cls, student, start_date, end_date):
+        rows = list(
+            Expense.objects.filter(student=student, created_at__range=[start_date, end_date])
+            .order_by('created_at', 'id')
+            .values_list('id', 'created_at', 'amount', 'category__name')
+        )
+
+        category_names = sorted({row[3] for row in rows}, key=lambda name: (name is None, name or ''))
+        codes = {name: code for code, name in enumerate(category_names)}
+
+        return cls(
+            ids=np.array([row[0] for row in rows], dtype=np.int64),
+            timestamps=np.array(
+                [timezone.localtime(row[1]).replace(tzinfo=None) if timezone.is_aware(row[1]) else row[1] for row in rows],
+                dtype='datetime64[us]',
+            ),
+            amounts=np.array([int(row[2] * 100) for row in rows], dtype=np.int64),
+            category_codes=np.array([codes[row[3]] for row in rows], dtype=np.int64),
+            category_names=category_names,
+        )
+
+    def __len__(self):
+        return len(self.amounts)
+
+    @property
+    def total(self):
+        return from_minor_units(int(self.amounts.sum()))
+
+    def category_totals(self):
+        totals = np.zeros(len(self.category_names), dtype=np.int64)
+        np.add.at(totals, self.category_codes, self.amounts)
+        order = np.argsort(-totals, kind='stable')
+        return [
+            {"category__name": self.category_names[code], "total": from_minor_units(int(totals[code]))}
+            for code in order
+        ]
+
+    def buckets(self, period, window=None, start_date=None, end_date=None):
+        """
+        Spending per day, week or month with a trailing rolling average.
+
+        Buckets with no spending are included as zero so the rolling window
+        always spans the same length of time.
+        """
+        if not len(self):
+            return []
+
+        days = self.timestamps.astype('datetime64[D]')
+        starts = _bucket_starts(days, period)
+        first = np.datetime64(start_date, 'D') if start_date else days[0]
+        last = np.datetime64(end_date, 'D') if end_date else days[-1]
+        labels = _bucket_range(_bucket_starts(np.array([first]), period)[0], last, period)
+
+        positions = np.searchsorted(labels, starts)
+        totals = np.zeros(len(labels), dtype=np.int64)
+        counts = np.zeros(len(labels), dtype=np.int64)
+        np.add.at(totals, positions, self.amounts)
+        np.add.at(counts, positions, 1)
+
+        window = window or DEFAULT_WINDOWS[period]
+        cumulative = np.concatenate(([0], np.cumsum(totals)))
+        lower = np.maximum(np.arange(1, len(totals) + 1) - window, 0)
+        spans = np.arange(1, len(totals) + 1) - lower
+        rolling = (cumulative[1:] - cumulative[lower]) / spans
+
+        return [
+            {
+                "period_start": label.item(),
+                "total": from_minor_units(int(total)),
+                "count": int(count),
+                "rolling_average": from_minor_units(int(round(average))),
+            }
+            for label, total, count, average in zip(labels, totals, counts, rolling)
+        ]
+
+    def category_percentiles(self, percentiles=DEFAULT_PERCENTILES):
+        """
+        Expense amount percentiles within each category.
+        """
+        results = []
+        order = np.argsort(self.category_codes, kind='stable')
+        codes, starts = np.unique(self.category_codes[order], return_index=True)
+        for code, amounts in zip(codes, np.split(self.amounts[order], starts[1:])):
+            values = np.percentile(amounts, percentiles)
+            results.append({
+                "category__name": self.category_names[code],
+                "count": len(amounts),
+                "percentiles": {
+                    f"p{percentile}": from_minor_units(int(round(value)))
+                    for percentile, value in zip(percentiles, values)
+                },
+            })
+        return results
+
+    def outliers(self, threshold=3.0):
+        """
+        Expenses whose robust z-score within their category is at least `threshold`.
+
+        The score is the distance from the category median in scaled median
+        absolute deviations, so one large expense cannot widen the spread it is
+        judged against the way it widens a standard deviation. When more than
+        half of a category's amounts are equal the MAD is zero, and the scaled
+        mean absolute deviation is used instead.
+        """
+        if not len(self):
+            return []
+
+        category_count = len(self.category_names)
+        amounts = self.amounts.astype(np.float64)
+        counts = np.bincount(self.category_codes, minlength=category_count)
+        medians = np.zeros(category_count)
+        spreads = np.zeros(category_count)
+        for code in np.flatnonzero(counts >= MIN_OUTLIER_SAMPLES):
+            values = amounts[self.category_codes == code]
+            medians[code] = np.median(values)
+            deviations = np.abs(values - medians[code])
+            spreads[code] = np.median(deviations) * MAD_SCALE or deviations.mean() * MEAN_AD_SCALE
+
+        deviations = amounts - medians[self.category_codes]
+        spreads = spreads[self.category_codes]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = np.where(spreads > 0, deviations / spreads, 0.0)
+        flagged = np.abs(scores) >= threshold
+
+        return [
+            {
+                "id": int(self.ids[index]),
+                "created_at": self.timestamps[index].item(),
+                "amount": from_minor_units(int(self.amounts[index])),
+                "category__name": self.category_names[self.category_codes[index]],
+                "z_score": round(float(scores[index]), 2),
+            }
+            for index in np.flatnonzero(flagged)
+        ]
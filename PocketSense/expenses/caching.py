@@ -0,0 +1,100 @@
+import hashlib
+from functools import wraps
+
+from django.core.cache import caches
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .versioning import (
+    get_data_version,
+)
+
+# Cache alias holding rendered response data; configure its backend, TIMEOUT
+# and MAX_ENTRIES in settings.CACHES.
+RESPONSE_CACHE = 'responses'
+
+# Counters live in the default cache so response churn cannot evict them.
+STATS_CACHE = 'default'
+STATS_PREFIX = 'response-cache-stats'
+
+_endpoints = set()
+
+
+def register_endpoint(endpoint):
+    _endpoints.add(endpoint)
+    return endpoint
+
+
+def response_cache_key(request, endpoint, params=None, kwargs=None):
+    """
+    Key for one student's response: (user, endpoint, params, data version, day).
+
+    A write bumps the data version, so entries for older versions are never read
+    again and age out of the cache by LRU or TTL.
+    """
+    version, _ = get_data_version(request)
+    params = request.query_params if params is None else params
+    arguments = repr((sorted((kwargs or {}).items()), sorted(params.lists())))
+    digest = hashlib.sha256(arguments.encode()).hexdigest()[:16]
+    return f"response:{request.user.pk}:{endpoint}:{version}:{timezone.localdate():%Y%m%d}:{digest}"
+
+
+def record_cache_events(endpoint, hits=0, misses=0):
+    cache = caches[STATS_CACHE]
+    for event, count in (('hits', hits), ('misses', misses)):
+        if not count:
+            continue
+        key = f"{STATS_PREFIX}:{endpoint}:{event}"
+        if not cache.add(key, count, timeout=None):
+            try:
+                cache.incr(key, count)
+            except ValueError:
+                cache.set(key, count, timeout=None)
+
+
+def response_cache_stats():
+    """
+    Hits and misses per endpoint, as counted by this cache backend.
+    """
+    endpoints = sorted(_endpoints)
+    keys = [f"{STATS_PREFIX}:{endpoint}:{event}" for endpoint in endpoints for event in ('hits', 'misses')]
+    counts = caches[STATS_CACHE].get_many(keys)
+
+    stats = {}
+    for endpoint in endpoints:
+        hits = counts.get(f"{STATS_PREFIX}:{endpoint}:hits", 0)
+        misses = counts.get(f"{STATS_PREFIX}:{endpoint}:misses", 0)
+        stats[endpoint] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+    return stats
+
+
+def cached_get(view_method):
+    """
+    Serve a GET handler's successful responses from the response cache.
+
+    Entries are keyed by `response_cache_key`, so a hit is always computed from
+    the student's current data version.
+    """
+    endpoint = register_endpoint(view_method.__qualname__.split('.')[0])
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        cache = caches[RESPONSE_CACHE]
+        key = response_cache_key(request, endpoint, kwargs=kwargs)
+
+        data = cache.get(key)
+        if data is not None:
+            record_cache_events(endpoint, hits=1)
+            return Response(data)
+
+        response = view_method(self, request, *args, **kwargs)
+        record_cache_events(endpoint, misses=1)
+        if response.status_code == 200:
+            cache.set(key, response.data)
+        return response
+
+    return wrapper
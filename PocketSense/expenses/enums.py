@@ -25,4 +25,8 @@ class PaymentMethodEnum(ChoiceEnum):
     Bank_Transfer = 1
     UPI = 2
     Cheque = 3
-    Cash = 4
\ No newline at end of file
+    Cash = 4
+
+class SettlementModeEnum(ChoiceEnum):
+    Greedy = 'greedy'
+    MinTransfers = 'min_transfers'
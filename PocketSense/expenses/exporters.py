@@ -0,0 +1,141 @@
+import csv
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from .models import (
+    Expense,
+    ExpenseSplit,
+    Settlement,
+)
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+EXPORT_CHUNK_SIZE = 2000
+
+# Flush the output buffer once it grows past this many characters.
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+EXPORT_COLUMNS = [
+    'record_type', 'id', 'created_at', 'amount', 'category', 'group', 'split_type',
+    'student', 'paid_by', 'expense', 'email', 'lender', 'borrower',
+    'payment_status', 'settlement_method', 'due_date',
+]
+
+
+class _Echo:
+    """File-like object whose write() returns the line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def _user_records(user, start_date=None, end_date=None):
+    """
+    Yield every expense, split and settlement row that involves the user.
+
+    Rows are read with `values()` and `.iterator()`, so memory stays flat
+    however long the history is.
+    """
+    dates = Q()
+    if start_date:
+        dates &= Q(created_at__gte=start_date)
+    if end_date:
+        dates &= Q(created_at__lt=end_date)
+
+    owed = ExpenseSplit.objects.filter(student=user).values('expense_id')
+    expenses = Expense.objects.filter(Q(student=user) | Q(paid_by=user) | Q(id__in=owed)).filter(dates)
+
+    for row in expenses.order_by('created_at', 'id').values(
+        'id', 'created_at', 'amount', 'category__name', 'group_id', 'split_type', 'student_id', 'paid_by_id'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            'record_type': 'expense',
+            'id': row['id'],
+            'created_at': row['created_at'],
+            'amount': row['amount'],
+            'category': row['category__name'],
+            'group': row['group_id'],
+            'split_type': row['split_type'],
+            'student': row['student_id'],
+            'paid_by': row['paid_by_id'],
+        }
+
+    splits = ExpenseSplit.objects.filter(expense__in=expenses.values('id'))
+    for row in splits.order_by('expense_id', 'id').values(
+        'id', 'expense_id', 'student_id', 'email', 'amount'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            'record_type': 'split',
+            'id': row['id'],
+            'expense': row['expense_id'],
+            'student': row['student_id'],
+            'email': row['email'],
+            'amount': row['amount'],
+        }
+
+    settlements = Settlement.objects.filter(Q(user=user) | Q(borrower=user)).filter(dates)
+    for row in settlements.order_by('created_at', 'id').values(
+        'id', 'created_at', 'amount', 'group_id', 'user_id', 'borrower_id',
+        'payment_status', 'settlement_method', 'due_date',
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            'record_type': 'settlement',
+            'id': row['id'],
+            'created_at': row['created_at'],
+            'amount': row['amount'],
+            'group': row['group_id'],
+            'lender': row['user_id'],
+            'borrower': row['borrower_id'],
+            'payment_status': row['payment_status'],
+            'settlement_method': row['settlement_method'],
+            'due_date': row['due_date'],
+        }
+
+
+def _lines(records, file_format):
+    if file_format == 'csv':
+        writer = csv.DictWriter(_Echo(), fieldnames=EXPORT_COLUMNS)
+        yield writer.writeheader()
+        for record in records:
+            yield writer.writerow(record)
+    else:
+        encoder = DjangoJSONEncoder(separators=(',', ':'))
+        for record in records:
+            yield encoder.encode(record) + '\n'
+
+
+def export_user_history(user, file_format, compress=False, start_date=None, end_date=None):
+    """
+    Stream a user's financial history as CSV or JSON lines, optionally gzipped.
+
+    Lines are batched into chunks of roughly EXPORT_BUFFER_SIZE characters, and
+    gzip output is produced incrementally, so memory use does not depend on
+    the number of rows.
+
+    Yields:
+        bytes: Chunks of the export file.
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer = []
+    size = 0
+
+    def flush():
+        data = ''.join(buffer).encode('utf-8')
+        buffer.clear()
+        return compressor.compress(data) if compressor else data
+
+    for line in _lines(_user_records(user, start_date, end_date), file_format):
+        buffer.append(line)
+        size += len(line)
+        if size >= EXPORT_BUFFER_SIZE:
+            size = 0
+            chunk = flush()
+            if chunk:
+                yield chunk
+
+    chunk = flush()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
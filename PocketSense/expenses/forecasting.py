@@ -0,0 +1,272 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    Budget,
+    Category,
+    Expense,
+    SpendingForecast,
+    SpendingRollup,
+)
+from .utils import (
+    month_start,
+    next_month_start,
+    start_of_day,
+)
+
+# Days of history a new forecast is fitted on.
+FORECAST_HISTORY_DAYS = 90
+
+# Smoothing weights for the daily level, its trend and the weekday effects.
+LEVEL_SMOOTHING = 0.3
+TREND_SMOOTHING = 0.05
+WEEKDAY_SMOOTHING = 0.1
+
+# Each day ahead keeps this share of the previous day's trend, so a few busy
+# days do not project a runaway month.
+TREND_DAMPING = 0.9
+
+FORECAST_UPDATE_FIELDS = [
+    'level', 'trend', 'weekday_effects', 'fitted_through', 'month', 'month_to_date',
+    'budget_limit', 'projected_month_end', 'budget_exhausted_on',
+]
+
+
+def _weekdays(first_day, days):
+    return (np.arange(days) + first_day.weekday()) % 7
+
+
+def _initial_state(daily, weekdays):
+    level = daily.mean(axis=1) if daily.shape[1] else np.zeros(len(daily))
+    effects = np.zeros((len(daily), 7))
+    for weekday in range(7):
+        columns = weekdays == weekday
+        if columns.any():
+            effects[:, weekday] = daily[:, columns].mean(axis=1) - level
+    return level, np.zeros(len(daily)), effects
+
+
+def fit_forecasts(daily, first_day, starts, level, trend, effects):
+    """
+    Fold daily totals into damped-trend smoothing state with weekday effects.
+
+    The loop runs over days; every step updates all series at once. A series
+    only takes in the days from its `starts` column onwards, which lets
+    forecasts fitted through different dates advance in the same pass.
+
+    Args:
+        daily (ndarray): (series, days) spend per day from `first_day`.
+        starts (ndarray): First column each series has not seen yet.
+        level, trend (ndarray): State per series.
+        effects (ndarray): (series, 7) weekday effects, Monday first.
+
+    Returns:
+        tuple: Updated level, trend and effects.
+    """
+    weekdays = _weekdays(first_day, daily.shape[1])
+    for column, weekday in enumerate(weekdays):
+        active = starts <= column
+        if not active.any():
+            continue
+        spent = daily[:, column]
+        effect = effects[:, weekday]
+        new_level = LEVEL_SMOOTHING * (spent - effect) + (1 - LEVEL_SMOOTHING) * (level + TREND_DAMPING * trend)
+        new_trend = TREND_SMOOTHING * (new_level - level) + (1 - TREND_SMOOTHING) * TREND_DAMPING * trend
+        new_effect = WEEKDAY_SMOOTHING * (spent - new_level) + (1 - WEEKDAY_SMOOTHING) * effect
+
+        level = np.where(active, new_level, level)
+        trend = np.where(active, new_trend, trend)
+        effects[:, weekday] = np.where(active, new_effect, effect)
+    return level, trend, effects
+
+
+def project_month_end(level, trend, effects, spent, limits, today):
+    """
+    Projected month-end spend and budget exhaustion date per series.
+
+    Args:
+        spent (ndarray): Month-to-date spend, including today.
+        limits (ndarray): Remaining budget per series, NaN where there is none.
+
+    Returns:
+        tuple: Projected totals, and the exhaustion date per series (None
+        when the budget is expected to last the month). A budget with
+        nothing left is reported as exhausted today.
+    """
+    horizon = (next_month_start(month_start(today)) - today).days - 1
+    ahead = np.arange(1, horizon + 1)
+    damping = np.cumsum(TREND_DAMPING ** ahead)
+    weekdays = (today.weekday() + ahead) % 7
+
+    daily = np.maximum(level[:, None] + trend[:, None] * damping + effects[:, weekdays], 0)
+    cumulative = spent[:, None] + np.cumsum(daily, axis=1)
+    projected = cumulative[:, -1] if horizon else spent
+
+    # Budget limits are what is left of the budget (expenses are taken off as
+    # they are created), so only spend still to come is measured against them.
+    with np.errstate(invalid='ignore'):
+        crossed = np.concatenate([(limits <= 0)[:, None], (cumulative - spent[:, None]) >= limits[:, None]], axis=1)
+    first = crossed.argmax(axis=1)
+    exhausted_on = [
+        today + timedelta(days=int(days)) if hit else None
+        for days, hit in zip(first, crossed.any(axis=1))
+    ]
+    return projected, exhausted_on
+
+
+def _money(value):
+    return Decimal(f"{value:.2f}")
+
+
+def build_forecasts(student_ids, rebuild=False):
+    """
+    Refit the spending forecasts of some students whose inputs moved, without saving them.
+
+    A forecast is refitted only when its inputs moved: a new day to fold in,
+    a new month, or a changed month-to-date total or budget limit. Existing
+    state only replays the days since `fitted_through`, so a refresh reads a
+    day or two of expenses; new forecasts and `rebuild` fit on the last
+    FORECAST_HISTORY_DAYS days.
+
+    Returns:
+        tuple: Stored forecasts by (student id, category id), and the
+        refitted forecasts as unsaved instances.
+    """
+    today = timezone.localdate()
+    yesterday = today - timedelta(days=1)
+    window_start = today - timedelta(days=FORECAST_HISTORY_DAYS)
+    month = month_start(today)
+
+    existing = {} if rebuild else {
+        (forecast.student_id, forecast.category_id): forecast
+        for forecast in SpendingForecast.objects.filter(student_id__in=student_ids)
+    }
+    limits = {
+        (student_id, category_id): limit
+        for student_id, category_id, limit in Budget.objects.filter(student_id__in=student_ids)
+        .values_list('student_id', 'category_id', 'budget_limit')
+    }
+    spent = {
+        (student_id, category_id): total
+        for student_id, category_id, total in SpendingRollup.objects.filter(
+            student_id__in=student_ids, month=month, category__isnull=False
+        ).values_list('student_id', 'category_id').annotate(total=Sum('total')).order_by()
+    }
+
+    def outdated(key):
+        forecast = existing.get(key)
+        return forecast is None or (
+            forecast.fitted_through < yesterday
+            or forecast.month != month
+            or forecast.month_to_date != spent.get(key, Decimal('0'))
+            or forecast.budget_limit != limits.get(key)
+        )
+
+    keys = {key for key in set(existing) | set(limits) | set(spent) if outdated(key)}
+    if rebuild or any(key not in existing for key in keys):
+        first_day = window_start
+    elif keys:
+        first_day = max(min(existing[key].fitted_through for key in keys) + timedelta(days=1), window_start)
+    else:
+        return existing, []
+
+    days = max((today - first_day).days, 0)
+    history = (
+        Expense.objects.filter(
+            student_id__in=student_ids,
+            category__isnull=False,
+            created_at__gte=start_of_day(first_day),
+            created_at__lt=start_of_day(today),
+        )
+        .annotate(day=TruncDate('created_at'))
+        .values_list('student_id', 'category_id', 'day')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    ) if days else []
+    rows = list(history)
+    if first_day == window_start:
+        keys.update((student_id, category_id) for student_id, category_id, _, _ in rows)
+
+    keys = sorted(keys)
+    index = {key: position for position, key in enumerate(keys)}
+    daily = np.zeros((len(keys), days))
+    for student_id, category_id, day, total in rows:
+        position = index.get((student_id, category_id))
+        if position is not None:
+            daily[position, (day - first_day).days] = float(total)
+
+    level, trend, effects = _initial_state(daily, _weekdays(first_day, days))
+    starts = np.zeros(len(keys), dtype=np.int64)
+    for position, key in enumerate(keys):
+        forecast = existing.get(key)
+        if forecast is not None and forecast.weekday_effects:
+            level[position] = forecast.level
+            trend[position] = forecast.trend
+            effects[position] = forecast.weekday_effects
+            starts[position] = (forecast.fitted_through - first_day).days + 1
+
+    level, trend, effects = fit_forecasts(daily, first_day, starts, level, trend, effects)
+
+    month_to_date = np.array([float(spent.get(key, 0)) for key in keys])
+    budget = np.array([float(limits[key]) if key in limits else np.nan for key in keys])
+    projected, exhausted_on = project_month_end(level, trend, effects, month_to_date, budget, today)
+
+    forecasts = [
+        SpendingForecast(
+            student_id=student_id,
+            category_id=category_id,
+            level=float(level[position]),
+            trend=float(trend[position]),
+            weekday_effects=[round(float(effect), 4) for effect in effects[position]],
+            fitted_through=yesterday,
+            month=month,
+            month_to_date=spent.get((student_id, category_id), Decimal('0')),
+            budget_limit=limits.get((student_id, category_id)),
+            projected_month_end=_money(projected[position]),
+            budget_exhausted_on=exhausted_on[position],
+        )
+        for position, (student_id, category_id) in enumerate(keys)
+    ]
+    return existing, forecasts
+
+
+def refresh_forecasts(student_ids, rebuild=False):
+    """
+    Refit the spending forecasts of some students (see `build_forecasts`) and store them.
+
+    Returns:
+        int: Number of forecasts written.
+    """
+    _, forecasts = build_forecasts(student_ids, rebuild=rebuild)
+    SpendingForecast.objects.bulk_create(
+        forecasts,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['student', 'category'],
+        update_fields=FORECAST_UPDATE_FIELDS + ['updated_at'],
+    )
+    return len(forecasts)
+
+
+def current_forecasts(student_id):
+    """
+    A student's up-to-date forecasts for this month, ordered by category name, without writing anything.
+
+    Forecasts whose inputs moved since the last `refresh_spending_forecasts`
+    run are refitted in memory.
+    """
+    existing, refitted = build_forecasts([student_id])
+    forecasts = {(forecast.student_id, forecast.category_id): forecast for forecast in existing.values()}
+    forecasts.update({(forecast.student_id, forecast.category_id): forecast for forecast in refitted})
+
+    month = month_start(timezone.localdate())
+    forecasts = [forecast for forecast in forecasts.values() if forecast.month == month]
+    categories = Category.objects.in_bulk({forecast.category_id for forecast in forecasts})
+    for forecast in forecasts:
+        forecast.category = categories[forecast.category_id]
+    return sorted(forecasts, key=lambda forecast: forecast.category.name)
@@ -0,0 +1,248 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from CoreAuth.models import (
+    Student,
+)
+from .models import (
+    Category,
+    Expense,
+    ExpenseSplit,
+    Group,
+)
+from .split_engine import (
+    split_expense_batch,
+)
+from .utils import (
+    from_minor_units,
+    expense_balance_changes,
+    apply_group_balance_changes,
+    apply_spending_rollup_changes,
+    month_start,
+)
+from .versioning import (
+    bump_data_versions,
+)
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+IMPORT_BATCH_SIZE = 1000
+
+
+def iter_import_rows(upload, file_format):
+    """
+    Lazily parse an uploaded CSV or JSON-lines file.
+
+    CSV files need `amount`, `split_type` and `splits` columns, where `splits` holds the
+    same JSON list the create endpoint accepts; `category`, `group` and `paid_by` (an
+    email) are optional. JSON-lines files carry one such object per line.
+
+    Yields:
+        tuple: (row number, row dict or None, error message or None).
+
+    Raises:
+        ValidationError: If the file is not UTF-8 text or not readable as CSV. Rows are
+            read before anything is written, so such a file imports nothing.
+    """
+    stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig')
+
+    try:
+        if file_format == 'csv':
+            row_number = 0
+            for row_number, row in enumerate(csv.DictReader(stream), start=1):
+                try:
+                    row['splits'] = json.loads(row.get('splits') or '[]')
+                except ValueError:
+                    yield row_number, None, "splits is not valid JSON."
+                    continue
+                yield row_number, row, None
+        else:
+            for row_number, line in enumerate(stream, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    yield row_number, None, "Line is not valid JSON."
+                    continue
+                if not isinstance(row, dict):
+                    yield row_number, None, "Line must be a JSON object."
+                    continue
+                yield row_number, row, None
+    except UnicodeDecodeError:
+        raise ValidationError("The file is not valid UTF-8 text.")
+    except csv.Error as e:
+        raise ValidationError(f"The CSV could not be read at row {row_number + 1}: {e}")
+
+
+def _prepare_row(row):
+    splits_data = row.get('splits')
+    if not isinstance(splits_data, list) or not all(isinstance(split, dict) for split in splits_data):
+        raise ValidationError("splits must be a list of objects.")
+
+    if not all(split.get('email') for split in splits_data):
+        raise ValidationError("Each participant needs an email.")
+
+    amount_field = Expense._meta.get_field('amount')
+    amount = Decimal(str(row.get('amount')))
+    amount_field.run_validators(amount)
+    if amount <= 0:
+        raise ValidationError("amount must be positive.")
+    amount = amount.quantize(Decimal(1).scaleb(-amount_field.decimal_places))
+
+    return {
+        'amount': amount,
+        'split_type': row.get('split_type'),
+        'category_id': int(row['category']) if row.get('category') else None,
+        'group_id': int(row['group']) if row.get('group') else None,
+        'paid_by': row.get('paid_by') or None,
+        'splits': splits_data,
+    }
+
+
+def import_expenses(user, rows):
+    """
+    Validate parsed rows and insert the valid ones in a single transaction.
+
+    All rows are split in one call to the batch split engine. Emails, categories
+    and groups referenced anywhere in the file are resolved with one query each,
+    and expenses and splits are written with batched `bulk_create`, so the cost
+    per row is a fraction of a statement.
+
+    Args:
+        user (Student): The importing user; becomes the expense owner and default payer.
+        rows (iterable): Output of `iter_import_rows`.
+
+    Returns:
+        tuple: (number of expenses created, list of per-row error dicts).
+    """
+    errors = []
+    prepared = []
+    for row_number, row, error in rows:
+        if error is None:
+            try:
+                prepared.append((row_number, _prepare_row(row)))
+                continue
+            except ValidationError as e:
+                error = " ".join(e.messages)
+            except (InvalidOperation, ValueError, TypeError):
+                error = "Row contains an invalid number."
+        errors.append({"row": row_number, "error": error})
+
+    split_results = split_expense_batch(
+        [(row['amount'], row['split_type'], row['splits']) for _, row in prepared]
+    )
+    split_rows = []
+    for (row_number, row), result in zip(prepared, split_results):
+        if isinstance(result, ValidationError):
+            errors.append({"row": row_number, "error": " ".join(result.messages)})
+            continue
+        for split, amount in zip(row['splits'], result):
+            split['amount'] = from_minor_units(amount)
+        split_rows.append((row_number, row))
+    prepared = split_rows
+
+    emails = {user.email}
+    category_ids = set()
+    group_ids = set()
+    for _, row in prepared:
+        emails.update(split['email'] for split in row['splits'])
+        if row['paid_by']:
+            emails.add(row['paid_by'])
+        if row['category_id']:
+            category_ids.add(row['category_id'])
+        if row['group_id']:
+            group_ids.add(row['group_id'])
+
+    student_ids = dict(Student.objects.filter(email__in=emails).values_list('email', 'id'))
+    category_ids = set(Category.objects.filter(id__in=category_ids).values_list('id', flat=True))
+    group_members = defaultdict(set)
+    for group_id, student_id in Group.members.through.objects.filter(group_id__in=group_ids).values_list('group_id', 'student_id'):
+        group_members[group_id].add(student_id)
+    group_ids = {group_id for group_id, members in group_members.items() if user.id in members}
+
+    expenses = []
+    group_changes = defaultdict(lambda: defaultdict(Decimal))
+    for row_number, row in prepared:
+        paid_by_id = student_ids.get(row['paid_by']) if row['paid_by'] else user.id
+        unknown_emails = [split['email'] for split in row['splits'] if split['email'] not in student_ids]
+        if row['paid_by'] and not paid_by_id:
+            unknown_emails.append(row['paid_by'])
+
+        if unknown_emails:
+            errors.append({"row": row_number, "error": f"Unknown participants: {', '.join(unknown_emails)}"})
+            continue
+        if row['category_id'] and row['category_id'] not in category_ids:
+            errors.append({"row": row_number, "error": f"No category found with ID {row['category_id']}"})
+            continue
+        if row['group_id'] and row['group_id'] not in group_ids:
+            errors.append({"row": row_number, "error": f"No group found with ID {row['group_id']}"})
+            continue
+        if row['group_id']:
+            participants = [split['email'] for split in row['splits']] + [row['paid_by'] or user.email]
+            outsiders = sorted({email for email in participants if student_ids[email] not in group_members[row['group_id']]})
+            if outsiders:
+                errors.append({"row": row_number, "error": f"Not members of this group: {', '.join(outsiders)}"})
+                continue
+
+        expense = Expense(
+            amount=row['amount'],
+            category_id=row['category_id'],
+            group_id=row['group_id'],
+            split_type=row['split_type'],
+            student_id=user.id,
+            paid_by_id=paid_by_id,
+            paid_by_you=paid_by_id == user.id,
+        )
+        splits = [
+            ExpenseSplit(student_id=student_ids[split['email']], email=split['email'], amount=split['amount'])
+            for split in row['splits']
+        ]
+        expenses.append((expense, splits))
+
+        if row['group_id']:
+            changes = expense_balance_changes(
+                paid_by_id, row['amount'], [(split.student_id, split.amount) for split in splits]
+            )
+            for student_id, amount in changes.items():
+                group_changes[row['group_id']][student_id] += amount
+
+    rollup_changes = defaultdict(lambda: [Decimal('0'), 0])
+    with transaction.atomic():
+        for start in range(0, len(expenses), IMPORT_BATCH_SIZE):
+            batch = expenses[start:start + IMPORT_BATCH_SIZE]
+            Expense.objects.bulk_create([expense for expense, _ in batch])
+
+            batch_splits = []
+            for expense, splits in batch:
+                for split in splits:
+                    split.expense = expense
+                    batch_splits.append(split)
+            ExpenseSplit.objects.bulk_create(batch_splits, batch_size=IMPORT_BATCH_SIZE)
+
+            for expense, _ in batch:
+                rollup = rollup_changes[(expense.student_id, expense.category_id, month_start(expense.created_at))]
+                rollup[0] += expense.amount
+                rollup[1] += 1
+
+        for group_id, changes in group_changes.items():
+            apply_group_balance_changes(group_id, changes)
+        apply_spending_rollup_changes(rollup_changes)
+
+        # bulk_create sends no signals, so everyone the import touched is bumped at once.
+        bump_data_versions(
+            student_ids=[user.id] + [
+                student_id
+                for expense, splits in expenses
+                for student_id in [expense.paid_by_id] + [split.student_id for split in splits]
+            ],
+            group_ids=group_changes,
+        )
+
+    errors.sort(key=lambda error: error["row"])
+    return len(expenses), errors
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from CoreAuth.models import (
+    Student,
+)
+from expenses.models import (
+    ExpenseSplit,
+)
+
+
+class Command(BaseCommand):
+    help = "Fill ExpenseSplit.student for existing splits by matching their email to a Student."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Number of distinct emails resolved per batch.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        emails = list(
+            ExpenseSplit.objects.filter(student__isnull=True)
+            .values_list('email', flat=True)
+            .distinct()
+            .order_by('email')
+        )
+
+        updated = 0
+        for start in range(0, len(emails), batch_size):
+            student_ids = dict(
+                Student.objects.filter(email__in=emails[start:start + batch_size]).values_list('email', 'id')
+            )
+            with transaction.atomic():
+                for email, student_id in student_ids.items():
+                    updated += ExpenseSplit.objects.filter(student__isnull=True, email=email).update(student_id=student_id)
+
+        unmatched = ExpenseSplit.objects.filter(student__isnull=True).count()
+        self.stdout.write(self.style.SUCCESS(f"Linked {updated} splits to students; {unmatched} splits have no matching student."))
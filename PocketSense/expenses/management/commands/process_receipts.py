@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from expenses.models import (
+    Expense,
+)
+from expenses.receipts import (
+    process_receipt,
+)
+
+
+class Command(BaseCommand):
+    help = "Downscale, thumbnail and deduplicate receipts that have not been processed yet."
+
+    def handle(self, *args, **options):
+        expense_ids = list(
+            Expense.objects.filter(receipt_hash__isnull=True)
+            .exclude(receipt_image__isnull=True)
+            .exclude(receipt_image='')
+            .values_list('id', flat=True)
+        )
+
+        for expense_id in expense_ids:
+            process_receipt(expense_id)
+
+        processed = Expense.objects.filter(id__in=expense_ids, receipt_hash__isnull=False).count()
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} of {len(expense_ids)} receipts."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from expenses.models import (
+    IdempotencyKey,
+)
+from expenses.utils import (
+    idempotency_cutoff,
+)
+
+
+class Command(BaseCommand):
+    help = "Delete stored Idempotency-Key responses older than IDEMPOTENCY_KEY_TTL_HOURS."
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyKey.objects.filter(created_at__lt=idempotency_cutoff()).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired idempotency keys."))
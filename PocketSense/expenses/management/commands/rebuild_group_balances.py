@@ -0,0 +1,64 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from expenses.models import (
+    Group,
+    GroupBalance,
+)
+from expenses.utils import (
+    compute_group_balances,
+)
+
+
+class Command(BaseCommand):
+    help = "Rebuild the GroupBalance ledger from expense and settlement history, or verify it with --verify."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group', type=int, action='append', dest='group_ids', help="Only process this group id (repeatable).")
+        parser.add_argument('--verify', action='store_true', help="Report ledger rows that differ from the history without writing.")
+
+    def handle(self, *args, **options):
+        group_ids = options['group_ids']
+        if group_ids is None:
+            group_ids = list(Group.objects.values_list('id', flat=True))
+
+        expected = compute_group_balances(group_ids)
+
+        stored = {}
+        for group_id, member_id, net_amount in GroupBalance.objects.filter(group_id__in=group_ids).values_list(
+            'group_id', 'member_id', 'net_amount'
+        ):
+            stored.setdefault(group_id, {})[member_id] = net_amount
+
+        mismatched = []
+        for group_id in group_ids:
+            expected_rows = {k: v for k, v in expected.get(group_id, {}).items() if v}
+            stored_rows = {k: v for k, v in stored.get(group_id, {}).items() if v}
+            if expected_rows == stored_rows:
+                continue
+
+            mismatched.append(group_id)
+            for member_id in sorted(expected_rows.keys() | stored_rows.keys()):
+                expected_amount = expected_rows.get(member_id, Decimal('0'))
+                stored_amount = stored_rows.get(member_id, Decimal('0'))
+                if expected_amount != stored_amount:
+                    self.stdout.write(
+                        f"Group {group_id}, member {member_id}: ledger {stored_amount}, expected {expected_amount}"
+                    )
+
+            if not options['verify']:
+                with transaction.atomic():
+                    GroupBalance.objects.filter(group_id=group_id).delete()
+                    GroupBalance.objects.bulk_create([
+                        GroupBalance(group_id=group_id, member_id=member_id, net_amount=amount)
+                        for member_id, amount in expected_rows.items()
+                    ])
+
+        if options['verify']:
+            if mismatched:
+                raise CommandError(f"{len(mismatched)} of {len(group_ids)} group ledgers are out of date.")
+            self.stdout.write(self.style.SUCCESS(f"All {len(group_ids)} group ledgers match their history."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(mismatched)} of {len(group_ids)} group ledgers."))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from expenses.models import (
+    Expense,
+    SpendingRollup,
+)
+from expenses.utils import (
+    spending_rollup_rows,
+)
+
+
+class Command(BaseCommand):
+    help = "Rebuild the monthly SpendingRollup table from raw expenses."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--student', type=int, action='append', dest='student_ids', help="Only rebuild this student id (repeatable).")
+
+    def handle(self, *args, **options):
+        expenses = Expense.objects.all()
+        rollups = SpendingRollup.objects.all()
+        if options['student_ids']:
+            expenses = expenses.filter(student_id__in=options['student_ids'])
+            rollups = rollups.filter(student_id__in=options['student_ids'])
+
+        with transaction.atomic():
+            rollups.delete()
+            created = SpendingRollup.objects.bulk_create(
+                (SpendingRollup(**row) for row in spending_rollup_rows(expenses)),
+                batch_size=1000,
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(created)} spending rollup rows."))
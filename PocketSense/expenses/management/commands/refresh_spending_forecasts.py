@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from CoreAuth.models import (
+    Student,
+)
+from expenses.forecasting import (
+    refresh_forecasts,
+)
+
+
+class Command(BaseCommand):
+    help = "Refresh the per-category spending forecasts of every student."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--student', type=int, action='append', dest='student_ids', help="Only refresh this student id (repeatable).")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Students refreshed per batch.")
+        parser.add_argument('--rebuild', action='store_true', help="Refit from history instead of replaying new days.")
+
+    def handle(self, *args, **options):
+        students = Student.objects.order_by('id')
+        if options['student_ids']:
+            students = students.filter(id__in=options['student_ids'])
+
+        started = time.monotonic()
+        written = 0
+        chunk = []
+        for student_id in students.values_list('id', flat=True).iterator(chunk_size=options['chunk_size']):
+            chunk.append(student_id)
+            if len(chunk) == options['chunk_size']:
+                written += refresh_forecasts(chunk, rebuild=options['rebuild'])
+                chunk = []
+        if chunk:
+            written += refresh_forecasts(chunk, rebuild=options['rebuild'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed {written} spending forecasts in {time.monotonic() - started:.1f}s."
+        ))
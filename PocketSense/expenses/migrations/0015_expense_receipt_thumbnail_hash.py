@@ -0,0 +1,23 @@
+# Generated by Django 4.2.17 on 2026-10-18 08:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0014_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='receipt_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='receipt_thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='receipts/thumbnails/'),
+        ),
+    ]
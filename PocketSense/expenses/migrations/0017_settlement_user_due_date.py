@@ -0,0 +1,17 @@
+# Generated by Django 4.2.17 on 2026-10-18 08:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0016_spendingrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='settlement',
+            index=models.Index(fields=['user', 'due_date', 'id'], name='settlement_user_due_date'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.17 on 2026-10-18 08:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0017_settlement_user_due_date'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['student', 'created_at', 'id'], name='expense_student_created'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['paid_by', 'created_at', 'id'], name='expense_paid_by_created'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['group', 'created_at', 'id'], name='expense_group_created'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['category', 'created_at', 'id'], name='expense_category_created'),
+        ),
+        migrations.AddIndex(
+            model_name='expensesplit',
+            index=models.Index(fields=['student', 'expense'], name='expense_split_student'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.17 on 2026-10-18 08:16
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('expenses', '0018_expense_history_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendingForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.FloatField(default=0)),
+                ('trend', models.FloatField(default=0)),
+                ('weekday_effects', models.JSONField(default=list)),
+                ('fitted_through', models.DateField()),
+                ('month', models.DateField()),
+                ('month_to_date', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('budget_limit', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('projected_month_end', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('budget_exhausted_on', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='expenses.category')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spending_forecasts', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='spendingforecast',
+            constraint=models.UniqueConstraint(fields=('student', 'category'), name='unique_spending_forecast'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.17 on 2026-10-18 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0020_dataversion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='settlement',
+            index=models.Index(fields=['due_date', 'borrower'], name='settlement_due_date_borrower'),
+        ),
+    ]
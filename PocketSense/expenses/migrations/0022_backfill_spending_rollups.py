@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def backfill_spending_rollups(apps, schema_editor):
+    """
+    Build SpendingRollup from the expenses written before it existed, as rebuild_spending_rollups does.
+    """
+    from expenses.utils import spending_rollup_rows
+
+    Expense = apps.get_model('expenses', 'Expense')
+    SpendingRollup = apps.get_model('expenses', 'SpendingRollup')
+
+    SpendingRollup.objects.all().delete()
+    SpendingRollup.objects.bulk_create(
+        (SpendingRollup(**row) for row in spending_rollup_rows(Expense.objects.all())),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0021_settlement_due_date_borrower'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_spending_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def backfill_group_balances(apps, schema_editor):
+    """
+    Build GroupBalance from the expenses and settlements written before it existed, as rebuild_group_balances does.
+    """
+    from expenses.utils import compute_group_balances
+
+    GroupBalance = apps.get_model('expenses', 'GroupBalance')
+
+    GroupBalance.objects.all().delete()
+    GroupBalance.objects.bulk_create(
+        (
+            GroupBalance(group_id=group_id, member_id=member_id, net_amount=amount)
+            for group_id, balances in compute_group_balances().items()
+            for member_id, amount in balances.items() if amount
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0022_backfill_spending_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_group_balances, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 
 # Create your models here.
 from django.conf import settings  
+from django.core.serializers.json import DjangoJSONEncoder
 from CoreAuth.models import (
     Student,
 )
@@ -41,6 +42,8 @@ class Expense(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name="created_expenses")
     paid_by = models.ForeignKey(Student, on_delete=models.CASCADE, related_name="paid_expenses")
     receipt_image = models.ImageField(upload_to='receipts/', null=True, blank=True)
+    receipt_thumbnail = models.ImageField(upload_to='receipts/thumbnails/', null=True, blank=True)
+    receipt_hash = models.CharField(max_length=64, null=True, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     paid_by_you = models.BooleanField(default=False)
@@ -50,6 +53,12 @@ class Expense(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['student', 'created_at', 'id'], name='expense_student_created'),
+            models.Index(fields=['paid_by', 'created_at', 'id'], name='expense_paid_by_created'),
+            models.Index(fields=['group', 'created_at', 'id'], name='expense_group_created'),
+            models.Index(fields=['category', 'created_at', 'id'], name='expense_category_created'),
+        ]
 
 
 class ExpenseSplit(models.Model):
@@ -58,6 +67,11 @@ class ExpenseSplit(models.Model):
     email = models.EmailField() 
     amount = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['student', 'expense'], name='expense_split_student'),
+        ]
+
     def __str__(self):
         return f"{self.email} owes {self.amount} for {self.expense}"
     
@@ -71,18 +85,130 @@ class Settlement(models.Model):
     )
     payment_status = models.CharField(max_length=20, choices=PaymentStatusEnum.choices(), default=PaymentStatusEnum.Pending.value)
     settlement_method = models.CharField(max_length=20, choices=PaymentMethodEnum.choices())
+    group = models.ForeignKey(Group, on_delete=models.SET_NULL, related_name="settlements", null=True, blank=True)
     amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     due_date = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'due_date', 'id'], name='settlement_user_due_date'),
+            models.Index(fields=['due_date', 'borrower'], name='settlement_due_date_borrower'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.payment_status}"
 
+class GroupBalance(models.Model):
+    """
+    Running net balance of a member within a group.
+
+    Positive means the member is owed money. Kept in step with expense and
+    completed settlement writes so suggestions never replay the group history.
+    """
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name="balances")
+    member = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="group_balances")
+    net_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['group', 'member'], name='unique_group_balance_member'),
+        ]
+
+    def __str__(self):
+        return f"{self.member} - {self.group} - {self.net_amount}"
+
+class SpendingRollup(models.Model):
+    """
+    Monthly spending totals per student and category, kept in step with expense writes.
+
+    Readers always Sum over rows, so two rows for the same key (possible when
+    a category is deleted or two writers race) still add up correctly.
+    """
+    student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="spending_rollups")
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
+    month = models.DateField()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['student', 'month'], name='spending_rollup_student_month'),
+        ]
+
+    def __str__(self):
+        return f"{self.student} - {self.category} - {self.month:%Y-%m} - {self.total}"
+
 class Budget(models.Model):
     student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     budget_limit = models.DecimalField(max_digits=10, decimal_places=2)
     
     def __str__(self):
-        return f"{self.category.name} - {self.budget_limit}"
\ No newline at end of file
+        return f"{self.category.name} - {self.budget_limit}"
+
+class SpendingForecast(models.Model):
+    """
+    Fitted daily-spend model and month-end projection per student and category.
+
+    `level`, `trend` and `weekday_effects` are the smoothing state after folding
+    in every day up to `fitted_through`, so a refresh only has to replay the days
+    since then. The projection fields are for `month`.
+    """
+    student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="spending_forecasts")
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    level = models.FloatField(default=0)
+    trend = models.FloatField(default=0)
+    weekday_effects = models.JSONField(default=list)
+    fitted_through = models.DateField()
+    month = models.DateField()
+    month_to_date = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    budget_limit = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    projected_month_end = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    budget_exhausted_on = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'category'], name='unique_spending_forecast'),
+        ]
+
+    def __str__(self):
+        return f"{self.student} - {self.category} - {self.projected_month_end}"
+
+class DataVersion(models.Model):
+    """
+    Counter bumped whenever data that a student's read endpoints depend on changes.
+
+    Conditional GETs compare it with the client's ETag, so a 304 costs one
+    primary-key lookup.
+    """
+    student = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name="data_version")
+    version = models.PositiveBigIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.student} - v{self.version}"
+
+class IdempotencyKey(models.Model):
+    """
+    Response of a write request, replayed when a client retries with the same Idempotency-Key.
+
+    A row with no status code is a request that is still in flight.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="idempotency_keys")
+    key = models.CharField(max_length=255)
+    endpoint = models.CharField(max_length=255)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key', 'endpoint'], name='unique_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.endpoint} - {self.key}"
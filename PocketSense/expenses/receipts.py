@@ -0,0 +1,109 @@
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import (
+    Expense,
+)
+
+logger = logging.getLogger(__name__)
+
+RECEIPT_MAX_DIMENSION = 1600
+RECEIPT_THUMBNAIL_SIZE = (320, 320)
+RECEIPT_JPEG_QUALITY = 80
+
+_executor = None
+
+
+def _encode(image, size):
+    image = image.copy()
+    image.thumbnail(size)
+    buffer = BytesIO()
+    # Saving without passing `exif` drops the camera metadata, GPS included.
+    image.save(buffer, format='JPEG', quality=RECEIPT_JPEG_QUALITY, optimize=True, progressive=True)
+    return ContentFile(buffer.getvalue())
+
+
+def _store(name, content):
+    if default_storage.exists(name):
+        return
+    saved_name = default_storage.save(name, content)
+    if saved_name != name:
+        # Another worker stored the same blob first; keep theirs.
+        default_storage.delete(saved_name)
+
+
+def process_receipt(expense_id):
+    """
+    Re-encode an expense's receipt and generate its thumbnail.
+
+    Files are stored under the SHA-256 of the original upload, so identical
+    uploads share one downscaled blob and one thumbnail. The original upload
+    is deleted once no expense points at it.
+    """
+    expense = Expense.objects.filter(id=expense_id).only('receipt_image', 'receipt_hash').first()
+    if not expense or not expense.receipt_image or expense.receipt_hash:
+        return
+
+    original_name = expense.receipt_image.name
+    with expense.receipt_image.open('rb') as receipt:
+        data = receipt.read()
+
+    digest = hashlib.sha256(data).hexdigest()
+    image_name = f"receipts/{digest[:2]}/{digest}.jpg"
+    thumbnail_name = f"receipts/thumbnails/{digest[:2]}/{digest}.jpg"
+
+    if not default_storage.exists(image_name) or not default_storage.exists(thumbnail_name):
+        try:
+            with Image.open(BytesIO(data)) as image:
+                image = ImageOps.exif_transpose(image).convert('RGB')
+                _store(image_name, _encode(image, (RECEIPT_MAX_DIMENSION, RECEIPT_MAX_DIMENSION)))
+                _store(thumbnail_name, _encode(image, RECEIPT_THUMBNAIL_SIZE))
+        except (UnidentifiedImageError, OSError) as e:
+            logger.warning(f"Could not process receipt for expense {expense_id}: {e}")
+            return
+
+    Expense.objects.filter(id=expense_id).update(
+        receipt_image=image_name,
+        receipt_thumbnail=thumbnail_name,
+        receipt_hash=digest,
+    )
+
+    if original_name != image_name and not Expense.objects.filter(receipt_image=original_name).exists():
+        default_storage.delete(original_name)
+
+
+def _process_in_background(expense_id):
+    close_old_connections()
+    try:
+        process_receipt(expense_id)
+    except Exception:
+        logger.exception(f"Receipt processing failed for expense {expense_id}")
+    finally:
+        close_old_connections()
+
+
+def schedule_receipt_processing(expense_id):
+    """
+    Process a receipt on a background thread so the request does not wait for Pillow.
+
+    Set RECEIPT_PROCESSING_WORKERS to 0 to process inline instead. Anything missed,
+    for example because the process exited, is picked up by `process_receipts`.
+    """
+    global _executor
+
+    workers = getattr(settings, 'RECEIPT_PROCESSING_WORKERS', 2)
+    if not workers:
+        process_receipt(expense_id)
+        return
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='receipts')
+    _executor.submit(_process_in_background, expense_id)
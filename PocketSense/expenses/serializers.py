@@ -12,6 +12,8 @@ from rest_framework.serializers import (
     
 )
 from rest_framework.serializers import ValidationError
+from django.db import transaction
+from django.db.models import Q
 
 from .models import (
     Category,
@@ -20,6 +22,7 @@ from .models import (
     Group,
     Settlement,
     Budget,
+    SpendingForecast,
 )
 
 from CoreAuth.models import (
@@ -35,10 +38,33 @@ from .enums import (
     PaymentMethodEnum,
 )
 
+from .receipts import (
+    schedule_receipt_processing,
+)
+
+from .versioning import (
+    bump_data_versions,
+)
+
 from .utils import (
     handle_expense_split,
+    expense_balance_changes,
+    settlement_balance_changes,
+    apply_group_balance_changes,
+    apply_spending_rollup_changes,
+    month_start,
 )
 
+def validate_group_membership(serializer, group):
+    """
+    Only members may write to a group, since the write moves the group's balance ledger.
+    """
+    request = serializer.context.get('request')
+    if group and not group.members.filter(id=request.user.id).exists():
+        raise ValidationError("You are not a member of this group.")
+    return group
+
+
 class CategorieSerializer(ModelSerializer):
     class Meta:
         model = Category
@@ -48,12 +74,54 @@ class ExpenseSplitSerializer(Serializer):
     email = EmailField(required=True)
     amount = DecimalField(max_digits=10, decimal_places=2)
             
+class ExpenseSplitDetailSerializer(ModelSerializer):
+    class Meta:
+        model = ExpenseSplit
+        fields = ['student', 'email', 'amount']
+
+
+class ExpenseHistorySerializer(ModelSerializer):
+    category_name = CharField(source='category.name', read_only=True, default=None)
+    paid_by_email = EmailField(source='paid_by.email', read_only=True)
+    splits = ExpenseSplitDetailSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Expense
+        fields = [
+            'id', 'amount', 'category', 'category_name', 'group', 'split_type', 'student',
+            'paid_by', 'paid_by_email', 'paid_by_you', 'receipt_image', 'receipt_thumbnail',
+            'splits', 'created_at',
+        ]
+        read_only_fields = fields
+
+
 class ExpenseSerializer(ModelSerializer):
     splits = ExpenseSplitSerializer(many=True, write_only=True)
 
     class Meta:
         model = Expense
-        fields = ['amount', 'category', 'split_type', 'receipt_image', 'splits', 'student', 'paid_by', 'paid_by_you']
+        fields = ['amount', 'category', 'group', 'split_type', 'receipt_image', 'receipt_thumbnail', 'splits', 'student', 'paid_by', 'paid_by_you']
+        read_only_fields = ['receipt_thumbnail']
+
+    def validate(self, data):
+        group = data.get('group')
+        if group:
+            # Everyone on a group expense gets a ledger row, so the requester, the payer and
+            # every participant have to be members for the balances to keep summing to zero.
+            user_id = self.context['request'].user.id
+            emails = {split.get('email') for split in data.get('splits', [])}
+            members = group.members.filter(
+                Q(email__in=emails) | Q(id__in=(user_id, data['paid_by'].id))
+            ).values_list('id', 'email')
+            member_ids = {member_id for member_id, _ in members}
+            outsiders = sorted(emails - {email for _, email in members})
+            if user_id not in member_ids:
+                raise ValidationError("You are not a member of this group.")
+            if outsiders:
+                raise ValidationError({"splits": f"Not members of this group: {', '.join(outsiders)}"})
+            if data['paid_by'].id not in member_ids:
+                raise ValidationError({"paid_by": "The payer is not a member of this group."})
+        return data
 
     def create(self, validated_data):
         splits_data = validated_data.pop("splits")
@@ -65,16 +133,45 @@ class ExpenseSerializer(ModelSerializer):
         try:
             validated_splits = handle_expense_split(expense_amount, split_type, splits_data)
         except ValidationError as e:
-            raise ValidationError({"splits": str(e)})
+            raise ValidationError({"splits": e.detail})
+
+        student_ids = dict(
+            Student.objects.filter(
+                email__in=[split_data.get('email') for split_data in validated_splits]
+            ).values_list('email', 'id')
+        )
+
+        with transaction.atomic():
+            # Create the Expense object
+            expense = Expense.objects.create(**validated_data)
 
-        # Create the Expense object
-        expense = Expense.objects.create(**validated_data)
+            # Create the associated ExpenseSplit objects in one statement
+            splits = ExpenseSplit.objects.bulk_create([
+                ExpenseSplit(
+                    expense=expense,
+                    student_id=student_ids.get(split_data.get('email')),
+                    email=split_data.get('email'),
+                    amount=split_data.get('amount'),
+                )
+                for split_data in validated_splits
+            ])
+            # bulk_create sends no post_save, so the participants are bumped here.
+            bump_data_versions(student_ids=[split.student_id for split in splits])
 
-        # Create the associated ExpenseSplit objects
-        for split_data in validated_splits:
-            email = split_data.get('email')
-            amount = split_data.get('amount')
-            ExpenseSplit.objects.create(expense=expense, email=email, amount=amount)
+            apply_spending_rollup_changes({
+                (expense.student_id, expense.category_id, month_start(expense.created_at)): (expense.amount, 1),
+            })
+
+            if expense.group_id:
+                changes = expense_balance_changes(
+                    expense.paid_by_id,
+                    expense.amount,
+                    [(split.student_id, split.amount) for split in splits if split.student_id],
+                )
+                apply_group_balance_changes(expense.group_id, changes)
+
+            if expense.receipt_image:
+                transaction.on_commit(lambda: schedule_receipt_processing(expense.id))
 
         return expense
 
@@ -124,6 +221,7 @@ class SettlementSerializer(ModelSerializer):
         fields = [
             'id',
             'borrower',
+            'group',
             'payment_status',
             'payment_status_display',
             'settlement_method',
@@ -135,15 +233,34 @@ class SettlementSerializer(ModelSerializer):
         ]
         read_only_fields = ['created_at', 'updated_at','user',]
 
+    def validate_group(self, value):
+        return validate_group_membership(self, value)
+
     def validate_payment_status(self, value):
         if value not in PaymentStatusEnum.values():
-            raise serializers.ValidationError(f"Invalid payment status. Choices are: {PaymentStatusEnum.help()}")
+            raise ValidationError(f"Invalid payment status. Choices are: {PaymentStatusEnum.help()}")
         return value
 
     def validate_settlement_method(self, value):
         if value not in PaymentMethodEnum.values():
-            raise serializers.ValidationError(f"Invalid settlement method. Choices are: {PaymentMethodEnum.help()}")
+            raise ValidationError(f"Invalid settlement method. Choices are: {PaymentMethodEnum.help()}")
         return value
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            settlement = super().create(validated_data)
+            apply_group_balance_changes(settlement.group_id, settlement_balance_changes(settlement))
+        return settlement
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            # Undo whatever the settlement contributed before, then apply its new state.
+            previous_group_id = instance.group_id
+            previous_changes = settlement_balance_changes(instance, sign=-1)
+            settlement = super().update(instance, validated_data)
+            apply_group_balance_changes(previous_group_id, previous_changes)
+            apply_group_balance_changes(settlement.group_id, settlement_balance_changes(settlement))
+        return settlement
     
 class CategorizedExpenseSerializer(Serializer):
     category_name = CharField(source = 'category__name')
@@ -160,4 +277,14 @@ class MonthlyBudgetTrackingSerializer(Serializer):
     category_name = CharField(source = 'category__name')
     total_expenses = DecimalField(max_digits=10, decimal_places=2)
     budget_limit = DecimalField(max_digits=10, decimal_places=2)
-    remaining_budget = DecimalField(max_digits=10, decimal_places=2)
\ No newline at end of file
+    remaining_budget = DecimalField(max_digits=10, decimal_places=2)
+
+class SpendingForecastSerializer(ModelSerializer):
+    category_name = CharField(source='category.name')
+
+    class Meta:
+        model = SpendingForecast
+        fields = [
+            'category', 'category_name', 'month', 'month_to_date', 'budget_limit',
+            'projected_month_end', 'budget_exhausted_on', 'updated_at',
+        ]
@@ -0,0 +1,81 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import (
+    Budget,
+    Category,
+    Expense,
+    ExpenseSplit,
+    Group,
+    Settlement,
+)
+from .utils import (
+    apply_group_balance_changes,
+    expense_balance_changes,
+    remove_from_spending_rollup,
+)
+from .versioning import (
+    bump_data_versions,
+)
+
+
+@receiver([post_save, post_delete], sender=Expense)
+def expense_changed(sender, instance, **kwargs):
+    bump_data_versions(student_ids=(instance.student_id, instance.paid_by_id), group_ids=(instance.group_id,))
+
+
+@receiver(post_delete, sender=Expense)
+def expense_deleted(sender, instance, **kwargs):
+    remove_from_spending_rollup(instance)
+
+
+# Reversed before the delete, while the splits are still there. When the whole group
+# is being deleted, its ledger rows are removed after every pre_delete receiver has run.
+@receiver(pre_delete, sender=Expense)
+def expense_deleting(sender, instance, **kwargs):
+    if not instance.group_id:
+        return
+    changes = expense_balance_changes(
+        instance.paid_by_id,
+        instance.amount,
+        instance.splits.filter(student__isnull=False).values_list('student_id', 'amount'),
+    )
+    apply_group_balance_changes(instance.group_id, {member_id: -amount for member_id, amount in changes.items()})
+
+
+@receiver([post_save, post_delete], sender=ExpenseSplit)
+def expense_split_changed(sender, instance, **kwargs):
+    bump_data_versions(student_ids=(instance.student_id,))
+
+
+@receiver([post_save, post_delete], sender=Settlement)
+def settlement_changed(sender, instance, **kwargs):
+    bump_data_versions(student_ids=(instance.user_id, instance.borrower_id), group_ids=(instance.group_id,))
+
+
+@receiver([post_save, post_delete], sender=Budget)
+def budget_changed(sender, instance, **kwargs):
+    bump_data_versions(student_ids=(instance.student_id,))
+
+
+# Categories are bumped before a delete, while their expenses still point at them.
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    bump_data_versions(category_ids=(instance.pk,))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    bump_data_versions(student_ids=(instance.created_by_id,))
+
+
+@receiver(m2m_changed, sender=Group.members.through)
+def group_members_changed(sender, instance, action, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, Group):
+        bump_data_versions(student_ids=(instance.created_by_id,))
+    else:
+        bump_data_versions(group_ids=pk_set or ())
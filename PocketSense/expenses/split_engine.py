@@ -0,0 +1,224 @@
+from decimal import Decimal, InvalidOperation
+from math import gcd, lcm
+
+import numpy as np
+from django.core.exceptions import ValidationError
+
+SPLIT_TYPES = ('equal', 'percentage', 'custom', 'proportional', 'fixed_with_remainder')
+
+INT64_MAX = np.iinfo(np.int64).max
+
+
+def _number(value, label):
+    """
+    Exact numeric value of a split field; ints stay ints to keep the common case cheap.
+    """
+    if type(value) is int or (type(value) is Decimal and value.is_finite()):
+        return value
+    if isinstance(value, bool):
+        raise ValidationError(f"Each participant must have a valid {label}.")
+    try:
+        number = Decimal(str(value))
+    except (InvalidOperation, ValueError, TypeError):
+        raise ValidationError(f"Each participant must have a valid {label}.")
+    if not number.is_finite():
+        raise ValidationError(f"Each participant must have a valid {label}.")
+    return number
+
+
+def _paise(value, label):
+    paise = _number(value, label) * 100
+    if type(paise) is int:
+        return paise
+    if paise != paise.to_integral_value():
+        raise ValidationError(f"{label.capitalize()} must have at most two decimal places.")
+    return int(paise)
+
+
+def _integer_weights(weights):
+    """
+    Scale int or Decimal weights to the smallest integers with the same ratios.
+    """
+    try:
+        divisor = gcd(*weights)
+    except TypeError:
+        ratios = [weight.as_integer_ratio() for weight in weights]
+        scale = lcm(*(denominator for _, denominator in ratios))
+        weights = [numerator * (scale // denominator) for numerator, denominator in ratios]
+        divisor = gcd(*weights)
+    if divisor <= 1:
+        return weights
+    return [weight // divisor for weight in weights]
+
+
+def _plan(amount, split_type, splits_data):
+    """
+    Reduce one expense to (pool, fixed, weights) in paise.
+
+    Every split type becomes the same problem: each participant gets a fixed
+    number of paise plus a weighted share of a common pool.
+    """
+    if not splits_data:
+        raise ValidationError("No participants in the split.")
+
+    total = _paise(amount, "amount")
+    count = len(splits_data)
+
+    if split_type == 'equal':
+        return total, [0] * count, [1] * count
+
+    if split_type == 'percentage':
+        percentages = [_number(split.get('percentage', 0), "percentage") for split in splits_data]
+        if sum(percentages) != 100:
+            raise ValidationError("Total percentage does not sum up to 100.")
+        if any(percentage < 0 for percentage in percentages):
+            raise ValidationError("Percentages cannot be negative.")
+        return total, [0] * count, _integer_weights(percentages)
+
+    if split_type == 'custom':
+        if any('amount' not in split for split in splits_data):
+            raise ValidationError("Each participant must have a valid amount in the custom split.")
+        amounts = [_paise(split['amount'], "amount") for split in splits_data]
+        if sum(amounts) != total:
+            raise ValidationError(f"Total custom amounts must sum to {Decimal(total) / 100:.2f}.")
+        return 0, amounts, [1] * count
+
+    if split_type == 'proportional':
+        factors = [_number(split.get('factor', 0), "factor") for split in splits_data]
+        if sum(factors) == 0:
+            raise ValidationError("Total factor cannot be zero.")
+        if any(factor < 0 for factor in factors):
+            raise ValidationError("Factors cannot be negative.")
+        return total, [0] * count, _integer_weights(factors)
+
+    if split_type == 'fixed_with_remainder':
+        fixed = [_paise(split['fixed_amount'], "fixed amount") if 'fixed_amount' in split else 0 for split in splits_data]
+        if sum(fixed) >= total:
+            raise ValidationError("Fixed amounts cannot exceed or equal the total expense.")
+        weights = [0 if 'fixed_amount' in split else 1 for split in splits_data]
+        if not any(weights):
+            raise ValidationError("No participants to pay the remainder amount.")
+        return total - sum(fixed), fixed, weights
+
+    raise ValidationError(f"Unknown split type: {split_type}")
+
+
+def _check_range(pool, weights):
+    """
+    Refuse weights whose products with the pool would overflow the batch engine's int64 arrays.
+
+    Both split paths apply it, so an expense is accepted or refused the same way
+    whether it comes in alone or in a batch.
+    """
+    if pool and pool * max(weights) > INT64_MAX:
+        raise ValidationError("Split weights are too large or too precise.")
+
+
+def split_expense(amount, split_type, splits_data):
+    """
+    Split one expense into exact integer paise with plain Python ints.
+
+    Gives the same result as `split_expense_batch` for a single expense, without
+    the cost of building NumPy arrays for a handful of participants.
+
+    Returns:
+        list: Paise per participant.
+
+    Raises:
+        ValidationError: If the expense could not be split.
+    """
+    pool, fixed, weights = _plan(amount, split_type, splits_data)
+    _check_range(pool, weights)
+
+    count = len(weights)
+    if weights.count(weights[0]) == count:
+        share, leftover = divmod(pool, count)
+        shares = [share + 1] * leftover + [share] * (count - leftover)
+    else:
+        weight_total = sum(weights) or 1
+        products = [pool * weight for weight in weights]
+        shares = [product // weight_total for product in products]
+        leftover = pool - sum(shares)
+        if leftover:
+            remainders = [product % weight_total for product in products]
+            # sorted() is stable, so ties go to the earlier participant.
+            for position in sorted(range(count), key=remainders.__getitem__, reverse=True)[:leftover]:
+                shares[position] += 1
+
+    if any(fixed):
+        return [share + amount for share, amount in zip(shares, fixed)]
+    return shares
+
+
+def split_expense_batch(expenses):
+    """
+    Split many expenses at once into exact integer paise.
+
+    Each pool is divided in proportion to the participants' weights with NumPy;
+    paise lost to flooring are handed out one at a time by largest remainder,
+    ties going to the earlier participant, so every expense sums exactly to
+    its amount and the same input always gives the same split.
+
+    Args:
+        expenses (iterable): (amount, split_type, splits_data) tuples in the same
+            shape `handle_expense_split` accepts.
+
+    Returns:
+        list: One entry per expense, either a list of paise per participant or
+        the ValidationError explaining why the expense could not be split.
+    """
+    results = []
+    pools, counts, weights = [], [], []
+    fixed = {}
+
+    for amount, split_type, splits_data in expenses:
+        try:
+            pool, expense_fixed, expense_weights = _plan(amount, split_type, splits_data)
+        except ValidationError as e:
+            results.append(e)
+            continue
+
+        try:
+            _check_range(pool, expense_weights)
+        except ValidationError as e:
+            results.append(e)
+            continue
+
+        if any(expense_fixed):
+            fixed[len(weights)] = expense_fixed
+        results.append(len(pools))
+        pools.append(pool)
+        counts.append(len(expense_weights))
+        weights.extend(expense_weights)
+
+    if not pools:
+        return results
+
+    bounds = [0]
+    for count in counts:
+        bounds.append(bounds[-1] + count)
+
+    pools = np.array(pools, dtype=np.int64)
+    weights = np.array(weights, dtype=np.int64)
+    starts = np.array(bounds[:-1], dtype=np.int64)
+    owners = np.repeat(np.arange(len(pools)), counts)
+
+    weight_totals = np.add.reduceat(weights, starts)
+    weight_totals[weight_totals == 0] = 1
+    shares, remainders = np.divmod(pools[owners] * weights, weight_totals[owners])
+
+    # Participants are contiguous per expense, so sorting by (expense, -remainder, position)
+    # and subtracting each expense's start gives every participant's remainder rank.
+    leftover = pools - np.add.reduceat(shares, starts)
+    positions = np.arange(len(owners))
+    order = np.lexsort((positions, -remainders, owners))
+    ranks = positions - starts[owners]
+    shares[order] += ranks < leftover[owners]
+    shares = shares.tolist()
+    for offset, expense_fixed in fixed.items():
+        for position, amount in enumerate(expense_fixed, start=offset):
+            shares[position] += amount
+    return [
+        result if isinstance(result, ValidationError) else shares[bounds[result]:bounds[result + 1]]
+        for result in results
+    ]
@@ -1,3 +1,1765 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import json
+from contextlib import redirect_stdout
+import re
+import tempfile
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from importlib import import_module
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock, skipIf
+from uuid import UUID
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+import numpy as np
+from django.apps import apps as django_apps
+from django.core import mail
+from django.core.cache import caches
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from django.db.models import Q
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import ValidationError
+from rest_framework.test import APIClient
+from rest_framework.throttling import BaseThrottle
+
+from CoreAuth.models import (
+    OutboxEmail,
+    Student,
+)
+from scripts import payment_reminder
+from utils.renderers import (
+    ORJSONRenderer,
+)
+from .models import (
+    Budget,
+    Category,
+    DataVersion,
+    Expense,
+    ExpenseSplit,
+    Group,
+    GroupBalance,
+    Settlement,
+    SpendingForecast,
+    SpendingRollup,
+)
+from .analytics import (
+    ExpenseSeries,
+)
+from .forecasting import (
+    project_month_end,
+)
+from .split_engine import (
+    split_expense,
+    split_expense_batch,
+)
+from .enums import (
+    SettlementModeEnum,
+)
+from .views import (
+    BudgetAnalysisView,
+    SpendingPatternsView,
+)
+from .utils import (
+    compute_group_balances,
+    consume_budget,
+    handle_expense_split,
+    simplify_debts,
+    start_of_day,
+)
+
+
+def create_student(index):
+    return Student.objects.create_user(
+        username=f"student{index}",
+        email=f"student{index}@college.com",
+        password="password",
+    )
+
+
+def expense_payload(category, amount):
+    return {
+        "amount": str(amount),
+        "category": category.id,
+        "split_type": "equal",
+        "paid_by_you": True,
+        "splits": [],
+    }
+
+
+class ExpenseBudgetTests(TestCase):
+
+    def setUp(self):
+        self.student = create_student(0)
+        self.category = Category.objects.create(name="Food", created_by=self.student)
+        self.budget = Budget.objects.create(student=self.student, category=self.category, budget_limit=Decimal("100.00"))
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def test_expense_within_budget_decrements_limit(self):
+        response = self.client.post("/expenses/create/", expense_payload(self.category, 40), format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.budget_limit, Decimal("60.00"))
+
+    def test_expense_over_budget_is_rejected(self):
+        response = self.client.post("/expenses/create/", expense_payload(self.category, 150), format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Expense.objects.exists())
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.budget_limit, Decimal("100.00"))
+
+    def test_expense_without_budget_is_created(self):
+        other_category = Category.objects.create(name="Travel", created_by=self.student)
+
+        response = self.client.post("/expenses/create/", expense_payload(other_category, 500), format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Expense.objects.count(), 1)
+
+
+class SimplifyDebtsTests(TestCase):
+    # Two groups that each settle among themselves; greedy matching across them needs 5 transfers, not 4.
+    balances = {
+        "a@college.com": Decimal("2.00"),
+        "b@college.com": Decimal("7.00"),
+        "c@college.com": Decimal("-9.00"),
+        "d@college.com": Decimal("-5.00"),
+        "e@college.com": Decimal("-8.00"),
+        "f@college.com": Decimal("13.00"),
+    }
+
+    def assertSettles(self, balances, transfers):
+        remaining = dict(balances)
+        for transfer in transfers:
+            self.assertGreater(transfer["amount"], 0)
+            remaining[transfer["from"]] += transfer["amount"]
+            remaining[transfer["to"]] -= transfer["amount"]
+        self.assertEqual(set(remaining.values()), {Decimal("0")})
+
+    def test_greedy_settles_every_balance(self):
+        transfers = simplify_debts(self.balances, SettlementModeEnum.Greedy.value)
+
+        self.assertSettles(self.balances, transfers)
+        self.assertEqual(len(transfers), 5)
+
+    def test_min_transfers_settles_zero_sum_groups_separately(self):
+        transfers = simplify_debts(self.balances, SettlementModeEnum.MinTransfers.value)
+
+        self.assertSettles(self.balances, transfers)
+        self.assertEqual(len(transfers), 4)
+        blocks = [{"a@college.com", "b@college.com", "c@college.com"}, {"d@college.com", "e@college.com", "f@college.com"}]
+        for transfer in transfers:
+            self.assertTrue(any({transfer["from"], transfer["to"]} <= block for block in blocks))
+
+    def test_min_transfers_never_uses_more_transfers_than_greedy(self):
+        cases = [
+            self.balances,
+            {"a": Decimal("10.00"), "b": Decimal("-10.00"), "c": Decimal("4.50"), "d": Decimal("-4.50")},
+            {"a": Decimal("33.33"), "b": Decimal("33.34"), "c": Decimal("-33.33"), "d": Decimal("-33.34")},
+            {"a": Decimal("-1.00"), "b": Decimal("-2.00"), "c": Decimal("-3.00"), "d": Decimal("6.00")},
+        ]
+        for balances in cases:
+            with self.subTest(balances=balances):
+                greedy = simplify_debts(balances, SettlementModeEnum.Greedy.value)
+                minimal = simplify_debts(balances, SettlementModeEnum.MinTransfers.value)
+                self.assertSettles(balances, minimal)
+                self.assertLessEqual(len(minimal), len(greedy))
+
+    def test_min_transfers_falls_back_to_greedy_for_large_groups(self):
+        with mock.patch("expenses.utils.MIN_TRANSFERS_MAX_PARTIES", 5), \
+                mock.patch("expenses.utils._zero_sum_blocks") as zero_sum_blocks:
+            transfers = simplify_debts(self.balances, SettlementModeEnum.MinTransfers.value)
+
+        zero_sum_blocks.assert_not_called()
+        self.assertSettles(self.balances, transfers)
+        self.assertEqual(transfers, simplify_debts(self.balances, SettlementModeEnum.Greedy.value))
+
+    def test_settled_balances_need_no_transfers(self):
+        for mode in SettlementModeEnum.values():
+            with self.subTest(mode=mode):
+                self.assertEqual(simplify_debts({"a": Decimal("0"), "b": Decimal("0.00")}, mode), [])
+                # Less than half a paisa rounds away.
+                self.assertEqual(simplify_debts({"a": Decimal("0.004"), "b": Decimal("-0.004")}, mode), [])
+                self.assertEqual(simplify_debts({}, mode), [])
+
+    def test_unknown_mode_is_rejected(self):
+        with self.assertRaises(DjangoValidationError):
+            simplify_debts(self.balances, "fewest")
+
+
+class SplitEngineTests(TestCase):
+
+    def split(self, amount, split_type, splits_data):
+        """
+        Split one expense through the batch engine, checking the single-expense path agrees.
+        """
+        result, = split_expense_batch([(amount, split_type, splits_data)])
+        try:
+            single = split_expense(amount, split_type, splits_data)
+        except DjangoValidationError as e:
+            self.assertEqual(e.messages, result.messages)
+        else:
+            self.assertEqual(single, result)
+        return result
+
+    def test_split_types(self):
+        people = [{"email": f"student{index}@college.com"} for index in range(3)]
+        cases = [
+            ("100.00", "equal", people, [3334, 3333, 3333]),
+            ("10.01", "percentage", [dict(person, percentage=share) for person, share in zip(people, (50, 30, 20))], [501, 300, 200]),
+            ("10.00", "custom", [dict(person, amount=share) for person, share in zip(people, ("2.50", "2.50", "5.00"))], [250, 250, 500]),
+            ("10.00", "proportional", [dict(person, factor=share) for person, share in zip(people, (1, 2, "0.5"))], [286, 571, 143]),
+            ("10.00", "fixed_with_remainder", [dict(people[0], fixed_amount="2.00"), people[1], people[2]], [200, 400, 400]),
+        ]
+        for amount, split_type, splits_data, expected in cases:
+            with self.subTest(split_type=split_type):
+                self.assertEqual(self.split(Decimal(amount), split_type, splits_data), expected)
+                self.assertEqual(sum(expected), int(Decimal(amount) * 100))
+
+    def test_largest_remainder_ties_go_to_earlier_participants(self):
+        people = [{"email": f"student{index}@college.com"} for index in range(3)]
+
+        self.assertEqual(self.split(Decimal("0.02"), "equal", people), [1, 1, 0])
+        self.assertEqual(
+            self.split(Decimal("1.00"), "percentage", [dict(person, percentage=share) for person, share in zip(people, ("33.5", "33.5", 33))]),
+            [34, 33, 33],
+        )
+
+    def test_bad_input_is_a_validation_error(self):
+        person = {"email": "student0@college.com"}
+        cases = [
+            ("abc", "equal", [person]),
+            ("1.234", "equal", [person]),
+            ("Infinity", "equal", [person]),
+            ("NaN", "equal", [person]),
+            ("10.00", "equal", []),
+            ("10.00", "unknown", [person]),
+            ("10.00", "percentage", [dict(person, percentage=90)]),
+            ("10.00", "percentage", [dict(person, percentage=150), dict(person, percentage=-50)]),
+            ("10.00", "custom", [dict(person, amount="9.99")]),
+            ("10.00", "proportional", [dict(person, factor=0)]),
+            ("10.00", "fixed_with_remainder", [dict(person, fixed_amount="10.00")]),
+        ]
+        for amount, split_type, splits_data in cases:
+            with self.subTest(amount=amount, split_type=split_type, splits_data=splits_data):
+                self.assertIsInstance(self.split(amount, split_type, splits_data), DjangoValidationError)
+
+        with self.assertRaises(ValidationError):
+            handle_expense_split(Decimal("10.00"), "unknown", [person])
+
+    def test_json_number_amount_is_split_exactly(self):
+        student = create_student(0)
+        category = Category.objects.create(name="Food", created_by=student)
+        client = APIClient()
+        client.force_authenticate(student)
+
+        response = client.post("/expenses/create/", dict(expense_payload(category, 0), amount=12.34), format="json")
+        invalid = client.post("/expenses/create/", dict(expense_payload(category, 0), amount="abc"), format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ExpenseSplit.objects.get().amount, Decimal("12.34"))
+        self.assertEqual(invalid.status_code, 400)
+
+
+class BudgetRaceTests(TestCase):
+    """
+    Interleaves two expense requests by hand, so the race is exercised on SQLite too.
+    """
+
+    def setUp(self):
+        self.student = create_student(0)
+        self.category = Category.objects.create(name="Food", created_by=self.student)
+        self.budget = Budget.objects.create(student=self.student, category=self.category, budget_limit=Decimal("100.00"))
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def post_expense(self, amount):
+        return self.client.post("/expenses/create/", expense_payload(self.category, amount), format="json").status_code
+
+    def test_request_validated_before_the_budget_write_is_refused(self):
+        statuses, interleaved = [], []
+
+        def consume_then_competing_request(*args, **kwargs):
+            consumed = consume_budget(*args, **kwargs)
+            if not interleaved:
+                interleaved.append(True)
+                # A second request that read the full budget lands right after this write.
+                statuses.append(self.post_expense(Decimal("60.00")))
+            return consumed
+
+        with mock.patch("expenses.views.consume_budget", side_effect=consume_then_competing_request):
+            statuses.append(self.post_expense(Decimal("60.00")))
+
+        self.assertEqual(statuses, [400, 200])
+        self.assertEqual(Expense.objects.count(), 1)
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.budget_limit, Decimal("40.00"))
+
+    def test_only_one_budget_row_is_spent(self):
+        duplicate = Budget.objects.create(student=self.student, category=self.category, budget_limit=Decimal("100.00"))
+
+        self.assertTrue(consume_budget(self.student, self.category.id, Decimal("30.00")))
+
+        self.budget.refresh_from_db()
+        duplicate.refresh_from_db()
+        self.assertEqual((self.budget.budget_limit, duplicate.budget_limit), (Decimal("70.00"), Decimal("100.00")))
+
+
+@skipIf(connection.vendor == "sqlite", "SQLite allows a single writer at a time, so there is no concurrency to test.")
+class ConcurrentBudgetTests(TransactionTestCase):
+    threads = 16
+    attempts = 64
+
+    def setUp(self):
+        self.student = create_student(0)
+        self.category = Category.objects.create(name="Food", created_by=self.student)
+        self.budget = Budget.objects.create(student=self.student, category=self.category, budget_limit=Decimal("100.00"))
+
+    def post_expense(self, amount):
+        try:
+            client = APIClient()
+            client.force_authenticate(self.student)
+            return client.post("/expenses/create/", expense_payload(self.category, amount), format="json").status_code
+        finally:
+            connections.close_all()
+
+    def test_concurrent_expenses_never_overspend(self):
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            status_codes = list(pool.map(self.post_expense, [Decimal("5.00")] * self.attempts))
+
+        # 100 / 5 = 20 expenses fit; every other attempt must be rejected, not lost.
+        self.assertEqual(status_codes.count(200), 20)
+        self.assertEqual(status_codes.count(400), self.attempts - 20)
+        self.assertEqual(Expense.objects.count(), 20)
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.budget_limit, Decimal("0.00"))
+
+
+class IdempotencyKeyTests(TestCase):
+
+    def setUp(self):
+        self.student = create_student(0)
+        self.category = Category.objects.create(name="Food", created_by=self.student)
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def test_retry_replays_original_response(self):
+        payload = expense_payload(self.category, 40)
+
+        first = self.client.post("/expenses/create/", payload, format="json", HTTP_IDEMPOTENCY_KEY="abc")
+        retry = self.client.post("/expenses/create/", payload, format="json", HTTP_IDEMPOTENCY_KEY="abc")
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(Expense.objects.count(), 1)
+
+    def test_failed_request_is_not_stored(self):
+        Budget.objects.create(student=self.student, category=self.category, budget_limit=Decimal("10.00"))
+        payload = expense_payload(self.category, 40)
+
+        first = self.client.post("/expenses/create/", payload, format="json", HTTP_IDEMPOTENCY_KEY="abc")
+        Budget.objects.update(budget_limit=Decimal("100.00"))
+        retry = self.client.post("/expenses/create/", payload, format="json", HTTP_IDEMPOTENCY_KEY="abc")
+
+        self.assertEqual(first.status_code, 400)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(Expense.objects.count(), 1)
+
+
+class ExpenseImportTests(TestCase):
+
+    def setUp(self):
+        self.owner, self.second, self.third = (create_student(index) for index in range(3))
+        self.category = Category.objects.create(name="Food", created_by=self.owner)
+        self.group = Group.objects.create(name="Flat", created_by=self.owner)
+        self.group.members.add(self.owner, self.second, self.third)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def upload(self, name, content):
+        response = self.client.post("/expenses/import/", {"file": SimpleUploadedFile(name, content.encode())})
+        self.assertEqual(response.status_code, 200)
+        return response.json()["data"]
+
+    def test_csv_rows_are_imported_with_their_splits(self):
+        splits = json.dumps([{"email": self.second.email}, {"email": self.third.email}]).replace('"', '""')
+        result = self.upload("expenses.csv", (
+            "amount,split_type,splits,category\n"
+            f'30.00,equal,"{splits}",{self.category.id}\n'
+            f'10.00,equal,"{splits}",\n'
+            f'abc,equal,"{splits}",\n'
+            'not json,equal,"[",\n'
+            f'5.00,equal,"[{{""email"": ""nobody@college.com""}}]",\n'
+        ))
+
+        self.assertEqual((result["created"], result["failed"]), (2, 3))
+        self.assertEqual([error["row"] for error in result["errors"]], [3, 4, 5])
+        self.assertIn("nobody@college.com", result["errors"][2]["error"])
+        self.assertEqual(Expense.objects.count(), 2)
+        self.assertEqual(ExpenseSplit.objects.count(), 4)
+        self.assertEqual(
+            sorted(ExpenseSplit.objects.values_list("amount", flat=True)),
+            [Decimal("5.00"), Decimal("5.00"), Decimal("15.00"), Decimal("15.00")],
+        )
+        self.assertEqual(Expense.objects.get(amount=Decimal("30.00")).category, self.category)
+        # Imported rows are historical and leave budgets alone.
+        self.assertFalse(Budget.objects.exists())
+
+    def test_jsonl_group_rows_update_the_ledger(self):
+        rows = [
+            {"amount": "30.00", "split_type": "equal", "group": self.group.id,
+             "splits": [{"email": self.owner.email}, {"email": self.second.email}, {"email": self.third.email}]},
+            {"amount": "12.00", "split_type": "equal", "group": self.group.id, "paid_by": self.second.email,
+             "splits": [{"email": self.owner.email}, {"email": self.second.email}]},
+            "not an object",
+        ]
+        result = self.upload("expenses.jsonl", "\n".join(json.dumps(row) for row in rows) + "\n\n")
+
+        self.assertEqual((result["created"], result["failed"]), (2, 1))
+        self.assertEqual(result["errors"], [{"row": 3, "error": "Line must be a JSON object."}])
+        self.assertEqual(ExpenseSplit.objects.count(), 5)
+        self.assertEqual(
+            dict(GroupBalance.objects.filter(group=self.group).values_list("member_id", "net_amount")),
+            {self.owner.id: Decimal("14.00"), self.second.id: Decimal("-4.00"), self.third.id: Decimal("-10.00")},
+        )
+
+    def test_group_rows_need_member_participants(self):
+        outsider = create_student(3)
+        row = {"amount": "30.00", "split_type": "equal", "group": self.group.id,
+               "splits": [{"email": self.second.email}, {"email": outsider.email}]}
+
+        result = self.upload("expenses.jsonl", json.dumps(row) + "\n")
+
+        self.assertEqual(result["errors"], [{"row": 1, "error": f"Not members of this group: {outsider.email}"}])
+        self.assertFalse(GroupBalance.objects.exists())
+
+    def test_amounts_must_fit_the_amount_column(self):
+        rows = [
+            {"amount": amount, "split_type": "equal", "splits": [{"email": self.owner.email}, {"email": self.second.email}]}
+            for amount in ("7.5", "12.345", "123456789.00", "NaN", "Infinity", "0")
+        ]
+        result = self.upload("expenses.jsonl", "\n".join(json.dumps(row) for row in rows))
+
+        self.assertEqual(result["created"], 1)
+        self.assertEqual([error["row"] for error in result["errors"]], [2, 3, 4, 5, 6])
+        self.assertEqual(result["errors"][0]["error"], "Ensure that there are no more than 2 decimal places.")
+        self.assertEqual(result["errors"][1]["error"], "Ensure that there are no more than 10 digits in total.")
+        self.assertEqual(str(Expense.objects.get().amount), "7.50")
+        self.assertEqual(
+            sorted(ExpenseSplit.objects.values_list("amount", flat=True)), [Decimal("3.75"), Decimal("3.75")]
+        )
+
+    def test_unreadable_files_are_rejected(self):
+        splits = json.dumps([{"email": self.second.email}]).replace('"', '""')
+        files = {
+            "expenses.csv": (
+                f'amount,split_type,splits\n10.00,equal,"{splits}"\n'.encode() + b"\xff\xfe,equal,[]\n",
+                "The file is not valid UTF-8 text.",
+            ),
+            "expenses.jsonl": (
+                b'{"amount": "10.00", "split_type": "equal", "splits": []}\n\x80\n',
+                "The file is not valid UTF-8 text.",
+            ),
+            "large.csv": (
+                f'amount,split_type,splits\n10.00,equal,"{splits}"\n1,equal,{"x" * 200000}\n'.encode(),
+                "The CSV could not be read at row 2: field larger than field limit (131072)",
+            ),
+        }
+        for name, (content, message) in files.items():
+            with self.subTest(file=name):
+                response = self.client.post("/expenses/import/", {"file": SimpleUploadedFile(name, content)})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()["status_message"], message)
+        self.assertFalse(Expense.objects.exists())
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.post("/expenses/import/", {"file": SimpleUploadedFile("expenses.xlsx", b"")})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Expense.objects.exists())
+
+
+@override_settings(RECEIPT_PROCESSING_WORKERS=0)
+class ReceiptProcessingTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        storage_settings = override_settings(MEDIA_ROOT=media_root.name)
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+        self.media_root = Path(media_root.name)
+
+        self.student = create_student(0)
+        self.category = Category.objects.create(name="Food", created_by=self.student)
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def receipt(self, size=(2400, 1200)):
+        buffer = BytesIO()
+        Image.new("RGB", size, (200, 30, 30)).save(buffer, format="PNG")
+        return SimpleUploadedFile("receipt.png", buffer.getvalue(), content_type="image/png")
+
+    def post_with_receipt(self, receipt):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/expenses/create/", {
+                "amount": "12.00",
+                "category": self.category.id,
+                "split_type": "equal",
+                "paid_by_you": "true",
+                "receipt_image": receipt,
+            }, format="multipart")
+        self.assertEqual(response.status_code, 200)
+        return Expense.objects.latest("id")
+
+    def test_receipt_is_downscaled_and_thumbnailed(self):
+        expense = self.post_with_receipt(self.receipt())
+
+        self.assertEqual(len(expense.receipt_hash), 64)
+        self.assertEqual(expense.receipt_image.name, f"receipts/{expense.receipt_hash[:2]}/{expense.receipt_hash}.jpg")
+        with Image.open(expense.receipt_image.path) as image:
+            self.assertEqual((image.format, image.size), ("JPEG", (1600, 800)))
+        with Image.open(expense.receipt_thumbnail.path) as thumbnail:
+            self.assertEqual(thumbnail.size, (320, 160))
+        # Only the processed blob and its thumbnail remain; the original upload is gone.
+        self.assertEqual(len([path for path in self.media_root.rglob("*") if path.is_file()]), 2)
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self.post_with_receipt(self.receipt())
+        second = self.post_with_receipt(self.receipt())
+
+        self.assertEqual(first.receipt_hash, second.receipt_hash)
+        self.assertEqual(
+            (first.receipt_image.name, first.receipt_thumbnail.name),
+            (second.receipt_image.name, second.receipt_thumbnail.name),
+        )
+        self.assertEqual(len([path for path in self.media_root.rglob("*") if path.is_file()]), 2)
+
+    def test_unreadable_receipt_is_left_for_a_retry(self):
+        expense = Expense.objects.create(
+            amount=Decimal("5.00"), category=self.category, student=self.student, paid_by=self.student,
+            split_type="equal", receipt_image=SimpleUploadedFile("receipt.png", b"not an image"),
+        )
+
+        with self.assertLogs("expenses.receipts", level="WARNING"):
+            call_command("process_receipts", stdout=StringIO())
+
+        expense.refresh_from_db()
+        self.assertIsNone(expense.receipt_hash)
+        self.assertTrue(expense.receipt_image.storage.exists(expense.receipt_image.name))
+
+
+class SpendingRollupTests(TestCase):
+
+    def setUp(self):
+        self.student = create_student(0)
+        self.food, self.travel = (
+            Category.objects.create(name=name, created_by=self.student) for name in ("Food", "Travel")
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def post_expense(self, category, amount):
+        response = self.client.post("/expenses/create/", expense_payload(category, amount), format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def rollups(self):
+        return {
+            (rollup.category_id, rollup.month): (rollup.total, rollup.count)
+            for rollup in SpendingRollup.objects.filter(student=self.student)
+        }
+
+    def test_rollup_follows_created_and_deleted_expenses(self):
+        self.post_expense(self.food, "12.50")
+        self.post_expense(self.food, "7.50")
+        self.post_expense(self.travel, "30.00")
+        month = timezone.localdate().replace(day=1)
+
+        self.assertEqual(self.rollups(), {
+            (self.food.id, month): (Decimal("20.00"), 2),
+            (self.travel.id, month): (Decimal("30.00"), 1),
+        })
+
+        Expense.objects.filter(amount=Decimal("7.50")).get().delete()
+        Expense.objects.filter(category=self.travel).get().delete()
+
+        self.assertEqual(self.rollups(), {(self.food.id, month): (Decimal("12.50"), 1)})
+        categorization = self.client.get("/expenses/expense-categorization/").json()["data"]
+        self.assertEqual(categorization, [{"category_name": "Food", "total": "12.50"}])
+
+    def test_migration_backfills_existing_expenses(self):
+        self.post_expense(self.food, "12.50")
+        self.post_expense(self.travel, "30.00")
+        expected = self.rollups()
+        SpendingRollup.objects.all().delete()
+
+        import_module("expenses.migrations.0022_backfill_spending_rollups").backfill_spending_rollups(django_apps, None)
+
+        self.assertEqual(self.rollups(), expected)
+
+    def test_rebuild_matches_incremental_rollup(self):
+        self.post_expense(self.food, "12.50")
+        self.post_expense(self.travel, "30.00")
+        Expense.objects.filter(category=self.travel).get().delete()
+        incremental = self.rollups()
+
+        call_command("rebuild_spending_rollups", stdout=StringIO())
+
+        self.assertEqual(self.rollups(), incremental)
+
+
+class ExpenseSeriesTests(TestCase):
+
+    def series(self, rows):
+        """
+        Build a series from (timestamp, rupees, category name) rows without touching the database.
+        """
+        names = sorted({name for _, _, name in rows})
+        return ExpenseSeries(
+            ids=np.arange(1, len(rows) + 1, dtype=np.int64),
+            timestamps=np.array([moment for moment, _, _ in rows], dtype="datetime64[us]"),
+            amounts=np.array([int(amount * 100) for _, amount, _ in rows], dtype=np.int64),
+            category_codes=np.array([names.index(name) for _, _, name in rows], dtype=np.int64),
+            category_names=names,
+        )
+
+    def test_category_percentiles(self):
+        series = self.series(
+            [(f"2026-03-0{day}T12:00", amount, "Food") for day, amount in enumerate((50, 10, 40, 20, 30), start=1)]
+            + [("2026-03-01T12:00", 7, "Travel")]
+        )
+
+        self.assertEqual(series.category_percentiles(), [
+            {"category__name": "Food", "count": 5,
+             "percentiles": {"p50": Decimal("30.00"), "p90": Decimal("46.00"), "p95": Decimal("48.00")}},
+            {"category__name": "Travel", "count": 1,
+             "percentiles": {"p50": Decimal("7.00"), "p90": Decimal("7.00"), "p95": Decimal("7.00")}},
+        ])
+
+    def test_outliers_are_flagged_per_category(self):
+        rows = [(f"2026-03-{day:02}T12:00", 10, "Food") for day in range(1, 10)] + [("2026-03-10T12:00", 100, "Food")]
+        # Travel is spread just as widely, but has too few expenses to be judged.
+        rows += [(f"2026-03-{day:02}T12:00", amount, "Travel") for day, amount in ((1, 1), (2, 1), (3, 1), (4, 50))]
+        # With six expenses no amount can be 3 standard deviations from a mean that
+        # includes it; the median and MAD still single out the rent spike.
+        rows += [(f"2026-03-{day:02}T12:00", amount, "Rent") for day, amount in enumerate((20, 22, 18, 21, 19, 200), start=1)]
+        series = self.series(rows)
+
+        self.assertEqual(series.outliers(), [
+            {
+                "id": 10,
+                "created_at": datetime(2026, 3, 10, 12),
+                "amount": Decimal("100.00"),
+                "category__name": "Food",
+                "z_score": 7.98,
+            },
+            {
+                "id": 20,
+                "created_at": datetime(2026, 3, 6, 12),
+                "amount": Decimal("200.00"),
+                "category__name": "Rent",
+                "z_score": 80.71,
+            },
+        ])
+        self.assertEqual([outlier["id"] for outlier in series.outliers(threshold=10)], [20])
+
+    def test_buckets_fill_gaps_and_roll_the_average(self):
+        series = self.series([
+            ("2026-03-02T09:00", 10, "Food"),
+            ("2026-03-02T18:00", 20, "Food"),
+            ("2026-03-04T12:00", 60, "Food"),
+        ])
+
+        self.assertEqual(
+            [(bucket["period_start"], bucket["total"], bucket["count"], bucket["rolling_average"])
+             for bucket in series.buckets("daily", window=2)],
+            [
+                (date(2026, 3, 2), Decimal("30.00"), 2, Decimal("30.00")),
+                (date(2026, 3, 3), Decimal("0.00"), 0, Decimal("15.00")),
+                (date(2026, 3, 4), Decimal("60.00"), 1, Decimal("30.00")),
+            ],
+        )
+        # 2026-03-02 is a Monday, so every expense lands in one week.
+        self.assertEqual(
+            [(bucket["period_start"], bucket["total"]) for bucket in series.buckets("weekly")],
+            [(date(2026, 3, 2), Decimal("90.00"))],
+        )
+
+    def test_insights_endpoint_reports_percentiles_and_anomalies(self):
+        student = create_student(0)
+        category = Category.objects.create(name="Food", created_by=student)
+        amounts = [Decimal("10.00")] * 9 + [Decimal("100.00")]
+        for day, amount in enumerate(amounts, start=1):
+            expense = Expense.objects.create(
+                amount=amount, category=category, split_type="equal", student=student, paid_by=student,
+            )
+            Expense.objects.filter(id=expense.id).update(created_at=timezone.make_aware(datetime(2026, 3, day, 12)))
+        client = APIClient()
+        client.force_authenticate(student)
+
+        # The date range reaches the query as aware datetimes, with or without explicit dates.
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", RuntimeWarning)
+            data = client.get(
+                "/expenses/spending-analysis/?time_period=weekly&mode=insights&z_threshold=2.5"
+                "&start_date=2026-03-01&end_date=2026-03-31"
+            ).json()["data"]
+            self.assertEqual(client.get("/expenses/spending-analysis/?mode=insights").status_code, 200)
+
+        self.assertEqual(data["total_spent"], 190)
+        self.assertEqual(data["category_percentiles"][0]["percentiles"]["p50"], 10)
+        self.assertEqual([anomaly["amount"] for anomaly in data["anomalies"]], [100])
+        self.assertEqual(sum(bucket["total"] for bucket in data["spending_trends"]), 190)
+
+
+class ExpenseExportTests(TestCase):
+
+    def setUp(self):
+        self.student, self.friend, self.stranger = (create_student(index) for index in range(3))
+        self.category = Category.objects.create(name="Food", created_by=self.student)
+        self.paid = self.expense(self.student, "30.00", [(self.student, "15.00"), (self.friend, "15.00")])
+        self.owed = self.expense(self.friend, "8.00", [(self.student, "4.00"), (self.friend, "4.00")])
+        self.expense(self.stranger, "99.00", [(self.stranger, "99.00")])
+        self.settlement = Settlement.objects.create(
+            user=self.student, borrower=self.friend, amount=Decimal("15.00"), due_date=date(2030, 1, 1), settlement_method=1,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def expense(self, payer, amount, shares):
+        expense = Expense.objects.create(
+            amount=Decimal(amount), category=self.category, split_type="custom", student=payer, paid_by=payer,
+        )
+        ExpenseSplit.objects.bulk_create([
+            ExpenseSplit(expense=expense, student=student, email=student.email, amount=Decimal(share))
+            for student, share in shares
+        ])
+        return expense
+
+    def export(self, query=""):
+        response = self.client.get(f"/expenses/export/{query}")
+        self.assertEqual(response.status_code, 200)
+        return response, b"".join(response.streaming_content)
+
+    def test_csv_lists_every_record_involving_the_user(self):
+        response, content = self.export()
+
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = list(csv.DictReader(StringIO(content.decode())))
+        self.assertEqual(
+            [(row["record_type"], row["id"], row["amount"]) for row in rows],
+            [("expense", str(self.paid.id), "30.00"), ("expense", str(self.owed.id), "8.00")]
+            + [("split", str(split.id), str(split.amount))
+               for split in ExpenseSplit.objects.filter(expense__in=(self.paid, self.owed)).order_by("expense_id", "id")]
+            + [("settlement", str(self.settlement.id), "15.00")],
+        )
+        self.assertEqual(rows[0]["category"], "Food")
+        self.assertEqual((rows[-1]["lender"], rows[-1]["borrower"]), (str(self.student.id), str(self.friend.id)))
+
+    def test_jsonl_has_one_object_per_line(self):
+        response, content = self.export("?file_format=jsonl")
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        records = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual([record["record_type"] for record in records], ["expense"] * 2 + ["split"] * 4 + ["settlement"])
+        self.assertEqual(records[0]["amount"], "30.00")
+        self.assertEqual(records[-1]["due_date"], "2030-01-01")
+
+    def test_gzip_output_matches_the_plain_export(self):
+        _, plain = self.export("?file_format=jsonl")
+        # A tiny buffer makes the export stream many compressed chunks.
+        with mock.patch("expenses.exporters.EXPORT_BUFFER_SIZE", 10):
+            response, compressed = self.export("?file_format=jsonl&gzip=1")
+
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertIn('filename="pocketsense-export.jsonl.gz"', response["Content-Disposition"])
+        self.assertEqual(gzip.decompress(compressed), plain)
+
+    def test_date_range_and_format_are_validated(self):
+        _, content = self.export("?file_format=jsonl&start_date=2000-01-01&end_date=2000-12-31")
+        self.assertEqual(content, b"")
+
+        self.assertEqual(self.client.get("/expenses/export/?file_format=xml").status_code, 400)
+        self.assertEqual(self.client.get("/expenses/export/?start_date=01-01-2000").status_code, 400)
+
+
+class GroupLedgerTests(TestCase):
+
+    def setUp(self):
+        self.owner, self.second, self.third, self.outsider = (create_student(index) for index in range(4))
+        self.category = Category.objects.create(name="Food", created_by=self.owner)
+        self.group = Group.objects.create(name="Flat", created_by=self.owner)
+        self.group.members.add(self.owner, self.second, self.third)
+
+    def client_for(self, student):
+        client = APIClient()
+        client.force_authenticate(student)
+        return client
+
+    def ledger(self):
+        return {
+            balance.member_id: balance.net_amount
+            for balance in GroupBalance.objects.filter(group=self.group)
+        }
+
+    def group_expense(self, student, amount):
+        return self.client_for(student).post("/expenses/create/", dict(
+            expense_payload(self.category, amount),
+            group=self.group.id,
+            splits=[{"email": self.second.email}, {"email": self.third.email}],
+        ), format="json")
+
+    def settlement(self, student, borrower, amount):
+        return self.client_for(student).post("/expenses/settlements/create/", {
+            "borrower": borrower.id,
+            "group": self.group.id,
+            "payment_status": 2,
+            "settlement_method": 1,
+            "due_date": "01-01-2030",
+            "amount": str(amount),
+        }, format="json")
+
+    def test_expenses_and_completed_settlements_move_the_ledger(self):
+        self.assertEqual(self.group_expense(self.owner, 30).status_code, 200)
+        self.assertEqual(self.ledger(), {
+            self.owner.id: Decimal("20.00"), self.second.id: Decimal("-10.00"), self.third.id: Decimal("-10.00"),
+        })
+
+        self.assertEqual(self.settlement(self.owner, self.second, 10).status_code, 200)
+        self.assertEqual(self.ledger(), {
+            self.owner.id: Decimal("10.00"), self.second.id: Decimal("0.00"), self.third.id: Decimal("-10.00"),
+        })
+
+        live = self.ledger()
+        call_command("rebuild_group_balances", stdout=StringIO())
+        self.assertEqual({member: amount for member, amount in self.ledger().items() if amount}, {
+            member: amount for member, amount in live.items() if amount
+        })
+
+    def test_participants_must_be_group_members(self):
+        for email in ("ghost@x.com", self.outsider.email):
+            with self.subTest(email=email):
+                response = self.client_for(self.owner).post("/expenses/create/", dict(
+                    expense_payload(self.category, 90),
+                    group=self.group.id,
+                    splits=[{"email": self.second.email}, {"email": email}],
+                ), format="json")
+
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(Expense.objects.exists())
+                self.assertEqual(self.ledger(), {})
+
+    def test_deleted_expenses_leave_the_ledger(self):
+        self.group_expense(self.owner, 30)
+        self.group_expense(self.second, 60)
+        self.settlement(self.owner, self.second, 10)
+
+        Expense.objects.order_by("id").first().delete()
+        call_command("rebuild_group_balances", "--verify", stdout=StringIO())
+
+        Expense.objects.all().delete()
+        call_command("rebuild_group_balances", "--verify", stdout=StringIO())
+        self.assertEqual({member: amount for member, amount in self.ledger().items() if amount}, {
+            self.owner.id: Decimal("-10.00"), self.second.id: Decimal("10.00"),
+        })
+
+    def test_deleting_a_group_removes_its_ledger(self):
+        self.group_expense(self.owner, 30)
+
+        self.group.delete()
+
+        self.assertFalse(Expense.objects.exists())
+        self.assertFalse(GroupBalance.objects.exists())
+
+    def test_migration_backfills_the_ledger(self):
+        self.group_expense(self.owner, 30)
+        self.settlement(self.owner, self.second, 10)
+        live = {member: amount for member, amount in self.ledger().items() if amount}
+        GroupBalance.objects.all().delete()
+
+        import_module("expenses.migrations.0023_backfill_group_balances").backfill_group_balances(django_apps, None)
+
+        self.assertEqual(self.ledger(), live)
+
+    def test_rebuild_follows_the_split_student_not_its_email(self):
+        self.group_expense(self.owner, 30)
+        live = self.ledger()
+        # The split keeps the address it was written with after the student changes theirs.
+        Student.objects.filter(id=self.second.id).update(email="renamed@college.com")
+
+        self.assertEqual(compute_group_balances([self.group.id])[self.group.id], live)
+
+        # Splits not linked to a student yet are still matched on their email.
+        ExpenseSplit.objects.filter(student=self.third).update(student=None)
+        self.assertEqual(compute_group_balances([self.group.id])[self.group.id], live)
+
+    def test_backfill_links_splits_by_email(self):
+        self.group_expense(self.owner, 30)
+        live = self.ledger()
+        ExpenseSplit.objects.update(student=None)
+        ghost = ExpenseSplit.objects.create(
+            expense=Expense.objects.get(), email="ghost@college.com", amount=Decimal("0.00"),
+        )
+
+        out = StringIO()
+        call_command("backfill_split_students", "--batch-size", "1", stdout=out)
+
+        self.assertEqual(
+            dict(ExpenseSplit.objects.exclude(id=ghost.id).values_list("email", "student_id")),
+            {student.email: student.id for student in (self.owner, self.second, self.third)},
+        )
+        ghost.refresh_from_db()
+        self.assertIsNone(ghost.student_id)
+        self.assertIn("Linked 3 splits to students; 1 splits have no matching student.", out.getvalue())
+
+        # Once linked, a rebuild no longer depends on the split emails.
+        Student.objects.filter(id=self.third.id).update(email="renamed@college.com")
+        GroupBalance.objects.all().delete()
+        call_command("rebuild_group_balances", stdout=StringIO())
+        self.assertEqual(self.ledger(), live)
+
+    def test_non_member_cannot_write_to_the_group(self):
+        self.group_expense(self.owner, 30)
+        before = self.ledger()
+
+        expense = self.group_expense(self.outsider, 30)
+        settlement = self.settlement(self.outsider, self.second, 10)
+
+        self.assertEqual(expense.status_code, 400)
+        self.assertEqual(settlement.status_code, 400)
+        self.assertEqual(Expense.objects.filter(student=self.outsider).count(), 0)
+        self.assertFalse(Settlement.objects.exists())
+        self.assertEqual(self.ledger(), before)
+
+
+class SpendingForecastTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.student = create_student(0)
+        self.category = Category.objects.create(name="Food", created_by=self.student)
+        Budget.objects.create(student=self.student, category=self.category, budget_limit=Decimal("100.00"))
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def project(self, daily_level, spent, remaining, today=date(2024, 1, 10)):
+        projected, exhausted_on = project_month_end(
+            np.array([daily_level]), np.zeros(1), np.zeros((1, 7)), np.array([spent]), np.array([remaining]), today,
+        )
+        return projected[0], exhausted_on[0]
+
+    def test_projection_compares_future_spend_with_remaining_budget(self):
+        # 60 of a 100 budget spent leaves 40; nothing more expected means it lasts.
+        self.assertEqual(self.project(0, 60, 40), (60, None))
+        # 10 a day uses up the remaining 40 four days from now.
+        projected, exhausted_on = self.project(10, 60, 40)
+        self.assertEqual(exhausted_on, date(2024, 1, 14))
+        self.assertEqual(projected, 60 + 10 * 21)
+        self.assertEqual(self.project(10, 100, 0)[1], date(2024, 1, 10))
+        self.assertIsNone(self.project(10, 60, np.nan)[1])
+
+    def test_get_does_not_write_and_matches_stored_forecast(self):
+        self.client.post("/expenses/create/", expense_payload(self.category, 60), format="json")
+
+        response = self.client.get("/expenses/forecast/")
+        forecast, = response.data["data"]
+        self.assertFalse(SpendingForecast.objects.exists())
+        self.assertEqual((forecast["month_to_date"], forecast["budget_limit"]), ("60.00", "40.00"))
+        self.assertIsNone(forecast["budget_exhausted_on"])
+
+        call_command("refresh_spending_forecasts", stdout=StringIO())
+        clear_caches()
+        stored, = self.client.get("/expenses/forecast/").data["data"]
+        self.assertEqual(SpendingForecast.objects.count(), 1)
+        self.assertEqual(dict(stored, updated_at=None), dict(forecast, updated_at=None))
+
+
+class PaymentReminderTests(TestCase):
+
+    def setUp(self):
+        self.lender = create_student(0)
+        self.borrowers = [create_student(1), create_student(2)]
+        due_date = timezone.localdate() + timedelta(days=3)
+        Settlement.objects.bulk_create([
+            Settlement(user=self.lender, borrower=borrower, amount=Decimal(amount), due_date=due_date, settlement_method=1)
+            for borrower, amount in ((self.borrowers[0], "10.00"), (self.borrowers[0], "20.00"), (self.borrowers[1], "30.00"))
+        ])
+
+    def remind(self, **options):
+        with redirect_stdout(StringIO()):
+            payment_reminder.send_payment_reminders(workers=1, **options)
+
+    def test_each_settlement_is_reminded_once(self):
+        self.remind(days_ahead=[3])
+        self.remind(days_ahead=[3])
+
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [
+            self.borrowers[0].email, self.borrowers[0].email, self.borrowers[1].email,
+        ])
+        self.assertEqual(OutboxEmail.objects.filter(sent_at__isnull=False).count(), 3)
+
+    def test_queue_only_leaves_delivery_to_the_worker(self):
+        self.remind(days_ahead=[3], queue_only=True)
+        self.assertEqual(len(mail.outbox), 0)
+
+        call_command("send_outbox_emails", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_digest_groups_settlements_by_borrower_across_windows(self):
+        Settlement.objects.create(
+            user=self.lender, borrower=self.borrowers[0], amount=Decimal("40.00"),
+            due_date=timezone.localdate() + timedelta(days=7), settlement_method=1,
+        )
+
+        self.remind(days_ahead=[3, 7], digest=True)
+
+        messages = {message.to[0]: message for message in mail.outbox}
+        self.assertEqual(len(mail.outbox), 2)
+        digest = messages[self.borrowers[0].email]
+        self.assertIn("3 Settlements", digest.subject)
+        self.assertIn("₹70.00 in total", digest.body)
+        self.assertIn("₹40.00", digest.body)
+        self.assertIn("₹30.00", messages[self.borrowers[1].email].body)
+
+    def test_windows_select_only_their_due_dates(self):
+        self.remind(days_ahead=[1, 7], digest=True)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_digest_rerun_sends_only_for_new_settlements(self):
+        self.remind(days_ahead=[3], digest=True)
+        self.remind(days_ahead=[3], digest=True)
+        self.assertEqual(len(mail.outbox), 2)
+
+        Settlement.objects.create(
+            user=self.lender, borrower=self.borrowers[1], amount=Decimal("5.00"),
+            due_date=timezone.localdate() + timedelta(days=3), settlement_method=1,
+        )
+        self.remind(days_ahead=[3], digest=True)
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[-1].to, [self.borrowers[1].email])
+        self.assertIn("₹35.00 in total", mail.outbox[-1].body)
+
+    def test_days_option_is_validated(self):
+        for value in ("", "3,", "three", "-1"):
+            with self.subTest(days=value), self.assertRaises(CommandError):
+                payment_reminder.run(f"days={value}")
+        self.assertEqual(payment_reminder.parse_days("1,3,7"), [1, 3, 7])
+
+
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
+
+
+def seed_ledger(owner, size, prefix):
+    """
+    Give `owner` a group of `size` members, three categories with budgets,
+    `size * 10` split expenses and `size * 3` settlements.
+    """
+    members = Student.objects.bulk_create([
+        Student(username=f"{prefix}{index}", email=f"{prefix}{index}@college.com")
+        for index in range(size)
+    ])
+    categories = Category.objects.bulk_create([
+        Category(name=f"{prefix}-category{index}", created_by=owner, is_custom=True)
+        for index in range(3)
+    ])
+    Budget.objects.bulk_create([
+        Budget(student=owner, category=category, budget_limit=Decimal("100000.00"))
+        for category in categories
+    ])
+    group = Group.objects.create(name=f"{prefix}-group", created_by=owner)
+    group.members.add(owner, *members)
+
+    expenses = Expense.objects.bulk_create([
+        Expense(
+            amount=Decimal("90.00"),
+            category=categories[index % 3],
+            split_type="equal",
+            group=group,
+            student=owner,
+            paid_by=owner if index % 2 else members[index % size],
+        )
+        for index in range(size * 10)
+    ])
+    ExpenseSplit.objects.bulk_create([
+        ExpenseSplit(expense=expense, student=student, email=student.email, amount=Decimal("30.00"))
+        for index, expense in enumerate(expenses)
+        for student in (owner, members[index % size], members[(index + 1) % size])
+    ])
+    Settlement.objects.bulk_create([
+        Settlement(
+            user=owner,
+            borrower=members[index % size],
+            group=group,
+            amount=Decimal("15.00"),
+            due_date=timezone.localdate() + timedelta(days=index % 10 - 3),
+            settlement_method=1,
+        )
+        for index in range(size * 3)
+    ])
+
+    call_command("rebuild_spending_rollups", stdout=StringIO())
+    call_command("rebuild_group_balances", stdout=StringIO())
+    return members, categories, group
+
+
+@override_settings(DASHBOARD_WORKERS=0)
+class QueryBudgetTests(TestCase):
+    """
+    Every route runs a fixed number of queries, however much data it touches.
+
+    Each request is measured, the ledger (or the payload) is grown several
+    times over and the request is measured again against the same budget, so
+    an N+1 pattern fails the second measurement.
+    """
+
+    def setUp(self):
+        clear_caches()
+        self.owner = create_student(0)
+        DataVersion.objects.create(student=self.owner)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.members, self.categories, self.group = seed_ledger(self.owner, 3, "small")
+
+    def grow(self):
+        self.members, self.categories, self.group = seed_ledger(self.owner, 12, "large")
+
+    def assertQueryBudget(self, budget, method, url, data=None, **extra):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, **extra)
+            if response.streaming:
+                b"".join(response.streaming_content)
+
+        self.assertLess(response.status_code, 300, f"{method.upper()} {url}: {getattr(response, 'data', '')}")
+        self.assertEqual(
+            len(queries), budget,
+            f"{method.upper()} {url} ran {len(queries)} queries, budget is {budget}:\n"
+            + "\n".join(query["sql"] for query in queries.captured_queries),
+        )
+        return response
+
+    def read_routes(self):
+        category = self.categories[0]
+        return [
+            (3, "/expenses/categories/list/"),
+            (2, f"/expenses/categories/retrieve/{category.id}/"),
+            (2, "/expenses/history/"),
+            (2, f"/expenses/history/?role=owed&group={self.group.id}"),
+            (3, "/expenses/export/"),
+            (3, "/expenses/export/?file_format=jsonl"),
+            (4, "/expenses/group/list/"),
+            (3, f"/expenses/group/retrieve/{self.group.id}/"),
+            (2, "/expenses/settlements/list/"),
+            (1, f"/expenses/settlements/retrieve/{Settlement.objects.filter(group=self.group).first().id}/"),
+            (2, "/expenses/monthly-analysis/?months=6"),
+            (2, "/expenses/expense-categorization/"),
+            (3, "/expenses/budget/list/"),
+            (2, f"/expenses/budget/retrieve/{Budget.objects.filter(category=category).get().id}/"),
+            (3, "/expenses/budget-analysis/"),
+            (6, "/expenses/forecast/"),
+            (2, f"/expenses/settlement-suggestion/?group_id={self.group.id}"),
+            (3, f"/expenses/settlement-suggestion/?user_email={self.members[0].email}"),
+            (3, "/expenses/spending-analysis/"),
+            (2, "/expenses/spending-analysis/?time_period=daily&mode=insights"),
+            (9, "/expenses/dashboard/"),
+        ]
+
+    def test_read_routes_stay_within_budget(self):
+        for grown in (False, True):
+            if grown:
+                self.grow()
+            for budget, url in self.read_routes():
+                clear_caches()
+                with self.subTest(url=url, grown=grown):
+                    self.assertQueryBudget(budget, "get", url)
+
+    def test_expense_create_stays_within_budget(self):
+        for grown in (False, True):
+            if grown:
+                self.grow()
+            payload = {
+                "amount": "120.00",
+                "category": self.categories[0].id,
+                "group": self.group.id,
+                "split_type": "equal",
+                "paid_by_you": True,
+                "splits": [{"email": member.email} for member in self.members],
+            }
+            with self.subTest(grown=grown):
+                self.assertQueryBudget(19, "post", "/expenses/create/", payload, format="json")
+
+    def test_expense_import_stays_within_budget(self):
+        for grown in (False, True):
+            if grown:
+                self.grow()
+            lines = [
+                json.dumps({
+                    "amount": "60.00",
+                    "split_type": "equal",
+                    "category": self.categories[index % 3].id,
+                    "group": self.group.id,
+                    "splits": [{"email": self.owner.email}, {"email": self.members[index % len(self.members)].email}],
+                })
+                for index in range(30)
+            ]
+            upload = SimpleUploadedFile("expenses.jsonl", "\n".join(lines).encode())
+            with self.subTest(grown=grown):
+                self.assertQueryBudget(16, "post", "/expenses/import/", {"file": upload}, format="multipart")
+
+    def test_group_writes_stay_within_budget(self):
+        for grown in (False, True):
+            if grown:
+                self.grow()
+            member_ids = [member.id for member in self.members]
+            with self.subTest(grown=grown):
+                created = self.assertQueryBudget(
+                    11, "post", "/expenses/group/create/", {"name": "Trip", "member_ids": member_ids}, format="json"
+                )
+                group_id = created.data["data"]["id"]
+                self.assertQueryBudget(
+                    9, "put", f"/expenses/group/update/{group_id}/", {"name": "Trip", "member_ids": member_ids[:2]}, format="json"
+                )
+                self.assertQueryBudget(10, "delete", f"/expenses/group/delete/{group_id}/")
+
+    def test_settlement_writes_stay_within_budget(self):
+        for grown in (False, True):
+            if grown:
+                self.grow()
+            payload = {
+                "borrower": self.members[0].id,
+                "group": self.group.id,
+                "payment_status": 1,
+                "settlement_method": 1,
+                "due_date": "01-01-2030",
+                "amount": "25.00",
+            }
+            with self.subTest(grown=grown):
+                created = self.assertQueryBudget(7, "post", "/expenses/settlements/create/", payload, format="json")
+                settlement_id = created.data["data"]["id"]
+                self.assertQueryBudget(
+                    10, "put", f"/expenses/settlements/update/{settlement_id}/", dict(payload, payment_status=2), format="json"
+                )
+                self.assertQueryBudget(7, "delete", f"/expenses/settlements/delete/{settlement_id}/")
+
+    def test_category_and_budget_writes_stay_within_budget(self):
+        for grown in (False, True):
+            if grown:
+                self.grow()
+            with self.subTest(grown=grown):
+                created = self.assertQueryBudget(
+                    3, "post", "/expenses/categories/create/", {"name": f"Books {grown}"}, format="json"
+                )
+                category_id = created.data["data"]["id"]
+                self.assertQueryBudget(
+                    5, "put", f"/expenses/categories/update/{category_id}/", {"name": f"Novels {grown}"}, format="json"
+                )
+                budget = self.assertQueryBudget(
+                    3, "post", "/expenses/budget/create/", {"category": category_id, "budget_limit": "50.00"}, format="json"
+                )
+                budget_id = budget.data["data"]["id"]
+                self.assertQueryBudget(
+                    4, "put", f"/expenses/budget/update/{budget_id}/", {"category": category_id, "budget_limit": "75.00"}, format="json"
+                )
+                self.assertQueryBudget(4, "delete", f"/expenses/budget/delete/{budget_id}/")
+                self.assertQueryBudget(10, "delete", f"/expenses/categories/delete/{category_id}/")
+
+
+class QueryPlanTests(TestCase):
+    """
+    The filters the views rely on are served by an index, not a table scan.
+    """
+    scanned_tables = ("expenses_expense", "expenses_expensesplit", "expenses_settlement")
+
+    def setUp(self):
+        self.owner = create_student(0)
+        self.members, self.categories, self.group = seed_ledger(self.owner, 12, "plan")
+
+    def table_scans(self, queryset):
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                # Small test tables make a sequential scan the cheapest plan; with
+                # it disabled, one is only chosen when no index applies.
+                cursor.execute("SET LOCAL enable_seqscan = off")
+            plan = queryset.explain()
+        tables = "|".join(self.scanned_tables)
+        patterns = (
+            rf"SCAN (?:TABLE )?({tables})\b(?! USING)",
+            rf"Seq Scan on ({tables})\b",
+        )
+        return plan, [table for pattern in patterns for table in re.findall(pattern, plan)]
+
+    def test_main_filters_use_indexes(self):
+        owner = self.owner
+        owed = ExpenseSplit.objects.filter(student=owner).values("expense_id")
+        querysets = {
+            "expenses by owner": Expense.objects.filter(student=owner).order_by("-created_at", "-id"),
+            "expenses by payer": Expense.objects.filter(paid_by=owner).order_by("-created_at", "-id"),
+            "expenses by group": Expense.objects.filter(group=self.group).order_by("-created_at", "-id"),
+            "expenses by category": Expense.objects.filter(category=self.categories[0]).order_by("-created_at", "-id"),
+            "expense history": Expense.objects.filter(Q(student=owner) | Q(paid_by=owner) | Q(id__in=owed)),
+            "splits by student": ExpenseSplit.objects.filter(student=owner),
+            "splits by expense": ExpenseSplit.objects.filter(expense_id__in=[1, 2, 3]),
+            "settlements by lender": Settlement.objects.filter(user=owner).order_by("due_date", "id"),
+            "settlements by borrower": Settlement.objects.filter(borrower=self.members[0]),
+            "settlements by group": Settlement.objects.filter(group=self.group),
+        }
+        for name, queryset in querysets.items():
+            with self.subTest(name):
+                plan, scans = self.table_scans(queryset)
+                self.assertEqual(scans, [], f"{name} scans {', '.join(scans)}:\n{plan}")
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.student = create_student(0)
+        self.category = Category.objects.create(name="Food", created_by=self.student)
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def test_unchanged_data_is_not_modified(self):
+        first = self.client.get("/expenses/budget/list/")
+
+        with self.assertNumQueries(1):
+            second = self.client.get("/expenses/budget/list/", HTTP_IF_NONE_MATCH=first["ETag"])
+
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.content, b"")
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_write_changes_the_etag(self):
+        first = self.client.get("/expenses/monthly-analysis/")
+        self.client.post("/expenses/create/", expense_payload(self.category, 40), format="json")
+
+        second = self.client.get("/expenses/monthly-analysis/", HTTP_IF_NONE_MATCH=first["ETag"])
+
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second["ETag"], first["ETag"])
+
+    def test_write_by_another_student_changes_the_etag(self):
+        other = create_student(1)
+        group = Group.objects.create(name="Flat", created_by=self.student)
+        group.members.add(self.student, other)
+        first = self.client.get("/expenses/group/list/")
+
+        Expense.objects.create(amount=Decimal("20.00"), split_type="equal", group=group, student=other, paid_by=other)
+        second = self.client.get("/expenses/group/list/", HTTP_IF_NONE_MATCH=first["ETag"])
+
+        self.assertEqual(second.status_code, 200)
+
+    def test_if_modified_since(self):
+        first = self.client.get("/expenses/categories/list/")
+
+        second = self.client.get("/expenses/categories/list/", HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+
+        self.assertEqual(second.status_code, 304)
+
+
+class ResponseCacheTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.student = create_student(0)
+        self.category = Category.objects.create(name="Food", created_by=self.student)
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def test_repeated_get_is_served_from_cache(self):
+        first = self.client.get("/expenses/expense-categorization/")
+
+        with self.assertNumQueries(1):
+            second = self.client.get("/expenses/expense-categorization/")
+
+        self.assertEqual(second.json(), first.json())
+
+    def test_write_invalidates_cached_responses(self):
+        self.client.get("/expenses/budget-analysis/")
+        Budget.objects.create(student=self.student, category=self.category, budget_limit=Decimal("50.00"))
+
+        response = self.client.get("/expenses/budget-analysis/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"][0]["budget_limit"], "50.00")
+
+    def test_settlement_suggestion_sees_other_students_groups(self):
+        borrower, third = create_student(1), create_student(2)
+        shared = Group.objects.create(name="Shared", created_by=self.student)
+        shared.members.add(self.student, borrower)
+        elsewhere = Group.objects.create(name="Elsewhere", created_by=third)
+        elsewhere.members.add(borrower, third)
+
+        def group_expense(group, paid_by, amount, participants):
+            expense = Expense.objects.create(
+                amount=amount, split_type="equal", group=group, student=paid_by, paid_by=paid_by,
+            )
+            ExpenseSplit.objects.bulk_create([
+                ExpenseSplit(expense=expense, student=student, email=student.email, amount=amount / len(participants))
+                for student in participants
+            ])
+
+        url = f"/expenses/settlement-suggestion/?user_email={borrower.email}"
+        group_expense(shared, self.student, Decimal("60.00"), [self.student, borrower])
+        first = self.client.get(url)
+
+        # A write the requester is not part of, in a group they are not in.
+        group_expense(elsewhere, borrower, Decimal("40.00"), [borrower, third])
+        second = self.client.get(url, HTTP_IF_NONE_MATCH=first.get("ETag", "*"))
+
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second.data["data"], first.data["data"])
+
+    def test_stats_count_hits_and_misses(self):
+        self.client.get("/expenses/monthly-analysis/")
+        self.client.get("/expenses/monthly-analysis/")
+        self.student.is_staff = True
+        self.student.save()
+
+        stats = self.client.get("/expenses/cache-stats/").data["data"]
+
+        self.assertEqual(stats["MonthlyAnalysisView"]["hits"], 1)
+        self.assertEqual(stats["MonthlyAnalysisView"]["misses"], 1)
+
+
+class DenyThrottle(BaseThrottle):
+
+    def allow_request(self, request, view):
+        return False
+
+    def wait(self):
+        return 30
+
+
+@override_settings(DASHBOARD_WORKERS=0)
+class DashboardTests(TestCase):
+    endpoints = {
+        "monthly-analysis": "/expenses/monthly-analysis/",
+        "expense-categorization": "/expenses/expense-categorization/",
+        "budget-analysis": "/expenses/budget-analysis/",
+        "spending-analysis": "/expenses/spending-analysis/",
+        "settlements": "/expenses/settlements/list/",
+    }
+
+    def setUp(self):
+        clear_caches()
+        self.student = create_student(0)
+        seed_ledger(self.student, 3, "member")
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def dashboard(self, query=""):
+        response = self.client.get(f"/expenses/dashboard/{query}")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["data"]
+
+    def test_sections_match_their_endpoints(self):
+        sections = self.dashboard()
+
+        self.assertEqual(list(sections), list(self.endpoints))
+        for name, url in self.endpoints.items():
+            with self.subTest(section=name):
+                self.assertEqual(sections[name], self.client.get(url).json())
+
+    def test_section_permissions_are_checked(self):
+        with mock.patch.object(BudgetAnalysisView, "permission_classes", (IsAdminUser,)):
+            denied = self.dashboard("?sections=budget-analysis,monthly-analysis")
+            self.assertEqual(self.client.get(self.endpoints["budget-analysis"]).status_code, 403)
+
+        self.assertEqual(set(denied["budget-analysis"]), {"detail"})
+        self.assertEqual(denied["monthly-analysis"]["status_code"], 200)
+        # A refused section is not cached for later requests.
+        self.assertEqual(self.dashboard("?sections=budget-analysis")["budget-analysis"]["status_code"], 200)
+
+    def test_section_throttles_are_checked(self):
+        with mock.patch.object(SpendingPatternsView, "throttle_classes", [DenyThrottle]):
+            sections = self.dashboard("?sections=spending-analysis")
+
+        self.assertIn("throttled", sections["spending-analysis"]["detail"])
+
+
+class RendererTests(TestCase):
+
+    def assertRendersLikeDRF(self, data):
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_values_render_byte_for_byte_like_drf(self):
+        self.assertRendersLikeDRF({
+            "utc": datetime(2026, 3, 1, 9, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            "whole_second": datetime(2026, 3, 1, 9, 30, 15, tzinfo=dt_timezone.utc),
+            "offset": datetime(2026, 3, 1, 9, 30, 15, 500, tzinfo=ZoneInfo("Asia/Kolkata")),
+            "naive": datetime(2026, 3, 1, 9, 30, 15, 999999),
+            "date": date(2026, 3, 1),
+            "time": dt_time(9, 30, 15, 250000),
+            "decimal": Decimal("12.50"),
+            "uuid": UUID("12345678-1234-5678-1234-567812345678"),
+            "numpy": [np.int64(7), np.float64(0.1), np.array([1, 2, 3])],
+            1: ["int keys", "\u2028 and \u2029", "₹"],
+            "nested": [{"empty": {}, "none": None, "bool": True}],
+        })
+
+    def test_endpoint_response_renders_like_drf(self):
+        student = create_student(0)
+        category = Category.objects.create(name="Food", created_by=student)
+        Expense.objects.create(amount=Decimal("12.34"), category=category, split_type="equal", student=student, paid_by=student)
+        client = APIClient()
+        client.force_authenticate(student)
+
+        response = client.get("/expenses/spending-analysis/?time_period=daily&mode=insights")
+
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+
+
+def cursor_for(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+class SettlementListTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.lender = create_student(0)
+        self.borrower = create_student(1)
+        self.today = timezone.localdate()
+        self.client = APIClient()
+        self.client.force_authenticate(self.lender)
+
+    def settle(self, days, status=1):
+        return Settlement.objects.create(
+            user=self.lender,
+            borrower=self.borrower,
+            amount=Decimal("10.00"),
+            due_date=self.today + timedelta(days=days),
+            payment_status=status,
+            settlement_method=1,
+        )
+
+    def list(self, query=""):
+        return self.client.get(f"/expenses/settlements/list/{query}")
+
+    def test_due_status_and_counts(self):
+        overdue = self.settle(-1)
+        due_today = self.settle(0)
+        due_in_a_week = self.settle(7)
+        later = self.settle(8)
+        paid_late = self.settle(-5, status=2)
+        Settlement.objects.create(
+            user=self.borrower, borrower=self.lender, due_date=self.today, settlement_method=1,
+        )
+
+        data = self.list().json()["data"]
+
+        self.assertEqual({row["id"]: row["due_status"] for row in data["settlements"]}, {
+            overdue.id: "overdue",
+            due_today.id: "due_soon",
+            due_in_a_week.id: "due_soon",
+            later.id: "other",
+            paid_late.id: "other",
+        })
+        self.assertEqual(data["counts"], {"total": 5, "overdue": 1, "due_soon": 2})
+
+    def test_cursor_pages_through_every_settlement_once(self):
+        for days in (3, -2, 3, 0, 10, -2, 5):
+            self.settle(days)
+        expected = list(Settlement.objects.order_by("due_date", "id").values_list("id", flat=True))
+
+        seen, query = [], "?limit=3"
+        while True:
+            data = self.list(query).json()["data"]
+            seen += [row["id"] for row in data["settlements"]]
+            self.assertEqual(data["counts"]["total"], 7)
+            if not data["next_cursor"]:
+                break
+            query = f"?limit=3&cursor={data['next_cursor']}"
+
+        self.assertEqual(seen, expected)
+
+    def test_malformed_cursors_are_rejected(self):
+        self.settle(0)
+        for values in (["notadate", 1], [{"a": 1}, 1], [str(self.today), "x"], [str(self.today)], [None, 1], "abc"):
+            with self.subTest(cursor=values):
+                response = self.list(f"?cursor={cursor_for(values)}")
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()["status_message"], "Invalid cursor.")
+        self.assertEqual(self.list("?cursor=not-base64!").status_code, 400)
+
+
+class ExpenseHistoryTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.student = create_student(0)
+        self.friend = create_student(1)
+        self.food = Category.objects.create(name="Food", created_by=self.student)
+        self.travel = Category.objects.create(name="Travel", created_by=self.student)
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def spend(self, amount, day, category=None, student=None, paid_by=None, owed_by=()):
+        student = student or self.student
+        expense = Expense.objects.create(
+            amount=Decimal(amount),
+            category=category or self.food,
+            split_type="equal",
+            student=student,
+            paid_by=paid_by or student,
+        )
+        created_at = timezone.make_aware(datetime(2026, 3, day, 12))
+        Expense.objects.filter(id=expense.id).update(created_at=created_at)
+        ExpenseSplit.objects.bulk_create([
+            ExpenseSplit(expense=expense, student=owner, email=owner.email, amount=Decimal(amount))
+            for owner in owed_by
+        ])
+        return expense.id
+
+    def history(self, query=""):
+        response = self.client.get(f"/expenses/history/{query}")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["data"]
+
+    def ids(self, query=""):
+        return [row["id"] for row in self.history(query)["expenses"]]
+
+    def test_role_filters(self):
+        created = self.spend("10.00", 1)
+        paid_for_me = self.spend("20.00", 2, student=self.friend, paid_by=self.student)
+        owed = self.spend("30.00", 3, student=self.friend, owed_by=[self.student])
+        self.spend("40.00", 4, student=self.friend)
+
+        self.assertEqual(self.ids(), [owed, paid_for_me, created])
+        self.assertEqual(self.ids("?role=created"), [created])
+        self.assertEqual(self.ids("?role=paid"), [paid_for_me, created])
+        self.assertEqual(self.ids("?role=owed"), [owed])
+        self.assertEqual(self.client.get("/expenses/history/?role=someone").status_code, 400)
+
+    def test_category_amount_and_date_filters(self):
+        cheap = self.spend("5.00", 1)
+        trip = self.spend("50.00", 5, category=self.travel)
+        dinner = self.spend("25.00", 10)
+
+        self.assertEqual(self.ids(f"?category={self.travel.id}"), [trip])
+        self.assertEqual(self.ids("?min_amount=25"), [dinner, trip])
+        self.assertEqual(self.ids("?max_amount=25.00"), [dinner, cheap])
+        self.assertEqual(self.ids("?start_date=2026-03-05&end_date=2026-03-09"), [trip])
+        self.assertEqual(self.ids("?end_date=2026-03-05"), [trip, cheap])
+        for query in ("?category=food", "?min_amount=lots", "?start_date=05-03-2026"):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f"/expenses/history/{query}").status_code, 400)
+
+    def test_cursor_pages_through_every_expense_once(self):
+        # Several expenses share a timestamp, so the id breaks ties between pages.
+        expected = sorted(
+            ((day, self.spend("1.00", day)) for day in (1, 2, 2, 2, 3, 3, 4, 5, 5, 5, 5)),
+            reverse=True,
+        )
+
+        seen, query = [], "?limit=3"
+        while True:
+            data = self.history(query)
+            seen += [row["id"] for row in data["expenses"]]
+            if not data["next_cursor"]:
+                break
+            query = f"?limit=3&cursor={data['next_cursor']}"
+
+        self.assertEqual(seen, [expense_id for _, expense_id in expected])
+
+    def test_malformed_cursors_are_rejected(self):
+        self.spend("1.00", 1)
+        for values in (["notadate", 1], [{"a": 1}, 1], ["2026-03-01T12:00:00+00:00", [1]], [1]):
+            with self.subTest(cursor=values):
+                response = self.client.get(f"/expenses/history/?cursor={cursor_for(values)}")
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()["status_message"], "Invalid cursor.")
+
+
+class MonthlyAnalysisTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.lender = create_student(0)
+        self.borrower = create_student(1)
+        self.client = APIClient()
+        self.client.force_authenticate(self.lender)
+
+    def settle(self, created_at, amount, status, method, user=None):
+        settlement = Settlement.objects.create(
+            user=user or self.lender,
+            borrower=self.borrower,
+            amount=Decimal(amount),
+            due_date=created_at,
+            payment_status=status,
+            settlement_method=method,
+        )
+        Settlement.objects.filter(id=settlement.id).update(created_at=start_of_day(created_at) + timedelta(hours=12))
+
+    def analysis(self, query):
+        response = self.client.get(f"/expenses/monthly-analysis/{query}")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["data"]
+
+    def seed(self):
+        self.settle(date(2025, 12, 31), "7.00", 1, 1)
+        self.settle(date(2026, 1, 1), "10.00", 1, 2)
+        self.settle(date(2026, 1, 15), "15.50", 1, 4)
+        self.settle(date(2026, 1, 20), "20.00", 2, 2)
+        self.settle(date(2026, 1, 31), "5.00", 3, 2)
+        self.settle(date(2026, 2, 1), "30.00", 2, 1)
+        self.settle(date(2026, 1, 10), "99.00", 1, 2, user=self.borrower)
+
+    def test_month_summary_and_breakdowns(self):
+        self.seed()
+
+        data = self.analysis("?month=1&year=2026")
+
+        self.assertEqual((data["month"], data["year"]), (1, 2026))
+        self.assertEqual(data["summary"], {
+            "total_settlements": 4,
+            "total_pending": 2,
+            "total_completed": 1,
+            "total_amount_due": 25.5,
+        })
+        breakdowns = data["breakdowns"]
+        self.assertEqual(breakdowns["settlement_method_breakdown"], [
+            {"settlement_method": "2", "count": 3},
+            {"settlement_method": "4", "count": 1},
+        ])
+        self.assertEqual(breakdowns["payment_status_breakdown"][0], {"payment_status": "1", "count": 2})
+        self.assertCountEqual(breakdowns["payment_status_breakdown"][1:], [
+            {"payment_status": "2", "count": 1},
+            {"payment_status": "3", "count": 1},
+        ])
+
+    def test_months_lists_each_month_up_to_the_requested_one(self):
+        self.seed()
+
+        months = self.analysis("?month=2&year=2026&months=4")["months"]
+
+        self.assertEqual([(data["year"], data["month"]) for data in months], [(2025, 11), (2025, 12), (2026, 1), (2026, 2)])
+        self.assertEqual([data["summary"]["total_settlements"] for data in months], [0, 1, 4, 1])
+        self.assertEqual([data["summary"]["total_amount_due"] for data in months], [0, 7.0, 25.5, 0])
+        self.assertEqual(months[0]["breakdowns"], {"settlement_method_breakdown": [], "payment_status_breakdown": []})
+        self.assertEqual(months[3]["breakdowns"]["payment_status_breakdown"], [{"payment_status": "2", "count": 1}])
+
+    def test_invalid_parameters_are_rejected(self):
+        for query in ("?months=0", "?months=37", "?months=two", "?month=13", "?year=soon"):
+            with self.subTest(query=query):
+                response = self.client.get(f"/expenses/monthly-analysis/{query}")
+                self.assertEqual(response.status_code, 400)
@@ -1,7 +1,13 @@
 from django.urls import path
 from .views import (
     ExpenseCreateView,
+    ExpenseImportView,
+    ExpenseHistoryView,
+    ExpenseExportView,
     BudgetAnalysisView,
+    SpendingForecastView,
+    DashboardView,
+    ResponseCacheStatsView,
     MonthlyAnalysisView,
     SpendingPatternsView,
     SettlementSuggestionView,
@@ -21,6 +27,9 @@ urlpatterns = [
     
     #Expense Add , Split
     path('create/', ExpenseCreateView.as_view(), name='create-expense'),
+    path('import/', ExpenseImportView.as_view(), name='import-expenses'),
+    path('history/', ExpenseHistoryView.as_view(), name='expense-history'),
+    path('export/', ExpenseExportView.as_view(), name='export-history'),
     
     
     #Groups
@@ -51,8 +60,12 @@ urlpatterns = [
     
     #Budget Analysis
     path('budget-analysis/', BudgetAnalysisView.as_view(), name='budget-analysis'),
+    path('forecast/', SpendingForecastView.as_view(), name='spending-forecast'),
     
     path('settlement-suggestion/', SettlementSuggestionView.as_view(), name='budget-analysis'),
     
     path('spending-analysis/', SpendingPatternsView.as_view(), name='spending-pattern-analysis'),
+
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('cache-stats/', ResponseCacheStatsView.as_view(), name='response-cache-stats'),
 ]
@@ -1,5 +1,47 @@
-from decimal import Decimal
+import heapq
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from functools import wraps
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.status import HTTP_409_CONFLICT
+
+from utils.response import (
+    response_any,
+    response_400_bad_request,
+)
+
+from CoreAuth.models import (
+    Student,
+)
+from .enums import (
+    PaymentStatusEnum,
+    SettlementModeEnum,
+)
+from .split_engine import (
+    split_expense,
+)
+from .models import (
+    Budget,
+    Expense,
+    ExpenseSplit,
+    GroupBalance,
+    IdempotencyKey,
+    Settlement,
+    SpendingRollup,
+)
+
+MINOR_UNIT = Decimal('0.01')
+
+# Largest number of unsettled members the exact minimum-transfers search handles.
+MIN_TRANSFERS_MAX_PARTIES = 18
 
 def handle_expense_split(expense_amount, split_type, splits_data):
     """
@@ -12,126 +54,550 @@ def handle_expense_split(expense_amount, split_type, splits_data):
     
     Returns:
         list: A list of dictionaries containing the participant data with their calculated amounts.
+            Amounts are exact to the paisa and always add up to the expense amount.
     
     Raises:
-        ValidationError: If the split data is invalid or the amounts don't add up.
+        rest_framework.serializers.ValidationError: If the split data is invalid
+            or the amounts don't add up, so DRF answers 400.
     """
-    
-    # Ensure the expense_amount is a Decimal for calculations
-    expense_amount = Decimal(expense_amount)
+    try:
+        result = split_expense(expense_amount, split_type, splits_data)
+    except ValidationError as e:
+        raise serializers.ValidationError(e.messages)
 
-    if not splits_data:
-        raise ValidationError("No participants in the split.")
-    
-    # Common helper function to check if amounts are valid decimals
-    def validate_amounts():
-        for split in splits_data:
-            if 'amount' not in split or not isinstance(split['amount'], (int, Decimal)):
-                raise ValidationError("Each participant must have a valid amount.")
-
-    # Handle 'equal' split type
-    if split_type == 'equal':
-        num_participants = len(splits_data)
-        amount_per_participant = expense_amount / num_participants
-        for split in splits_data:
-            split['amount'] = amount_per_participant
-
-    # Handle 'percentage' split type
-    elif split_type == 'percentage':
-        total_percentage = sum([split.get('percentage', 0) for split in splits_data])
-        if total_percentage != 100:
-            raise ValidationError("Total percentage does not sum up to 100.")
-        
-        for split in splits_data:
-            percentage = Decimal(split.get('percentage', 0))
-            split['amount'] = (percentage / Decimal(100)) * expense_amount
-
-    # Handle 'custom' split type
-    elif split_type == 'custom':
-        total_custom_amount = sum([split.get('amount', 0) for split in splits_data])
-        if total_custom_amount != expense_amount:
-            raise ValidationError(f"Total custom amounts must sum to {expense_amount}.")
-        
-        for split in splits_data:
-            if 'amount' not in split:
-                raise ValidationError("Each participant must have a valid amount in the custom split.")
-
-    # Handle 'proportional' split type
-    elif split_type == 'proportional':
-        total_factor = sum([split.get('factor', 0) for split in splits_data])
-        if total_factor == 0:
-            raise ValidationError("Total factor cannot be zero.")
-        
-        for split in splits_data:
-            factor = Decimal(split.get('factor', 0))
-            split['amount'] = (factor / total_factor) * expense_amount
-
-    # Handle 'fixed_with_remainder' split type
-    elif split_type == 'fixed_with_remainder':
-        fixed_amount = sum([split.get('fixed_amount', 0) for split in splits_data])
-        if fixed_amount >= expense_amount:
-            raise ValidationError("Fixed amounts cannot exceed or equal the total expense.")
-        
-        remainder_amount = expense_amount - fixed_amount
-        num_remainder_participants = len([split for split in splits_data if 'fixed_amount' not in split])
-        
-        if num_remainder_participants == 0:
-            raise ValidationError("No participants to pay the remainder amount.")
-        
-        amount_per_remainder_participant = remainder_amount / num_remainder_participants
-        for split in splits_data:
-            if 'fixed_amount' not in split:
-                split['amount'] = amount_per_remainder_participant
-            else:
-                split['amount'] = Decimal(split.get('fixed_amount', 0))
-
-    # Raise error for unknown split type
-    else:
-        raise ValidationError(f"Unknown split type: {split_type}")
-
-    # Validate amounts after calculation
-    validate_amounts()
+    for split, amount in zip(splits_data, result):
+        split['amount'] = from_minor_units(amount)
 
     return splits_data
 
 
-def calculate_settlement(expenses, group_members):
-    balances = {member: 0 for member in group_members}
+def to_minor_units(amount):
+    """
+    Convert a currency amount to an integer number of paise.
+    """
+    return int((Decimal(amount) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
 
-    for expense in expenses:
-        splits = expense.splits  
-        paid_by = expense.paid_by.email
-        amount = expense.amount
 
-        balances[paid_by] += amount
+def from_minor_units(value):
+    """
+    Convert an integer number of paise back to a two-place Decimal.
+    """
+    return (Decimal(value) / 100).quantize(MINOR_UNIT)
 
-        for split in splits:
-            balances[split['email']] -= split['amount']
 
-    settlements = []
-    debtors = [(k, v) for k, v in balances.items() if v < 0]
-    creditors = [(k, v) for k, v in balances.items() if v > 0]
+def _greedy_transfers(balances):
+    """
+    Match the largest debtor with the largest creditor until everyone is square.
 
-    debtors.sort(key=lambda x: x[1])
-    creditors.sort(key=lambda x: x[1], reverse=True)
+    `balances` maps a member to a non-zero integer balance in paise. Both sides
+    are kept in max-heaps so each step is O(log n) instead of shifting a list.
+    """
+    debtors = [(amount, member) for member, amount in balances.items() if amount < 0]
+    creditors = [(-amount, member) for member, amount in balances.items() if amount > 0]
+    heapq.heapify(debtors)
+    heapq.heapify(creditors)
 
+    transfers = []
     while debtors and creditors:
-        debtor, debt_amount = debtors.pop(0)
-        creditor, credit_amount = creditors.pop(0)
+        debt_amount, debtor = heapq.heappop(debtors)
+        credit_amount, creditor = heapq.heappop(creditors)
 
-        settlement_amount = min(-debt_amount, credit_amount)
-        settlements.append({
-            "from": debtor,
-            "to": creditor,
-            "amount": settlement_amount
-        })
+        settlement_amount = min(-debt_amount, -credit_amount)
+        transfers.append((debtor, creditor, settlement_amount))
 
         debt_amount += settlement_amount
-        credit_amount -= settlement_amount
+        credit_amount += settlement_amount
 
         if debt_amount < 0:
-            debtors.insert(0, (debtor, debt_amount))
-        if credit_amount > 0:
-            creditors.insert(0, (creditor, credit_amount))
+            heapq.heappush(debtors, (debt_amount, debtor))
+        if credit_amount < 0:
+            heapq.heappush(creditors, (credit_amount, creditor))
+
+    return transfers
+
+
+def _zero_sum_blocks(members, amounts):
+    """
+    Split members into the largest possible number of groups whose balances sum to zero.
+
+    Settling a zero-sum group of k members takes k - 1 transfers, so maximising
+    the number of groups minimises the total number of transfers. Uses a bitmask
+    DP over subsets, so it is only meant for small inputs.
+    """
+    size = 1 << len(members)
+    sums = [0] * size
+    best = [0] * size
+    last = [0] * size
+
+    for mask in range(1, size):
+        low = mask & -mask
+        sums[mask] = sums[mask ^ low] + amounts[low.bit_length() - 1]
+
+        if sums[mask] == 0:
+            # Any member of a zero-sum set can close its last group.
+            best[mask] = best[mask ^ low] + 1
+            last[mask] = low
+            continue
+
+        remaining = mask
+        while remaining:
+            bit = remaining & -remaining
+            if best[mask ^ bit] >= best[mask]:
+                best[mask] = best[mask ^ bit]
+                last[mask] = bit
+            remaining ^= bit
+
+    order = []
+    mask = size - 1
+    while mask:
+        order.append(last[mask])
+        mask ^= last[mask]
+    order.reverse()
+
+    blocks = []
+    block = []
+    mask = 0
+    for bit in order:
+        mask |= bit
+        block.append(members[bit.bit_length() - 1])
+        if sums[mask] == 0:
+            blocks.append(block)
+            block = []
+    return blocks
+
+
+def _min_transfers(balances):
+    """
+    Settle balances with the fewest possible transfers.
+    """
+    transfers = []
+    remaining = dict(balances)
+
+    # Exact opposite pairs always settle in one transfer on their own.
+    by_amount = {}
+    for member, amount in balances.items():
+        partner = by_amount.get(-amount)
+        if partner:
+            other = partner.pop()
+            debtor, creditor = (member, other) if amount < 0 else (other, member)
+            transfers.append((debtor, creditor, abs(amount)))
+            del remaining[member], remaining[other]
+        else:
+            by_amount.setdefault(amount, []).append(member)
+
+    if len(remaining) > MIN_TRANSFERS_MAX_PARTIES:
+        return transfers + _greedy_transfers(remaining)
+
+    members = list(remaining)
+    for block in _zero_sum_blocks(members, [remaining[member] for member in members]):
+        transfers.extend(_greedy_transfers({member: remaining[member] for member in block}))
+    return transfers
+
+
+def simplify_debts(balances, mode=SettlementModeEnum.Greedy.value):
+    """
+    Turn net balances into a list of suggested transfers.
+
+    Args:
+        balances (dict): Member -> net balance; positive means the member is owed money.
+        mode (str): A `SettlementModeEnum` value. `min_transfers` runs an exact search
+            for groups of up to `MIN_TRANSFERS_MAX_PARTIES` unsettled members and falls
+            back to the greedy matcher above that.
+
+    Returns:
+        list: Dictionaries with `from`, `to` and `amount` keys.
+
+    Raises:
+        ValidationError: If the mode is unknown.
+    """
+    if mode not in SettlementModeEnum.values():
+        raise ValidationError(f"Unknown settlement mode: {mode}")
+
+    minor_balances = {}
+    for member, amount in balances.items():
+        minor_amount = to_minor_units(amount)
+        if minor_amount:
+            minor_balances[member] = minor_amount
+
+    if mode == SettlementModeEnum.MinTransfers.value:
+        transfers = _min_transfers(minor_balances)
+    else:
+        transfers = _greedy_transfers(minor_balances)
+
+    return [
+        {
+            "from": debtor,
+            "to": creditor,
+            "amount": from_minor_units(amount),
+        }
+        for debtor, creditor, amount in transfers
+    ]
+
+
+def member_balances(expenses, members):
+    """
+    Net balance of each member across a set of expenses, computed in SQL.
+
+    Runs two grouped aggregates, amount paid per payer and amount owed per split
+    participant, so the query count does not depend on how many expenses there are.
+
+    Args:
+        expenses (QuerySet): Expenses to include.
+        members (iterable): Emails to report; anyone else is ignored.
+
+    Returns:
+        dict: Email -> Decimal net balance; positive means the member is owed money.
+    """
+    balances = {member: Decimal('0') for member in members}
+    expense_ids = expenses.order_by().values('id')
+
+    paid = (
+        Expense.objects.filter(id__in=expense_ids, paid_by__email__in=balances)
+        .values_list('paid_by__email')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    for email, total in paid:
+        balances[email] += total
+
+    owed = (
+        ExpenseSplit.objects.filter(expense_id__in=expense_ids, email__in=balances)
+        .values_list('email')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    for email, total in owed:
+        balances[email] -= total
+
+    return balances
+
+
+def calculate_settlement(expenses, group_members, mode=SettlementModeEnum.Greedy.value):
+    return simplify_debts(member_balances(expenses, group_members), mode)
+
+
+def consume_budget(student, category_id, amount):
+    """
+    Take `amount` off the student's budget for a category in a single conditional UPDATE.
+
+    The check and the decrement happen in one statement, so concurrent expenses
+    cannot both spend the same remaining budget and no row lock is held between
+    a read and a write. Call it in the same transaction as the expense insert.
+
+    Returns:
+        bool: False if a budget exists and does not cover the amount.
+    """
+    if not category_id:
+        return True
+
+    budgets = Budget.objects.filter(student=student, category_id=category_id)
+    # Nothing stops a student having two budgets for a category; only the oldest is spent from.
+    budget = Budget.objects.filter(id__in=budgets.order_by('id').values('id')[:1])
+    if budget.filter(budget_limit__gte=amount).update(budget_limit=F('budget_limit') - amount):
+        return True
+
+    # Nothing was updated: either there is no budget, or it is too small.
+    return not budgets.exists()
+
+
+def expense_balance_changes(paid_by_id, amount, split_amounts):
+    """
+    Net balance deltas caused by one expense.
+
+    Args:
+        paid_by_id (int): Student who paid.
+        amount (Decimal): Total amount of the expense.
+        split_amounts (iterable): (student_id, amount) pairs for each participant.
+
+    Returns:
+        dict: Student id -> Decimal delta.
+    """
+    changes = defaultdict(Decimal)
+    changes[paid_by_id] += Decimal(amount)
+    for student_id, split_amount in split_amounts:
+        changes[student_id] -= Decimal(split_amount)
+    return changes
+
+
+def settlement_balance_changes(settlement, sign=1):
+    """
+    Net balance deltas caused by a completed group settlement.
+
+    The borrower paying the lender moves both balances towards zero. Pass
+    `sign=-1` to undo a settlement that was previously applied.
+    """
+    if not settlement.group_id or str(settlement.payment_status) != str(PaymentStatusEnum.Completed.value):
+        return {}
+
+    amount = Decimal(settlement.amount or 0) * sign
+    return {
+        settlement.borrower_id: amount,
+        settlement.user_id: -amount,
+    }
+
+
+def apply_group_balance_changes(group_id, changes):
+    """
+    Add balance deltas to the group ledger in two statements.
+
+    Must be called inside the transaction that writes the change itself so the
+    ledger never drifts from the expenses and settlements it summarises.
+    """
+    changes = {member_id: amount for member_id, amount in changes.items() if amount}
+    if not group_id or not changes:
+        return
+
+    GroupBalance.objects.bulk_create(
+        [GroupBalance(group_id=group_id, member_id=member_id) for member_id in changes],
+        ignore_conflicts=True,
+    )
+    GroupBalance.objects.filter(group_id=group_id, member_id__in=changes).update(
+        net_amount=F('net_amount') + Case(
+            *[When(member_id=member_id, then=Value(amount)) for member_id, amount in changes.items()],
+            default=Value(Decimal('0')),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        updated_at=timezone.now(),
+    )
+
+
+def compute_group_balances(group_ids=None):
+    """
+    Recompute group ledgers from the full expense and settlement history.
+
+    Args:
+        group_ids (list): Restrict to these groups; all groups when None.
+
+    Returns:
+        dict: Group id -> {student id: Decimal net amount}.
+    """
+    expenses = Expense.objects.filter(group__isnull=False)
+    splits = ExpenseSplit.objects.filter(expense__group__isnull=False)
+    settlements = Settlement.objects.filter(
+        group__isnull=False,
+        payment_status=PaymentStatusEnum.Completed.value,
+    )
+    if group_ids is not None:
+        expenses = expenses.filter(group_id__in=group_ids)
+        splits = splits.filter(expense__group_id__in=group_ids)
+        settlements = settlements.filter(group_id__in=group_ids)
+
+    balances = defaultdict(lambda: defaultdict(Decimal))
+
+    for row in expenses.values('group_id', 'paid_by_id').annotate(total=Sum('amount')).order_by():
+        balances[row['group_id']][row['paid_by_id']] += row['total']
+
+    for row in (
+        splits.filter(student__isnull=False)
+        .values('expense__group_id', 'student_id')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    ):
+        balances[row['expense__group_id']][row['student_id']] -= row['total']
+
+    # Splits not yet linked by backfill_split_students fall back on their email.
+    unlinked = list(
+        splits.filter(student__isnull=True).values('expense__group_id', 'email').annotate(total=Sum('amount')).order_by()
+    )
+    student_ids = dict(
+        Student.objects.filter(email__in={row['email'] for row in unlinked}).values_list('email', 'id')
+    ) if unlinked else {}
+    for row in unlinked:
+        student_id = student_ids.get(row['email'])
+        if student_id:
+            balances[row['expense__group_id']][student_id] -= row['total']
+
+    for row in settlements.values('group_id', 'borrower_id', 'user_id').annotate(total=Sum('amount')).order_by():
+        total = row['total'] or Decimal('0')
+        balances[row['group_id']][row['borrower_id']] += total
+        balances[row['group_id']][row['user_id']] -= total
+
+    return balances
+
+
+def month_start(moment):
+    """
+    First day of the month containing a date or datetime, in the current time zone.
+    """
+    if isinstance(moment, datetime):
+        if timezone.is_aware(moment):
+            moment = timezone.localtime(moment)
+        moment = moment.date()
+    return moment.replace(day=1)
+
+
+def next_month_start(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def start_of_day(day):
+    """
+    Midnight at the start of a date, aware when time zones are enabled.
+    """
+    moment = datetime.combine(day, time.min)
+    return timezone.make_aware(moment) if settings.USE_TZ else moment
+
+
+def apply_spending_rollup_changes(changes):
+    """
+    Add expense totals to the monthly spending rollup.
+
+    Args:
+        changes (dict): (student_id, category_id, month) -> (total, count).
+    """
+    for (student_id, category_id, month), (total, count) in changes.items():
+        rollup_id = (
+            SpendingRollup.objects.filter(student_id=student_id, category_id=category_id, month=month)
+            .values_list('id', flat=True)
+            .first()
+        )
+        if rollup_id:
+            SpendingRollup.objects.filter(id=rollup_id).update(total=F('total') + total, count=F('count') + count)
+        else:
+            SpendingRollup.objects.create(
+                student_id=student_id, category_id=category_id, month=month, total=total, count=count
+            )
+
+
+def spending_rollup_rows(expenses):
+    """
+    SpendingRollup rows aggregated from an Expense queryset in one grouped query.
+
+    Yields:
+        dict: student_id, category_id, month, total and count of one rollup row.
+    """
+    rows = (
+        expenses.annotate(month=TruncMonth('created_at'))
+        .values_list('student_id', 'category_id', 'month')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    for student_id, category_id, month, total, count in rows:
+        yield {
+            'student_id': student_id,
+            'category_id': category_id,
+            'month': month_start(month),
+            'total': total,
+            'count': count,
+        }
+
+
+def remove_from_spending_rollup(expense):
+    """
+    Take a deleted expense back out of its monthly spending rollup.
+
+    A row left without expenses is deleted, so the category drops out of the
+    analytics as it would have before. Nothing is done when the row is
+    already gone, e.g. when the student is being deleted.
+    """
+    rollup_id = (
+        SpendingRollup.objects.filter(
+            student_id=expense.student_id,
+            category_id=expense.category_id,
+            month=month_start(expense.created_at),
+            count__gte=1,
+        )
+        .values_list('id', flat=True)
+        .first()
+    )
+    if rollup_id:
+        SpendingRollup.objects.filter(id=rollup_id).update(total=F('total') - expense.amount, count=F('count') - 1)
+        SpendingRollup.objects.filter(id=rollup_id, count=0).delete()
+
+
+def spending_by_month(student, start_date, end_date):
+    """
+    Spending per (month, category name) between two datetimes, inclusive.
+
+    Whole months inside the range are read from SpendingRollup; only the partial
+    months at either edge of the range are aggregated from raw expenses.
+
+    Returns:
+        list: (month, category name, total) tuples.
+    """
+    if settings.USE_TZ:
+        start_date = start_date if timezone.is_aware(start_date) else timezone.make_aware(start_date)
+        end_date = end_date if timezone.is_aware(end_date) else timezone.make_aware(end_date)
+
+    first_full_month = month_start(start_date)
+    if start_date > start_of_day(first_full_month):
+        first_full_month = next_month_start(first_full_month)
+    end_month = month_start(end_date)
+
+    rows = []
+    expenses = Expense.objects.filter(student=student)
+    if first_full_month < end_month:
+        rows.extend(
+            SpendingRollup.objects.filter(student=student, month__gte=first_full_month, month__lt=end_month)
+            .values_list('month', 'category__name')
+            .annotate(total=Sum('total'))
+            .order_by()
+        )
+        expenses = expenses.filter(
+            Q(created_at__gte=start_date, created_at__lt=start_of_day(first_full_month))
+            | Q(created_at__gte=start_of_day(end_month), created_at__lte=end_date)
+        )
+    else:
+        expenses = expenses.filter(created_at__range=[start_date, end_date])
+
+    for month, category_name, total in (
+        expenses.annotate(month=TruncMonth('created_at'))
+        .values_list('month', 'category__name')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    ):
+        rows.append((month_start(month), category_name, total))
+    return rows
+
+
+def idempotency_cutoff():
+    return timezone.now() - timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24))
+
+
+def idempotent(input_func):
+    """
+    Replay the stored response when a write is retried with the same Idempotency-Key header.
+
+    A retry costs one indexed lookup and never reaches the write path. Only
+    successful responses are stored, so a failed request can be retried with
+    the same key. Requests without the header are handled as usual.
+    """
+
+    @wraps(input_func)
+    def decorator(view, request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return input_func(view, request, *args, **kwargs)
+        if len(key) > 255:
+            return response_400_bad_request("Idempotency-Key must be at most 255 characters.")
+
+        lookup = {"user": request.user, "key": key, "endpoint": request.path}
+        stored = IdempotencyKey.objects.filter(**lookup).first()
+        if stored and stored.created_at >= idempotency_cutoff():
+            if stored.status_code is None:
+                return response_any(HTTP_409_CONFLICT, "A request with this Idempotency-Key is still in progress.")
+            return Response(stored.response, status=stored.status_code)
+        if stored:
+            stored.delete()
+
+        try:
+            with transaction.atomic():
+                stored = IdempotencyKey.objects.create(**lookup)
+        except IntegrityError:
+            return response_any(HTTP_409_CONFLICT, "A request with this Idempotency-Key is still in progress.")
+
+        try:
+            response = input_func(view, request, *args, **kwargs)
+        except Exception:
+            stored.delete()
+            raise
+
+        if 200 <= response.status_code < 300:
+            stored.status_code = response.status_code
+            stored.response = response.data
+            stored.save(update_fields=['status_code', 'response'])
+        else:
+            stored.delete()
+        return response
 
-    return settlements
\ No newline at end of file
+    return decorator
@@ -0,0 +1,97 @@
+from functools import wraps
+
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework.response import Response
+from rest_framework.status import HTTP_304_NOT_MODIFIED
+
+from .models import (
+    Category,
+    DataVersion,
+    Expense,
+    Group,
+)
+from .utils import (
+    start_of_day,
+)
+
+
+def bump_data_versions(student_ids=(), group_ids=(), category_ids=()):
+    """
+    Invalidate the read endpoints of every student a write touched, in one UPDATE.
+
+    Args:
+        student_ids (iterable): Students whose own data changed.
+        group_ids (iterable): Groups whose creator sees the change (ledger, member list).
+        category_ids (iterable): Categories whose name shows in someone's lists or analytics.
+    """
+    student_ids = {student_id for student_id in student_ids if student_id}
+    group_ids = {group_id for group_id in group_ids if group_id}
+    category_ids = {category_id for category_id in category_ids if category_id}
+
+    condition = Q()
+    if student_ids:
+        condition |= Q(student_id__in=student_ids)
+    if group_ids:
+        condition |= Q(student_id__in=Group.objects.filter(id__in=group_ids).values('created_by_id'))
+    if category_ids:
+        condition |= Q(student_id__in=Category.objects.filter(id__in=category_ids).values('created_by_id'))
+        condition |= Q(student_id__in=Expense.objects.filter(category_id__in=category_ids).values('student_id'))
+    if not condition:
+        return
+
+    DataVersion.objects.filter(condition).update(version=F('version') + 1, updated_at=timezone.now())
+
+
+def get_data_version(request):
+    """
+    The requesting student's data version and when it last changed, read once per request.
+    """
+    if not hasattr(request, '_data_version'):
+        data_version, _ = DataVersion.objects.get_or_create(student=request.user)
+        request._data_version = (data_version.version, data_version.updated_at)
+    return request._data_version
+
+
+def _not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        # Weak comparison: a validator matches whether or not either side is marked W/.
+        return if_none_match.strip() == '*' or etag in [tag.removeprefix('W/') for tag in parse_etags(if_none_match)]
+
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return if_modified_since is not None and int(last_modified.timestamp()) <= if_modified_since
+
+
+def conditional_get(view_method):
+    """
+    Answer GETs with 304 Not Modified while the student's data version is unchanged.
+
+    The validators come from DataVersion alone, so the check is one indexed query
+    and nothing is computed or serialized for a 304. Today's date is part of both
+    validators because several views default to the current month or day.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        version, updated_at = get_data_version(request)
+        today = timezone.localdate()
+        etag = f'"{request.user.pk}-{version}-{today:%Y%m%d}"'
+        last_modified = max(updated_at, start_of_day(today))
+        headers = {'ETag': etag, 'Last-Modified': http_date(last_modified.timestamp())}
+
+        if _not_modified(request, etag, last_modified):
+            response = Response(status=HTTP_304_NOT_MODIFIED, headers=headers)
+        else:
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            for header, value in headers.items():
+                response[header] = value
+
+        response['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(response, ('Accept', 'Authorization', 'Cookie'))
+        return response
+
+    return wrapper
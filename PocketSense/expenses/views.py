@@ -1,8 +1,17 @@
-from datetime import datetime , timedelta
+import inspect
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime , timedelta
 from django.shortcuts import render
-from django.db.models import Count, Sum , F, Value
-from django.db.models.functions import Coalesce , TruncMonth
-from decimal import Decimal
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import close_old_connections, transaction
+from django.http import QueryDict, StreamingHttpResponse
+from django.utils import timezone
+from django.db.models import Count, Sum , Q
+from django.db.models.functions import TruncMonth
+from decimal import Decimal, InvalidOperation
 
 from rest_framework.permissions import IsAuthenticated , BasePermission
 from rest_framework.serializers import ValidationError
@@ -20,32 +29,88 @@ from rest_framework.generics import (
 from .models import (
     Category,
     Expense,
+    ExpenseSplit,
     Group,
     Settlement,
     Budget,
+    SpendingRollup,
+)
+
+from CoreAuth.models import (
+    Student,
 )
 
 from .serializers import (
     CategorieSerializer,
     ExpenseSerializer,
+    ExpenseHistorySerializer,
     GroupSerializer,
     SettlementSerializer,
     CategorizedExpenseSerializer,
     BudgetSerializer,
     MonthlyBudgetTrackingSerializer,
+    SpendingForecastSerializer,
 ) 
 
 from utils.response import (
     response_200,
     response_400_bad_request,
+    is_staff_user,
+)
+from utils.pagination import (
+    decode_cursor,
+    keyset_page,
 )
 from .utils import (
     handle_expense_split,
     calculate_settlement,
+    simplify_debts,
+    consume_budget,
+    settlement_balance_changes,
+    apply_group_balance_changes,
+    idempotent,
+    spending_by_month,
+    month_start,
+    next_month_start,
+    start_of_day,
+)
+
+from .analytics import (
+    PERIODS,
+    ExpenseSeries,
+)
+
+from .versioning import (
+    conditional_get,
+)
+
+from .caching import (
+    RESPONSE_CACHE,
+    cached_get,
+    record_cache_events,
+    register_endpoint,
+    response_cache_key,
+    response_cache_stats,
+)
+
+from .forecasting import (
+    current_forecasts,
+)
+
+from .exporters import (
+    EXPORT_FORMATS,
+    export_user_history,
+)
+
+from .importers import (
+    IMPORT_FORMATS,
+    iter_import_rows,
+    import_expenses,
 )
 
 from .enums import (
     PaymentStatusEnum,
+    SettlementModeEnum,
 )
 
 import logging
@@ -83,6 +148,8 @@ class CategoryListCreateRetrieveUpdateDestroyView(ListCreateAPIView, RetrieveUpd
         logger.info(f"Category creation failed: {serializer.errors}")
         return response_400_bad_request(f"Category creation failed:{serializer.errors}")
 
+    @conditional_get
+    @cached_get
     def get(self, request, *args, **kwargs):
         if 'pk' in kwargs:
             return self.retrieve(request, *args, **kwargs)
@@ -116,8 +183,10 @@ class ExpenseCreateView(CreateAPIView):
     queryset = Expense.objects.all()
     serializer_class = ExpenseSerializer
 
+    @idempotent
     def create(self, request, *args, **kwargs):
-        data = request.data.copy()
+        # QueryDict.copy() deep-copies uploaded files, which fails for receipts spooled to disk.
+        data = request.data.dict() if isinstance(request.data, QueryDict) else request.data.copy()
         data['student'] = request.user.id
 
         paid_by_you = data.get('paid_by_you')
@@ -136,7 +205,11 @@ class ExpenseCreateView(CreateAPIView):
 
         # Add the request user as a participant if split_type is equal
         split_type = data.get('split_type')
-        expense_amount = Decimal(data.get('amount', '0'))
+        try:
+            # str() first: a JSON number arrives as a float, and Decimal(12.34) is not 12.34.
+            expense_amount = Decimal(str(data.get('amount', '0')))
+        except InvalidOperation:
+            raise ValidationError({"amount": "A valid number is required."})
 
         if split_type == 'equal':
             # Add request user to splits
@@ -161,26 +234,125 @@ class ExpenseCreateView(CreateAPIView):
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
         
-        student = request.user
-        category = data.get('category')
-        
+        with transaction.atomic():
+            if not consume_budget(request.user, data.get('category'), expense_amount):
+                raise ValidationError("Expense exceeds the budget limit.")
+
+            self.perform_create(serializer)
+
+        return response_200("Expense Created", serializer.data)
+
+
+class ExpenseImportView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        if not upload:
+            return response_400_bad_request("Upload a CSV or JSON-lines file as 'file'.")
+
+        file_format = request.data.get('format') or upload.name.rsplit('.', 1)[-1].lower()
+        if file_format not in IMPORT_FORMATS:
+            return response_400_bad_request(f"Unsupported format. Choices are: {', '.join(IMPORT_FORMATS)}")
+
         try:
-            budget = Budget.objects.get(student=student, category=category)
-        except Budget.DoesNotExist:
-            budget = None
+            created, errors = import_expenses(request.user, iter_import_rows(upload, file_format))
+        except DjangoValidationError as e:
+            return response_400_bad_request(" ".join(e.messages))
+        logger.info(f"Expense import by {request.user.email}: {created} created, {len(errors)} failed")
 
-        if budget:
-            remaining_budget = budget.budget_limit - expense_amount
-            if remaining_budget < 0:
-                raise ValidationError("Expense exceeds the budget limit.")
+        return response_200("Expenses Imported", {
+            "created": created,
+            "failed": len(errors),
+            "errors": errors,
+        })
 
-            budget.budget_limit = remaining_budget
-            budget.save()
-            logger.info(f"Serializer Data: {serializer.validated_data}")
 
-        self.perform_create(serializer)
+class ExpenseHistoryView(APIView):
+    permission_classes = (IsAuthenticated,)
+    page_size = 50
+    max_page_size = 200
+    roles = ('all', 'created', 'paid', 'owed')
 
-        return response_200("Expense Created", serializer.data)
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        user = request.user
+
+        role = params.get('role', 'all')
+        if role not in self.roles:
+            return response_400_bad_request(f"Invalid role. Choices are: {', '.join(self.roles)}")
+
+        owed = Q(id__in=ExpenseSplit.objects.filter(student=user).values('expense_id'))
+        if role == 'created':
+            expenses = Expense.objects.filter(student=user)
+        elif role == 'paid':
+            expenses = Expense.objects.filter(paid_by=user)
+        elif role == 'owed':
+            expenses = Expense.objects.filter(owed)
+        else:
+            expenses = Expense.objects.filter(Q(student=user) | Q(paid_by=user) | owed)
+
+        try:
+            if params.get('group'):
+                expenses = expenses.filter(group_id=int(params['group']))
+            if params.get('category'):
+                expenses = expenses.filter(category_id=int(params['category']))
+            if params.get('start_date'):
+                expenses = expenses.filter(
+                    created_at__gte=start_of_day(datetime.strptime(params['start_date'], "%Y-%m-%d").date())
+                )
+            if params.get('end_date'):
+                end_date = datetime.strptime(params['end_date'], "%Y-%m-%d").date()
+                expenses = expenses.filter(created_at__lt=start_of_day(end_date + timedelta(days=1)))
+            if params.get('min_amount'):
+                expenses = expenses.filter(amount__gte=Decimal(params['min_amount']))
+            if params.get('max_amount'):
+                expenses = expenses.filter(amount__lte=Decimal(params['max_amount']))
+            limit = min(max(int(params.get('limit', self.page_size)), 1), self.max_page_size)
+        except (ValueError, ArithmeticError):
+            return response_400_bad_request("Invalid filter value.")
+
+        cursor = params.get('cursor')
+        if cursor:
+            cursor = decode_cursor(cursor, Expense, ['created_at', 'id'])
+            if cursor is None:
+                return response_400_bad_request("Invalid cursor.")
+
+        expenses = expenses.select_related('category', 'paid_by').prefetch_related('splits')
+        page, next_cursor = keyset_page(expenses, ['created_at', 'id'], cursor, limit, descending=True)
+
+        return response_200("Expense History", {
+            "expenses": ExpenseHistorySerializer(page, many=True, context={"request": request}).data,
+            "next_cursor": next_cursor,
+        })
+
+
+class ExpenseExportView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        file_format = params.get('file_format', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            return response_400_bad_request(f"Unsupported format. Choices are: {', '.join(EXPORT_FORMATS)}")
+
+        try:
+            start_date = params.get('start_date') and start_of_day(datetime.strptime(params['start_date'], "%Y-%m-%d").date())
+            end_date = params.get('end_date') and start_of_day(
+                datetime.strptime(params['end_date'], "%Y-%m-%d").date() + timedelta(days=1)
+            )
+        except ValueError:
+            return response_400_bad_request("Dates must use the YYYY-MM-DD format.")
+
+        compress = params.get('gzip') in ('1', 'true')
+        filename = f"pocketsense-export.{file_format}" + (".gz" if compress else "")
+
+        response = StreamingHttpResponse(
+            export_user_history(request.user, file_format, compress, start_date, end_date),
+            content_type="application/gzip" if compress else ("text/csv" if file_format == 'csv' else "application/x-ndjson"),
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
 
 class GroupListCreateRetrieveUpdateDestroyView(ListCreateAPIView, RetrieveUpdateDestroyAPIView):
@@ -190,7 +362,7 @@ class GroupListCreateRetrieveUpdateDestroyView(ListCreateAPIView, RetrieveUpdate
     lookup_field = 'pk'
     
     def get_queryset(self):
-        return super().get_queryset().filter(created_by=self.request.user)
+        return super().get_queryset().filter(created_by=self.request.user).prefetch_related('members')
 
     def perform_create(self, serializer):
         group = serializer.save(created_by=self.request.user)
@@ -200,6 +372,8 @@ class GroupListCreateRetrieveUpdateDestroyView(ListCreateAPIView, RetrieveUpdate
         response = super().create(request, *args, **kwargs)     
         return response_200("Group created successfully", response.data)
 
+    @conditional_get
+    @cached_get
     def get(self, request, *args, **kwargs):
         if 'pk' in kwargs:
             return self.retrieve(request, *args, **kwargs)
@@ -221,13 +395,21 @@ class SettlementListCreateRetrieveUpdateDestroyView(ListCreateAPIView, RetrieveU
     serializer_class = SettlementSerializer
     queryset = Settlement.objects.all()
     lookup_field = 'pk'
+    page_size = 50
+    max_page_size = 200
     
     def get_queryset(self):
         return super().get_queryset().filter(user=self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
-        
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            apply_group_balance_changes(instance.group_id, settlement_balance_changes(instance, sign=-1))
+            instance.delete()
+
+    @idempotent
     def post(self, request, *args, **kwargs):
         response = super().create(request, *args, **kwargs)     
         return response_200("Settlement created successfully", response.data)
@@ -237,24 +419,45 @@ class SettlementListCreateRetrieveUpdateDestroyView(ListCreateAPIView, RetrieveU
             return self.retrieve(request, *args, **kwargs)
         else:
             queryset = self.get_queryset()
-            
-            overdue_settlements = queryset.filter(due_date__lt=datetime.now(), payment_status=PaymentStatusEnum.Pending.value)
-            
-            upcoming_due_date = datetime.now() + timedelta(days=7)
-            
-            due_soon_settlements = queryset.filter(
-                due_date__range=[datetime.now(), upcoming_due_date],
-                payment_status=PaymentStatusEnum.Pending.value
+
+            try:
+                limit = min(int(request.query_params.get('limit', self.page_size)), self.max_page_size)
+            except ValueError:
+                return response_400_bad_request("limit must be an integer.")
+
+            cursor = request.query_params.get('cursor')
+            if cursor:
+                cursor = decode_cursor(cursor, Settlement, ['due_date', 'id'])
+                if cursor is None:
+                    return response_400_bad_request("Invalid cursor.")
+
+            today = timezone.localdate()
+            due_soon_date = today + timedelta(days=7)
+            pending = Q(payment_status=PaymentStatusEnum.Pending.value)
+            counts = queryset.aggregate(
+                total=Count('id'),
+                overdue=Count('id', filter=pending & Q(due_date__lt=today)),
+                due_soon=Count('id', filter=pending & Q(due_date__range=[today, due_soon_date])),
             )
-            
-            overdue_serializer = self.get_serializer(overdue_settlements, many=True)
-            due_soon_serializer = self.get_serializer(due_soon_settlements, many=True)
-            all_settlements_serializer = self.get_serializer(queryset, many=True)
+
+            settlements, next_cursor = keyset_page(queryset, ['due_date', 'id'], cursor, max(limit, 1))
+            data = self.get_serializer(settlements, many=True).data
+            for settlement, row in zip(settlements, data):
+                if str(settlement.payment_status) != str(PaymentStatusEnum.Pending.value):
+                    row['due_status'] = 'other'
+                elif settlement.due_date < today:
+                    row['due_status'] = 'overdue'
+                elif settlement.due_date <= due_soon_date:
+                    row['due_status'] = 'due_soon'
+                else:
+                    row['due_status'] = 'other'
+
             return response_200(
+                "Settlements",
                 {
-                    "all_settlements": all_settlements_serializer.data,
-                    "overdue_settlements": overdue_serializer.data,
-                    "due_soon_settlements": due_soon_serializer.data
+                    "settlements": data,
+                    "counts": counts,
+                    "next_cursor": next_cursor,
                 }
             )
 
@@ -270,56 +473,97 @@ class SettlementListCreateRetrieveUpdateDestroyView(ListCreateAPIView, RetrieveU
 
 class MonthlyAnalysisView(APIView):
     permission_classes = (IsAuthenticated,)
+    max_months = 36
 
+    @conditional_get
+    @cached_get
     def get(self, request, *args, **kwargs):
-        month = int(request.query_params.get('month', datetime.now().month))
-        year = int(request.query_params.get('year', datetime.now().year))
-
-        settlements = Settlement.objects.filter(
-            user=request.user,
-            created_at__year=year,
-            created_at__month=month,
+        try:
+            month = int(request.query_params.get('month', datetime.now().month))
+            year = int(request.query_params.get('year', datetime.now().year))
+            months = int(request.query_params.get('months', 1))
+            last_month = date(year, month, 1)
+        except ValueError:
+            return response_400_bad_request("Invalid month, year or months.")
+
+        if not 1 <= months <= self.max_months:
+            return response_400_bad_request(f"months must be between 1 and {self.max_months}.")
+
+        month_starts = [last_month]
+        while len(month_starts) < months:
+            month_starts.insert(0, month_start(month_starts[0] - timedelta(days=1)))
+
+        # One grouped query yields every month's summary and both breakdowns.
+        rows = (
+            Settlement.objects.filter(
+                user=request.user,
+                created_at__gte=start_of_day(month_starts[0]),
+                created_at__lt=start_of_day(next_month_start(last_month)),
+            )
+            .annotate(month=TruncMonth('created_at'))
+            .values('month', 'settlement_method', 'payment_status')
+            .annotate(
+                count=Count('id'),
+                amount_due=Sum('amount', filter=Q(payment_status=PaymentStatusEnum.Pending.value)),
+            )
+            .order_by()
         )
 
-        total_settlements = settlements.count()
-        total_pending = settlements.filter(payment_status=PaymentStatusEnum.Pending.value).count()
-        total_completed = settlements.filter(payment_status=PaymentStatusEnum.Completed.value).count()
-
-        total_amount_due = settlements.filter(payment_status=PaymentStatusEnum.Pending.value).aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-
-        settlement_method_breakdown = settlements.values('settlement_method').annotate(
-            count=Count('id')
-        ).order_by('-count')
-
-        payment_status_breakdown = settlements.values('payment_status').annotate(
-            count=Count('id')
-        ).order_by('-count')
-
-        data = {
-            "month": month,
-            "year": year,
-            "summary": {
-                "total_settlements": total_settlements,
-                "total_pending": total_pending,
-                "total_completed": total_completed,
-                "total_amount_due": total_amount_due,
-            },
-            "breakdowns": {
-                "settlement_method_breakdown": list(settlement_method_breakdown),
-                "payment_status_breakdown": list(payment_status_breakdown),
-            },
+        analysis = {
+            month_key: {
+                "month": month_key.month,
+                "year": month_key.year,
+                "summary": {
+                    "total_settlements": 0,
+                    "total_pending": 0,
+                    "total_completed": 0,
+                    "total_amount_due": 0,
+                },
+                "method_counts": defaultdict(int),
+                "status_counts": defaultdict(int),
+            }
+            for month_key in month_starts
         }
-
-        return response_200("Monthly Analysis",  data)
+        for row in rows:
+            data = analysis[month_start(row['month'])]
+            summary = data["summary"]
+            summary["total_settlements"] += row['count']
+            if str(row['payment_status']) == str(PaymentStatusEnum.Pending.value):
+                summary["total_pending"] += row['count']
+            elif str(row['payment_status']) == str(PaymentStatusEnum.Completed.value):
+                summary["total_completed"] += row['count']
+            summary["total_amount_due"] += row['amount_due'] or 0
+            data["method_counts"][row['settlement_method']] += row['count']
+            data["status_counts"][row['payment_status']] += row['count']
+
+        results = []
+        for data in analysis.values():
+            method_counts = data.pop("method_counts")
+            status_counts = data.pop("status_counts")
+            data["breakdowns"] = {
+                "settlement_method_breakdown": [
+                    {"settlement_method": method, "count": count}
+                    for method, count in sorted(method_counts.items(), key=lambda item: item[1], reverse=True)
+                ],
+                "payment_status_breakdown": [
+                    {"payment_status": status, "count": count}
+                    for status, count in sorted(status_counts.items(), key=lambda item: item[1], reverse=True)
+                ],
+            }
+            results.append(data)
+
+        if 'months' not in request.query_params:
+            return response_200("Monthly Analysis", results[0])
+        return response_200("Monthly Analysis", {"months": results})
     
 class GetExpenseCategorizationView(APIView):
     permission_classes = (IsAuthenticated,)
     
+    @conditional_get
+    @cached_get
     def get(self, request , *args, **kwargs):
         logger.info(f"Request User:{request.user.email}")
-        categorized_expenses = Expense.objects.filter(student=request.user).values('category__name').annotate(total=Sum('amount'))
+        categorized_expenses = SpendingRollup.objects.filter(student=request.user).values('category__name').annotate(total=Sum('total'))
         
         serializer = CategorizedExpenseSerializer(categorized_expenses, many=True)
         
@@ -344,6 +588,8 @@ class BudgetListCreateRetrieveUpdateDestroyView(ListCreateAPIView, RetrieveUpdat
         except Exception as e:
             return response_400_bad_request(f"Error while creating budget: {str(e)}")
 
+    @conditional_get
+    @cached_get
     def get(self, request, *args, **kwargs):
         if 'pk' in kwargs:
             return self.retrieve(request, *args, **kwargs)
@@ -369,52 +615,69 @@ class BudgetListCreateRetrieveUpdateDestroyView(ListCreateAPIView, RetrieveUpdat
 class BudgetAnalysisView(APIView):
     permission_classes = (IsAuthenticated,)
 
+    @conditional_get
+    @cached_get
     def get(self, request, *args, **kwargs):
         logger.info(f"Request User: {request.user.email}")
 
-        budgets = (
-            Budget.objects.filter(student=request.user)
-            .annotate(
-                total_expenses=Coalesce(
-                    Sum('category__expense__amount', filter=F('category__expense__student') == request.user),
-                    Value(Decimal("0.00"))
-                ),
-                remaining_budget=F('budget_limit') - Coalesce(
-                    Sum('category__expense__amount', filter=F('category__expense__student') == request.user),
-                    Value(Decimal("0.00"))
-                ),
-            )
-            .values('category__name', 'budget_limit', 'total_expenses', 'remaining_budget')
+        budgets = list(
+            Budget.objects.filter(student=request.user).values('category_id', 'category__name', 'budget_limit')
         )
 
         if not budgets:
             return response_400_bad_request("No budgets found for the user.")
 
+        category_totals = dict(
+            SpendingRollup.objects.filter(
+                student=request.user,
+                category_id__in=[budget['category_id'] for budget in budgets],
+            ).values_list('category_id').annotate(total=Sum('total')).order_by()
+        )
+        for budget in budgets:
+            budget['total_expenses'] = category_totals.get(budget['category_id'], Decimal("0.00"))
+            budget['remaining_budget'] = budget['budget_limit'] - budget['total_expenses']
+
         serializer = MonthlyBudgetTrackingSerializer(budgets, many=True)
 
         return response_200("Budget Analysis",serializer.data)
 
+class SpendingForecastView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    @conditional_get
+    @cached_get
+    def get(self, request, *args, **kwargs):
+        # Read-only: stale forecasts are refitted in memory and stored by refresh_spending_forecasts.
+        serializer = SpendingForecastSerializer(current_forecasts(request.user.id), many=True)
+
+        return response_200("Spending Forecast", serializer.data)
+
 class SettlementSuggestionView(APIView):
     permission_classes = (IsAuthenticated,)
 
+    # Not versioned or cached: the user_email suggestion reads every group of
+    # the other student, whose writes do not touch the requester's data version.
     def get(self, request, *args, **kwargs):
         group_id = request.query_params.get('group_id') 
         user_email = request.query_params.get('user_email')
+        mode = request.query_params.get('mode', SettlementModeEnum.Greedy.value)
+        if mode not in SettlementModeEnum.values():
+            return response_400_bad_request(f"Invalid mode. Choices are: {SettlementModeEnum.help()}")
+
         if group_id:
             try:
                 group = Group.objects.get(pk=group_id, created_by=request.user)
             except Group.DoesNotExist:
                 return response_400_bad_request(f"No group found with ID {group_id}")
 
-            expenses = group.expenses.all()
-            members = group.members.values_list('email', flat=True)
-            settlements = calculate_settlement(expenses, members)
+            balances = dict(group.balances.values_list('member__email', 'net_amount'))
+            settlements = simplify_debts(balances, mode)
             return response_200("Group Settlement Suggestions", settlements)
         
         elif user_email:
             try:
-                other_user = User.objects.get(email=user_email)
-            except User.DoesNotExist:
+                other_user = Student.objects.get(email=user_email)
+            except Student.DoesNotExist:
                 return response_400_bad_request(f"No user found with email {user_email}")
 
             expenses = Expense.objects.filter(
@@ -422,7 +685,7 @@ class SettlementSuggestionView(APIView):
             ).distinct()
 
             members = [request.user.email, other_user.email]
-            settlements = calculate_settlement(expenses, members)
+            settlements = calculate_settlement(expenses, members, mode)
             return response_200("Individual Settlement Suggestions", settlements)
 
         else:
@@ -432,45 +695,170 @@ class SettlementSuggestionView(APIView):
 class SpendingPatternsView(APIView):
     permission_classes = (IsAuthenticated,)
 
+    @conditional_get
+    @cached_get
     def get(self, request, *args, **kwargs):
         user = request.user
         time_period = request.query_params.get('time_period', 'monthly')  # Default: Monthly
+        mode = request.query_params.get('mode', 'summary')  # 'insights' adds percentiles and anomalies
         start_date = request.query_params.get('start_date')  # Optional
         end_date = request.query_params.get('end_date')  # Optional
 
         if not start_date or not end_date:
-            end_date = datetime.now()
+            end_date = timezone.now()
             start_date = end_date - timedelta(days=180)
         else:
-            start_date = datetime.strptime(start_date, "%Y-%m-%d")
-            end_date = datetime.strptime(end_date, "%Y-%m-%d")
+            start_date = start_of_day(datetime.strptime(start_date, "%Y-%m-%d").date())
+            end_date = start_of_day(datetime.strptime(end_date, "%Y-%m-%d").date())
+
+        if time_period not in PERIODS:
+            return response_400_bad_request(f"Invalid time_period. Use one of: {', '.join(PERIODS)}.")
+        if mode not in ('summary', 'insights'):
+            return response_400_bad_request("Invalid mode. Use 'summary' or 'insights'.")
+
+        if time_period == 'monthly' and mode == 'summary':
+            monthly_totals = defaultdict(Decimal)
+            category_totals = defaultdict(Decimal)
+            for month, category_name, total in spending_by_month(user, start_date, end_date):
+                monthly_totals[month] += total
+                category_totals[category_name] += total
+
+            response_data = {
+                "total_spent": sum(monthly_totals.values()) or 0,
+                "category_spending": [
+                    {"category__name": category_name, "total": total}
+                    for category_name, total in sorted(category_totals.items(), key=lambda item: item[1], reverse=True)
+                ],
+                "spending_trends": [{"month": month, "total": total} for month, total in sorted(monthly_totals.items())],
+            }
+            return response_200("Spending Patterns Analysis", response_data)
 
-        expenses = Expense.objects.filter(
-            student=user,
-            created_at__range=[start_date, end_date]
-        )
+        try:
+            window = int(request.query_params['window']) if 'window' in request.query_params else None
+            z_threshold = float(request.query_params.get('z_threshold', 3))
+        except ValueError:
+            return response_400_bad_request("window and z_threshold must be numbers.")
+        if window is not None and window < 1:
+            return response_400_bad_request("window must be at least 1.")
+
+        # One query loads the series; every figure below is computed from its arrays.
+        series = ExpenseSeries.load(user, start_date, end_date)
+        response_data = {
+            "total_spent": series.total,
+            "category_spending": series.category_totals(),
+            "spending_trends": series.buckets(time_period, window, start_date, end_date),
+        }
+        if mode == 'insights':
+            response_data["category_percentiles"] = series.category_percentiles()
+            response_data["anomalies"] = series.outliers(z_threshold)
 
-        total_spent = expenses.aggregate(total=Sum('amount'))['total'] or 0
+        return response_200("Spending Patterns Analysis", response_data)
+
+
+DASHBOARD_SECTIONS = {
+    'monthly-analysis': MonthlyAnalysisView,
+    'expense-categorization': GetExpenseCategorizationView,
+    'budget-analysis': BudgetAnalysisView,
+    'spending-analysis': SpendingPatternsView,
+    'settlements': SettlementListCreateRetrieveUpdateDestroyView,
+}
+
+_dashboard_executor = None
 
-        category_spending = expenses.values('category__name').annotate(
-            total=Sum('amount')
-        ).order_by('-total')
 
-        if time_period == 'monthly':
-            trends = expenses.annotate(
-                month=TruncMonth('created_at')
-            ).values('month').annotate(total=Sum('amount')).order_by('month')
-        elif time_period == 'weekly':
-            trends = expenses.annotate(
-                week=TruncWeek('created_at')
-            ).values('week').annotate(total=Sum('amount')).order_by('week')
+def _render_section(view_class, request):
+    """
+    Render one section as its own view would, without going through dispatch().
+
+    Authentication already ran for the dashboard request; the section's own
+    permission and throttle checks, which dispatch() runs in initial(), run
+    here, and exceptions are turned into responses as dispatch() would.
+    """
+    view = view_class()
+    view.setup(request)
+    view.format_kwarg = None
+    view.headers = {}
+    try:
+        view.check_permissions(request)
+        view.check_throttles(request)
+        # The dashboard answers conditional requests and caches sections itself,
+        # so sections run their undecorated handler.
+        return inspect.unwrap(view_class.get)(view, request)
+    except Exception as exc:
+        return view.handle_exception(exc)
+
+
+def _render_section_in_thread(view_class, request):
+    close_old_connections()
+    try:
+        return _render_section(view_class, request)
+    finally:
+        close_old_connections()
+
+
+class DashboardView(APIView):
+    """
+    The home screen sections in one response, each rendered by its own view.
+
+    Sections run concurrently on DASHBOARD_WORKERS threads. Successful ones
+    are kept in the response cache under the student's data version, so a
+    section is only recomputed after a write that could change it.
+    """
+    permission_classes = (IsAuthenticated,)
+
+    @conditional_get
+    def get(self, request, *args, **kwargs):
+        global _dashboard_executor
+
+        requested = request.query_params.get('sections')
+        names = [name.strip() for name in requested.split(',') if name.strip()] if requested else list(DASHBOARD_SECTIONS)
+        unknown = [name for name in names if name not in DASHBOARD_SECTIONS]
+        if unknown:
+            return response_400_bad_request(
+                f"Unknown sections: {', '.join(unknown)}. Choices are: {', '.join(DASHBOARD_SECTIONS)}"
+            )
+
+        params = request.query_params.copy()
+        params.pop('sections', None)
+        keys = {name: response_cache_key(request, f"dashboard:{name}", params=params) for name in names}
+
+        response_cache = caches[RESPONSE_CACHE]
+        cached = response_cache.get_many(keys.values())
+        sections = {name: cached[key] for name, key in keys.items() if key in cached}
+        missing = [name for name in names if name not in sections]
+        for name in names:
+            record_cache_events(f"dashboard:{name}", hits=int(name in sections), misses=int(name not in sections))
+
+        workers = getattr(settings, 'DASHBOARD_WORKERS', 4)
+        if workers and len(missing) > 1:
+            if _dashboard_executor is None:
+                _dashboard_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dashboard')
+            futures = {
+                name: _dashboard_executor.submit(_render_section_in_thread, DASHBOARD_SECTIONS[name], request)
+                for name in missing
+            }
+            responses = {name: future.result() for name, future in futures.items()}
         else:
-            return Response({"error": "Invalid time_period. Use 'monthly' or 'weekly'."}, status=400)
+            responses = {name: _render_section(DASHBOARD_SECTIONS[name], request) for name in missing}
 
-        response_data = {
-            "total_spent": total_spent,
-            "category_spending": category_spending,
-            "spending_trends": list(trends),
-        }
+        fresh = {}
+        for name, response in responses.items():
+            sections[name] = response.data
+            if response.status_code == 200:
+                fresh[keys[name]] = response.data
+        if fresh:
+            response_cache.set_many(fresh)
 
-        return response_200("Spending Patterns Analysis", response_data)
+        return response_200("Dashboard", {name: sections[name] for name in names})
+
+
+class ResponseCacheStatsView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    @is_staff_user
+    def get(self, request, *args, **kwargs):
+        return response_200("Response Cache Stats", response_cache_stats())
+
+
+for section in DASHBOARD_SECTIONS:
+    register_endpoint(f"dashboard:{section}")
@@ -0,0 +1,61 @@
+"""
+Compare requests/sec on a cached analytics endpoint with JWTAuthentication and StatelessJWTAuthentication.
+
+Run with `python manage.py runscript bench_jwt_auth`. The benchmark student is
+created in a transaction that is rolled back afterwards.
+"""
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from CoreAuth.authentication import (
+    StatelessJWTAuthentication,
+    add_user_claims,
+)
+from CoreAuth.models import (
+    Student,
+)
+from expenses.views import (
+    MonthlyAnalysisView,
+)
+
+REQUESTS = 2000
+
+
+def requests_per_second(view, token):
+    factory = APIRequestFactory()
+    headers = {'HTTP_AUTHORIZATION': f"Bearer {token}"}
+    # Warm the response cache, so the timed requests measure authentication and dispatch.
+    assert view(factory.get('/expenses/monthly-analysis/', **headers)).status_code == 200
+
+    with CaptureQueriesContext(connection) as queries:
+        view(factory.get('/expenses/monthly-analysis/', **headers))
+
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        view(factory.get('/expenses/monthly-analysis/', **headers))
+    return REQUESTS / (time.perf_counter() - started), len(queries)
+
+
+def run():
+    with transaction.atomic():
+        student = Student.objects.create(
+            username='bench-jwt-auth', email='bench-jwt-auth@college.com', password=make_password(None),
+        )
+        token = str(add_user_claims(RefreshToken.for_user(student), student).access_token)
+
+        results = {}
+        for authentication in (JWTAuthentication, StatelessJWTAuthentication):
+            view = MonthlyAnalysisView.as_view(authentication_classes=[authentication])
+            results[authentication.__name__] = requests_per_second(view, token)
+        transaction.set_rollback(True)
+
+    baseline, _ = results['JWTAuthentication']
+    print(f"GET /expenses/monthly-analysis/ (cached), {REQUESTS} requests")
+    for name, (rate, queries) in results.items():
+        print(f"{name:27} {rate:8.0f} req/s  {queries} queries/request  ({rate / baseline:.2f}x)")
@@ -0,0 +1,63 @@
+"""
+Compare rendering a 10k-row settlement list with DRF's JSONRenderer and ORJSONRenderer.
+
+Run with `python manage.py runscript bench_renderer`.
+"""
+import random
+import time
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+from rest_framework.renderers import JSONRenderer
+
+from utils.renderers import (
+    ORJSONRenderer,
+)
+from utils.response import (
+    response_200,
+)
+
+ROWS = 10000
+REPEATS = 5
+
+
+def sample_rows(count):
+    """Rows shaped like the settlement list and analytics payloads, raw Decimals included."""
+    rng = random.Random(42)
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            'id': index,
+            'borrower': rng.randint(1, 5000),
+            'group': None,
+            'payment_status': 1,
+            'settlement_method': 2,
+            'due_date': date(2024, 1, 1) + timedelta(days=index % 365),
+            'amount': Decimal(rng.randint(100, 500000)) / 100,
+            'created_at': now + timedelta(seconds=index),
+            'updated_at': now + timedelta(seconds=index, microseconds=rng.randint(0, 999999)),
+            'due_status': 'other',
+        }
+        for index in range(count)
+    ]
+
+
+def best_of(render, payload):
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        output = render(payload)
+        timings.append(time.perf_counter() - started)
+    return min(timings), output
+
+
+def run():
+    payload = response_200("Settlements", {'settlements': sample_rows(ROWS)}).data
+
+    drf_time, drf_output = best_of(JSONRenderer().render, payload)
+    orjson_time, orjson_output = best_of(ORJSONRenderer().render, payload)
+
+    print(f"{ROWS} rows, {len(orjson_output) / 1024:.0f} KiB, best of {REPEATS}")
+    print(f"JSONRenderer:   {drf_time * 1000:8.1f} ms")
+    print(f"ORJSONRenderer: {orjson_time * 1000:8.1f} ms  ({drf_time / orjson_time:.1f}x faster)")
+    print(f"identical output: {drf_output == orjson_output}")
@@ -0,0 +1,74 @@
+"""
+Compare the batch split engine with the original per-expense Decimal split.
+
+Run with `python manage.py runscript bench_split_engine`.
+"""
+import random
+import time
+from decimal import Decimal
+
+from expenses.split_engine import (
+    split_expense,
+    split_expense_batch,
+)
+
+EXPENSES = 100000
+
+
+def legacy_split(expense_amount, split_type, splits_data):
+    """The Decimal division used by handle_expense_split before the batch engine."""
+    expense_amount = Decimal(expense_amount)
+    if split_type == 'equal':
+        amount_per_participant = expense_amount / len(splits_data)
+        for split in splits_data:
+            split['amount'] = amount_per_participant
+    elif split_type == 'percentage':
+        for split in splits_data:
+            split['amount'] = (Decimal(split['percentage']) / Decimal(100)) * expense_amount
+    elif split_type == 'proportional':
+        total_factor = sum(split['factor'] for split in splits_data)
+        for split in splits_data:
+            split['amount'] = (Decimal(split['factor']) / total_factor) * expense_amount
+    return splits_data
+
+
+def sample_expenses(count):
+    rng = random.Random(42)
+    expenses = []
+    for _ in range(count):
+        amount = Decimal(rng.randint(100, 500000)) / 100
+        participants = rng.randint(2, 12)
+        split_type = rng.choice(('equal', 'percentage', 'proportional'))
+        if split_type == 'equal':
+            splits = [{} for _ in range(participants)]
+        elif split_type == 'percentage':
+            splits = [{'percentage': Decimal(20)} for _ in range(5)]
+        else:
+            splits = [{'factor': rng.randint(1, 5)} for _ in range(participants)]
+        expenses.append((amount, split_type, splits))
+    return expenses
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed * 1000:>10.1f} ms  ({EXPENSES / elapsed:,.0f} expenses/s)")
+
+
+def run():
+    expenses = sample_expenses(EXPENSES)
+
+    timed("legacy Decimal, one by one", lambda: [legacy_split(*expense) for expense in expenses])
+    timed("engine, one by one", lambda: [split_expense(*expense) for expense in expenses])
+    timed("batch engine, one by one", lambda: [split_expense_batch([expense]) for expense in expenses])
+    timed("engine, one batch", lambda: split_expense_batch(expenses))
+
+    results = split_expense_batch(expenses)
+    exact = sum(sum(shares) == int(amount * 100) for (amount, _, _), shares in zip(expenses, results))
+    legacy = [legacy_split(*expense) for expense in expenses]
+    inexact = sum(any(split['amount'] != split['amount'].quantize(Decimal('0.01')) for split in splits) for splits in legacy)
+    print(f"engine splits summing exactly to the amount: {exact}/{EXPENSES}")
+    print(f"legacy splits with sub-paisa fractions:      {inexact}/{EXPENSES}")
+    same = sum(split_expense(*expense) == shares for expense, shares in zip(expenses, results))
+    print(f"single and batch paths agreeing:             {same}/{EXPENSES}")
@@ -1,9 +1,25 @@
+"""
+Email borrowers whose pending settlements fall due in PAYMENT_REMINDER_DAYS days.
+
+Run with `python manage.py runscript payment_reminder`. Options are passed as
+`--script-args`, e.g. `--script-args digest days=1,3,7 dry-run workers=4 chunk-size=1000`,
+or `queue-only` to leave delivery to `manage.py send_outbox_emails`.
+"""
+import hashlib
+import time
 from datetime import datetime , timedelta
+from itertools import groupby, islice
+from operator import attrgetter
 
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage
+from django.core.management.base import CommandError
 from django.db.models import Q
 from django.conf import settings
 
+from CoreAuth.outbox import (
+    deliver_outbox,
+    enqueue_emails,
+)
 from expenses.enums import (
     PaymentStatusEnum
 )
@@ -11,39 +27,176 @@ from expenses.models import (
     Settlement,
 )
 
-def send_payment_reminders():
-    reminder_date = datetime.now().date() + timedelta(days=3)
+# Settlements read per query and reminders queued per insert.
+CHUNK_SIZE = 1000
+
+# Parallel SMTP connections used to deliver the outbox; each stays open for the whole run.
+WORKERS = 4
+
+
+def reminder_message(settlement, from_email):
+    borrower = settlement.borrower
+    due_date = settlement.due_date
 
-    pending_settlements = Settlement.objects.filter(
-        Q(payment_status=PaymentStatusEnum.Pending.value) & Q(due_date=reminder_date)
+    subject = f"Payment Reminder: Settlement Due on {due_date}"
+    message = (
+        f"Dear {borrower.username},\n\n"
+        f"This is a reminder that your payment of ₹{settlement.amount:.2f} "
+        f"to {settlement.user.username} is due on {due_date}.\n\n"
+        f"Please ensure the payment is made on time to avoid further reminders.\n\n"
+        f"Thank you!"
     )
+    return EmailMessage(subject, message, from_email, [borrower.email])
 
-    if not pending_settlements.exists():
-        print("No settlements require reminders for the given date.")
-        return
 
-    for settlement in pending_settlements:
-        borrower = settlement.borrower
-        lender = settlement.user
-        amount = settlement.amount
-        due_date = settlement.due_date
-
-        subject = f"Payment Reminder: Settlement Due on {due_date}"
-        message = (
-            f"Dear {borrower.username},\n\n"
-            f"This is a reminder that your payment of ₹{amount:.2f} "
-            f"to {lender.username} is due on {due_date}.\n\n"
-            f"Please ensure the payment is made on time to avoid further reminders.\n\n"
-            f"Thank you!"
+def digest_message(settlements, from_email):
+    """
+    One email listing every settlement a borrower owes in the reminder windows.
+    """
+    if len(settlements) == 1:
+        return reminder_message(settlements[0], from_email)
+
+    borrower = settlements[0].borrower
+    total = sum(settlement.amount for settlement in settlements)
+    lines = "\n".join(
+        f"  - ₹{settlement.amount:.2f} to {settlement.user.username}, due on {settlement.due_date}"
+        for settlement in settlements
+    )
+    subject = f"Payment Reminder: {len(settlements)} Settlements Due from {settlements[0].due_date}"
+    message = (
+        f"Dear {borrower.username},\n\n"
+        f"This is a reminder that the following payments, ₹{total:.2f} in total, are due soon:\n\n"
+        f"{lines}\n\n"
+        f"Please ensure the payments are made on time to avoid further reminders.\n\n"
+        f"Thank you!"
+    )
+    return EmailMessage(subject, message, from_email, [borrower.email])
+
+
+def pending_settlements(reminder_dates, digest=False):
+    """
+    Pending settlements due on any of `reminder_dates`, with both parties joined in.
+
+    Digests read them ordered by borrower, so each borrower's settlements arrive together.
+    """
+    return (
+        Settlement.objects.filter(
+            Q(payment_status=PaymentStatusEnum.Pending.value) & Q(due_date__in=reminder_dates)
         )
-        from_email = settings.DEFAULT_FROM_EMAIL
-        recipient_list = [borrower.email]
-
-        try:
-            send_mail(subject, message, from_email, recipient_list)
-            print(f"Payment reminder sent to {borrower.username} ({borrower.email}).")
-        except Exception as e:
-            print(f"Failed to send email to {borrower.username} ({borrower.email}): {e}")
-            
-def run():
-    send_payment_reminders()
\ No newline at end of file
+        .select_related('borrower', 'user')
+        .only('amount', 'due_date', 'borrower__username', 'borrower__email', 'user__username')
+        .order_by(*(('borrower', 'due_date', 'id') if digest else ('id',)))
+    )
+
+
+def settlement_reminders(settlements, from_email, today):
+    """
+    Yields:
+        tuple: (dedup key, message, settlements covered), one per settlement.
+    """
+    for settlement in settlements:
+        key = f"payment-reminder:{settlement.id}:{settlement.due_date}:{today}"
+        yield key, reminder_message(settlement, from_email), 1
+
+
+def digest_reminders(settlements, from_email, today):
+    """
+    The dedup key carries a hash of the settlement ids, so a borrower who
+    owes a settlement created after today's digest went out gets a new one.
+
+    Yields:
+        tuple: (dedup key, message, settlements covered), one per borrower.
+    """
+    for borrower_id, owed in groupby(settlements, key=attrgetter('borrower_id')):
+        owed = list(owed)
+        ids = ",".join(str(settlement.id) for settlement in sorted(owed, key=attrgetter('id')))
+        covered = hashlib.sha256(ids.encode()).hexdigest()[:16]
+        yield f"payment-digest:{borrower_id}:{today}:{covered}", digest_message(owed, from_email), len(owed)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def send_payment_reminders(
+    days_ahead=None, digest=False, dry_run=False, queue_only=False, workers=WORKERS, chunk_size=CHUNK_SIZE,
+):
+    """
+    Queue reminders for settlements due `days_ahead` days from today in the email outbox, then deliver the outbox.
+
+    `days_ahead` is a list of reminder windows and defaults to the
+    PAYMENT_REMINDER_DAYS setting. With `digest`, each borrower gets one email
+    covering all their settlements in the windows instead of one per settlement.
+
+    Dedup keys name the settlement, or the borrower and the settlements in
+    the digest, and today's date, so a rerun on the same day queues nothing
+    new unless a borrower's digest gained or lost a settlement. With `queue_only`, delivery is left to the
+    `send_outbox_emails` worker.
+    """
+    started = time.monotonic()
+    today = datetime.now().date()
+    if days_ahead is None:
+        days_ahead = getattr(settings, 'PAYMENT_REMINDER_DAYS', [3])
+    reminder_dates = sorted({today + timedelta(days=days) for days in days_ahead})
+    due_on = ", ".join(str(date) for date in reminder_dates)
+    from_email = settings.DEFAULT_FROM_EMAIL
+
+    settlements = pending_settlements(reminder_dates, digest=digest).iterator(chunk_size=chunk_size)
+    reminders = (digest_reminders if digest else settlement_reminders)(settlements, from_email, today)
+    prepared = covered = queued = 0
+    for chunk in chunked(reminders, chunk_size):
+        if dry_run and not prepared:
+            _, message, _ = chunk[0]
+            print(f"Sample reminder to {message.to[0]}:\n{message.subject}\n\n{message.body}\n")
+        prepared += len(chunk)
+        covered += sum(count for _, _, count in chunk)
+        if not dry_run:
+            queued += enqueue_emails((key, message) for key, message, _ in chunk)
+
+    if not prepared:
+        print("No settlements require reminders for the given dates.")
+        return
+
+    queued_in = time.monotonic() - started
+    summary = f"{prepared} payment reminders for {covered} settlements due on {due_on} in {queued_in:.2f}s"
+    if dry_run:
+        print(f"Prepared {summary} ({prepared / queued_in:.0f}/s).")
+        return
+
+    print(f"Queued {summary} ({prepared - queued} already queued).")
+    if queue_only:
+        return
+
+    result = deliver_outbox(workers=workers)
+    elapsed = time.monotonic() - started - queued_in
+    print(
+        f"Delivered the outbox in {elapsed:.2f}s: {result['sent']} sent, "
+        f"{result['retried']} to retry, {result['dead']} dead-lettered."
+    )
+
+
+def parse_days(value):
+    """
+    Parse the `days=` option, e.g. "1,3,7", into a list of reminder windows.
+    """
+    try:
+        days_ahead = [int(days) for days in value.split(',')]
+    except (AttributeError, ValueError):
+        days_ahead = []
+    if not days_ahead or min(days_ahead) < 0:
+        raise CommandError(f"days= expects comma-separated whole numbers of days, e.g. days=1,3,7; got {value!r}.")
+    return days_ahead
+
+
+def run(*args):
+    options = dict(arg.split('=', 1) if '=' in arg else (arg, True) for arg in args)
+    send_payment_reminders(
+        days_ahead=parse_days(options['days']) if 'days' in options else None,
+        digest=bool(options.get('digest')),
+        dry_run=bool(options.get('dry-run')),
+        queue_only=bool(options.get('queue-only')),
+        workers=int(options.get('workers', WORKERS)),
+        chunk_size=int(options.get('chunk-size', CHUNK_SIZE)),
+    )
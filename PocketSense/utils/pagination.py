@@ -0,0 +1,80 @@
+import base64
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import timezone
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def decode_cursor(cursor, model, fields):
+    """
+    Decode a cursor produced by `keyset_page` for `model` ordered by `fields`.
+
+    Each value is converted with its model field, so a cursor whose values do
+    not fit the ordering fields is rejected here instead of failing in the query.
+
+    Returns:
+        list: The cursor values, or None if the cursor is malformed.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != len(fields) or None in values:
+        return None
+
+    converted = []
+    for field_name, value in zip(fields, values):
+        if isinstance(value, (dict, list, bool)):
+            return None
+        try:
+            value = model._meta.get_field(field_name).to_python(value)
+        except (ValidationError, TypeError, ValueError):
+            return None
+        if isinstance(value, datetime) and settings.USE_TZ and timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        converted.append(value)
+    return converted
+
+
+def keyset_page(queryset, fields, cursor=None, limit=50, descending=False):
+    """
+    Fetch one page of `queryset` ordered by `fields`, starting after `cursor`.
+
+    Unlike offset pagination, each page is a single index range scan no matter
+    how deep the client has paged. The last field must be unique (usually `id`).
+
+    Args:
+        queryset (QuerySet): Rows to page through.
+        fields (list): Ordering fields, e.g. ['due_date', 'id'].
+        cursor (list): Decoded cursor values for `fields`, or None for the first page.
+        limit (int): Page size.
+        descending (bool): Page from the largest key down.
+
+    Returns:
+        tuple: (list of rows, next cursor string or None).
+    """
+    lookup = 'lt' if descending else 'gt'
+    if cursor:
+        condition = Q()
+        for index in reversed(range(len(fields))):
+            step = Q(**{f"{fields[index]}__{lookup}": cursor[index]})
+            step &= Q(**{field: value for field, value in zip(fields[:index], cursor[:index])})
+            condition |= step
+        queryset = queryset.filter(condition)
+
+    ordering = [f"-{field}" if descending else field for field in fields]
+    rows = list(queryset.order_by(*ordering)[:limit + 1])
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, field) for field in fields])
+    return rows, next_cursor